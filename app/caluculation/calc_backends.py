@@ -0,0 +1,139 @@
+"""
+一日分の勤怠計算の窓口（状態を持たない）。
+
+DayInput（一日分の入力）から DayResult（計算結果）を返す calculate だけを持ち、
+呼び出しの間で何も共有しないため、スレッドをまたいで1つのバックエンドを使えます。
+環境変数 CALC_BACKEND で実装を切り替えます。
+
+- reference: CalcTimeClass をそのまま使う（既定。計算仕様の基準）
+- fast: calc_fast の整数演算版。mypyc でコンパイルしておくとさらに速くなる
+  （python -m tools.build_calc_fast。未コンパイルでも同じ結果で動作する）
+"""
+
+import functools
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from app.caluculation import calc_fast
+from app.caluculation.calc_work_classes_4_mcp import CalcTimeClass
+
+logger = logging.getLogger(__name__)
+
+CALC_BACKEND = os.getenv("CALC_BACKEND", "reference")
+
+# 欠勤・全日の休暇の届出コード（DayFacts.leave_or_absence）
+LEAVE_OR_ABSENCE = calc_fast.ABSENCE + ("3", "5")
+
+
+@dataclass(frozen=True, slots=True)
+class DayInput:
+    contract_work_time: float  # 契約労働時間（時間）
+    contract_holiday_time: float  # 契約有休時間（時間）
+    start_time: str  # "HH:MM"
+    end_time: str
+    notifications: Tuple[Optional[str], Optional[str]]  # (AM, PM) の届出コード
+    overtime_check: Optional[str]
+    holiday_work: Optional[str] = None
+
+    def __post_init__(self):
+        # CalcTimeClass は "0" / "1" 以外では途中で None の演算になって失敗するため、先に断る
+        if self.overtime_check not in ("0", "1"):
+            raise ValueError(f"未対応の残業申請です: {self.overtime_check!r}")
+
+
+@dataclass(frozen=True, slots=True)
+class DayResult:
+    normal_rest: timedelta  # 通常休憩時間
+    time_off: bool  # 時間休の有無
+    actual_work_time: Optional[timedelta]  # 実働時間
+    real_time: float  # リアル実働時間（秒）
+    over_time: float  # 時間外（秒）
+
+
+class CalcBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def calculate(self, day: DayInput) -> DayResult: ...
+
+
+class ReferenceCalcBackend(CalcBackend):
+    """CalcTimeClass による計算。呼び出しごとに新しいインスタンスを使う"""
+
+    name = "reference"
+
+    def calculate(self, day: DayInput) -> DayResult:
+        calc = CalcTimeClass(staff_id=0)
+        calc.set_data(
+            contract_work_time=day.contract_work_time,
+            contract_holiday_time=day.contract_holiday_time,
+            start_time=day.start_time,
+            end_time=day.end_time,
+            notifications=day.notifications,
+            overtime_check=day.overtime_check,
+            holiday_work=day.holiday_work,
+        )
+        normal_rest = calc.calc_normal_rest(calc.calc_base_work_time())
+        return DayResult(
+            normal_rest=normal_rest,
+            time_off=any(n in calc.n_time_off_list for n in day.notifications),
+            actual_work_time=calc.get_actual_work_time(),
+            real_time=calc.get_real_time(),
+            over_time=calc.get_over_time(),
+        )
+
+
+@functools.lru_cache(maxsize=64)
+def contract_microseconds(hours: float) -> int:
+    # CalcTimeClass と同じく timedelta(hours=...) の丸めで整数にする
+    return timedelta(hours=hours) // timedelta(microseconds=1)
+
+
+class FastCalcBackend(CalcBackend):
+    name = "fast"
+
+    def calculate(self, day: DayInput) -> DayResult:
+        notification_am, notification_pm = day.notifications
+        rest, time_off, actual, real_time, over_time = calc_fast.calculate_day(
+            contract_microseconds(day.contract_work_time),
+            contract_microseconds(day.contract_holiday_time),
+            day.start_time,
+            day.end_time,
+            notification_am,
+            notification_pm,
+            day.overtime_check,
+        )
+        return DayResult(
+            normal_rest=timedelta(microseconds=rest),
+            time_off=time_off,
+            actual_work_time=(
+                timedelta(microseconds=actual) if actual is not None else None
+            ),
+            real_time=real_time,
+            over_time=over_time,
+        )
+
+
+def create_calc_backend(kind: str = CALC_BACKEND) -> CalcBackend:
+    if kind == "reference":
+        backend: CalcBackend = ReferenceCalcBackend()
+    elif kind == "fast":
+        backend = FastCalcBackend()
+        logger.info(
+            "calc_fast: %s",
+            "compiled" if not calc_fast.__file__.endswith(".py") else "pure Python",
+        )
+    else:
+        raise ValueError(f"未対応の CALC_BACKEND です: {kind}")
+    logger.info("Calc backend: %s", kind)
+    return backend
+
+
+@functools.lru_cache(maxsize=None)
+def get_calc_backend() -> CalcBackend:
+    """プロセスで共有するバックエンド（状態を持たないため、スレッド間でも共有できる）"""
+    return create_calc_backend()
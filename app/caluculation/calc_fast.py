@@ -0,0 +1,180 @@
+"""
+一日分の勤怠計算の高速版（CalcTimeClass と同じ結果を返す）。
+
+時刻は datetime.strptime を使わず事前に作った表で分に変換し、時間はすべて整数のマイクロ秒で
+計算します（timedelta と同じ丸め）。型注釈は mypyc でそのままコンパイルできる範囲に留めています。
+コンパイルしなくても動作し、コンパイルすると拡張モジュールが優先して読み込まれます:
+
+    python -m tools.build_calc_fast
+
+CalcTimeClass の計算仕様を変えたときは、こちらも合わせて変更してください
+（tests/test_calc_backends.py が合成データで両者の一致を確認します）。
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+MINUTE_US = 60_000_000
+HOUR_US = 60 * MINUTE_US
+
+TIME_OFF = ("10", "11", "12", "13", "14", "15")
+HALF = ("4", "9", "16")
+ABSENCE = ("8", "17", "18", "19", "20")
+# 時間休・中抜けの時間
+TIME_OFF_HOURS: Dict[str, int] = {
+    "10": 1,
+    "13": 1,
+    "11": 2,
+    "14": 2,
+    "12": 3,
+    "15": 3,
+}
+
+
+def _time_table() -> Dict[str, int]:
+    # strptime("%H:%M") が受け付ける表記（時・分とも1〜2桁）をすべて登録する
+    table: Dict[str, int] = {}
+    for hour in range(24):
+        for minute in range(60):
+            for h in {str(hour), f"{hour:02d}"}:
+                for m in {str(minute), f"{minute:02d}"}:
+                    table[f"{h}:{m}"] = hour * 60 + minute
+    return table
+
+
+_MINUTES = _time_table()
+
+
+def parse_minutes(text: str) -> int:
+    minutes = _MINUTES.get(text)
+    if minutes is None:
+        # 表にない表記は strptime と同じ例外にする
+        parsed = datetime.strptime(text, "%H:%M")
+        return parsed.hour * 60 + parsed.minute
+    return minutes
+
+
+def half(us: int) -> int:
+    """timedelta / 2 と同じく、マイクロ秒未満を偶数丸めする"""
+    quotient, remainder = divmod(us, 2)
+    if remainder and quotient % 2:
+        quotient += 1
+    return quotient
+
+
+def round_up_minutes(minutes: int) -> int:
+    """CalcTimeClass.round_up_time: 30分単位の切り上げ（23:30以降は strptime と同じく例外）"""
+    hour, minute = divmod(minutes, 60)
+    if minute == 0:
+        return minutes
+    if minute >= 30:
+        if hour + 1 >= 24:
+            datetime.strptime(f"{hour + 1}:00", "%H:%M")
+        return (hour + 1) * 60
+    return hour * 60 + 30
+
+
+def calculate_day(
+    contract_work_us: int,
+    contract_holiday_us: int,
+    start_time: str,
+    end_time: str,
+    notification_am: Optional[str],
+    notification_pm: Optional[str],
+    overtime_check: Optional[str],
+) -> Tuple[int, bool, Optional[int], float, float]:
+    """
+    一日分を計算する。
+    戻り値: (通常休憩時間[us], 時間休の有無, 実働時間[us] または None, リアル実働時間[秒], 時間外[秒])
+    """
+    notifications = (notification_am, notification_pm)
+
+    # calc_base_work_time
+    start = parse_minutes(start_time)
+    end = parse_minutes(end_time)
+    if start_time != "00:00" and start < 480:
+        base = (end - 480) * MINUTE_US
+    else:
+        base = (end - start) * MINUTE_US
+
+    # calc_normal_rest（時刻は文字列のまま比較する仕様）
+    if round_up_minutes(start) >= 780 or end_time <= "13:00":
+        rest = 0
+    elif base >= 6 * HOUR_US:
+        rest = HOUR_US
+    else:
+        rest = 45 * MINUTE_US
+    working = base - rest
+
+    # check_over_work
+    over_work: Optional[int]
+    if overtime_check == "0":
+        # _provide_half_notify
+        approval_count = 0
+        for notification in notifications:
+            if notification in HALF or notification == "6":
+                approval_count += 1
+        if approval_count == 0:
+            provide = (
+                contract_work_us - working if working < contract_work_us else 0
+            )
+        elif approval_count == 1:
+            each_contract = (
+                contract_work_us if "6" not in notifications else contract_holiday_us
+            )
+            provide = half(each_contract) - half(contract_holiday_us)
+            if working < half(contract_work_us):
+                provide += half(contract_work_us) - working
+        else:
+            provide = half(contract_work_us) - half(contract_holiday_us)
+        over_work = contract_work_us - provide
+    elif overtime_check == "1":
+        over_work = working
+    else:
+        over_work = None
+
+    # get_actual_work_time
+    actual: Optional[int] = None
+    for index in range(2):
+        notification = notifications[index]
+        if index == 0 and (notification in TIME_OFF or notification == ""):
+            continue
+        if notification == "5":
+            actual = contract_work_us
+        elif notification == "3" or (notification == "9" and start_time == "00:00"):
+            actual = contract_holiday_us
+        elif notification in ABSENCE:
+            actual = 0
+        else:
+            actual = over_work
+        break
+
+    if over_work is None:
+        raise ValueError(f"未対応の残業申請です: {overtime_check!r}")
+
+    # get_real_time
+    real = over_work
+    for notification in notifications:
+        if overtime_check == "0":
+            if notification in HALF:
+                real -= half(contract_holiday_us)
+                continue
+            if notification == "6":
+                real -= half(contract_work_us)
+                continue
+        if notification is not None and notification in TIME_OFF:
+            real -= TIME_OFF_HOURS[notification] * HOUR_US
+
+    # get_over_time（最後の届出で決まる）
+    over = 0.0
+    if overtime_check != "0":
+        over_us = over_work
+        for notification in notifications:
+            if notification in HALF or notification == "6":
+                over_us = over_work - half(contract_work_us)
+            else:
+                over_us = over_work - contract_work_us
+        over = over_us / 1_000_000
+
+    time_off = notification_am in TIME_OFF or notification_pm in TIME_OFF
+    return rest, time_off, actual, real / 1_000_000, over
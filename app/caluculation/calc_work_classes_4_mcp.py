@@ -1,12 +1,18 @@
-from typing import Dict, List, Optional
+import logging
+from types import MappingProxyType
+from typing import List, Mapping, Optional
 from dataclasses import dataclass, field, InitVar
 from functools import lru_cache
 from datetime import datetime, timedelta, time
 
+from sqlalchemy.orm import Session
+
 from app.database.database_base import session
 
 from app.models.models import User
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class CalcTimeClass:
@@ -213,17 +219,18 @@ class CalcTimeClass:
     def check_over_work(self) -> timedelta:
         input_work_time = self.calc_base_work_time()
         if self.overtime_check == "0":
-            print(f"△Approval half provide: {self._provide_half_notify()}")
+            half_notify_time = self._provide_half_notify()
+            logger.debug("△Approval half provide: %s", half_notify_time)
             return (
                 self.contract_work_time
-                - self._provide_half_notify()
+                - half_notify_time
                 # - self.calc_normal_rest(input_work_time)
             )
         elif self.overtime_check == "1":  # 残業した場合
             work_without_rest_time = input_work_time - self.calc_normal_rest(
                 input_work_time
             )
-            print(f"△Over without rest: {work_without_rest_time}")
+            logger.debug("△Over without rest: %s", work_without_rest_time)
             return work_without_rest_time
 
     """
@@ -252,7 +259,7 @@ class CalcTimeClass:
                 # else:
                 #     print(f"Bad!: {notification}")
                 result_actual_time = self.check_over_work()
-                print(f"△Actual pass: {result_actual_time}")
+                logger.debug("△Actual pass: %s", result_actual_time)
                 return result_actual_time
 
     """
@@ -271,7 +278,7 @@ class CalcTimeClass:
                 over_time_in_work = input_work_time - self.contract_work_time / 2
             else:
                 over_time_in_work = input_work_time - self.contract_work_time
-        print(f"△Over time: {over_time_in_work.total_seconds()}")
+        logger.debug("△Over time: %s", over_time_in_work)
         return over_time_in_work.total_seconds()
 
     """
@@ -283,7 +290,7 @@ class CalcTimeClass:
     def get_real_time(self) -> float:
         # 年休全日、出張全日なら00:00
         working_time = self.check_over_work()
-        print(f"△Actual work time: {working_time}")
+        logger.debug("△Actual work time: %s", working_time)
         for one_notification in self.notifications:
             if self.overtime_check == "0":
                 if one_notification in self.n_half_list:
@@ -304,9 +311,10 @@ class CalcTimeClass:
         @Return: float
         """
 
-    def calc_nurse_holiday_work(self) -> float:
+    def calc_nurse_holiday_work(self, db_session: Optional[Session] = None) -> float:
         # 祝日(2)、もしくはNSで土日(1)
-        nurse_member = session.get(User, self.staff_id)
+        # 複数スレッドで使う場合は、スレッドごとのセッションを渡す
+        nurse_member = (db_session or session).get(User, self.staff_id)
         # if self.holiday == "2" or self.holiday == "1"
         # and self.jobtype == 1 and self.u_contract_code == 2:
         if (
@@ -320,32 +328,29 @@ class CalcTimeClass:
             return 9.99
 
 
-@dataclass
+@dataclass(frozen=True)
 class CalcTimeFactory:
-    # from_day: date
-    # to_day: date
-
-    _instances: Dict[str, "CalcTimeClass"] = field(default_factory=dict)
+    """
+    CalcTimeClass の生成。set_data で一日分の値を書き換えるため、インスタンスは共有せず
+    呼び出しごとに新しく作る（1つのファクトリーを複数スレッドから同時に使える）。
+    一日分を計算するだけなら、状態を持たない calc_backends.get_calc_backend() を使う。
+    """
 
     def get_instance(self, staff_id: int) -> "CalcTimeClass":
-        # str_end_day = f"{end_day}"
-        # key_list = list(self._instances.keys())
-        # print(f" Key list: {key_list}")
-        if staff_id not in self._instances:
-            self._instances[staff_id] = CalcTimeClass(
-                staff_id=staff_id,
-                # start_day=start_day,
-                # key_end_day=end_day,
-            )
-            print("instance始めました")
-        return self._instances[staff_id]
+        return CalcTimeClass(staff_id=staff_id)
 
 
 """ 時間休カウント """
 
 
-@lru_cache
-def output_rest_time(notification_am: Optional[str], notification_pm: Optional[str]):
+# 届出コードの組み合わせ（AM × PM）が収まる大きさ
+OUTPUT_REST_TIME_CACHE_SIZE = 512
+
+
+@lru_cache(maxsize=OUTPUT_REST_TIME_CACHE_SIZE)
+def output_rest_time(
+    notification_am: Optional[str], notification_pm: Optional[str]
+) -> Mapping[str, int]:
     # def output_rest_time(*notifications: str) -> Dict[str, int]:
     n_time_list: List[int] = [1, 2, 3]
     n_off_list: List[str] = ["10", "11", "12"]
@@ -377,4 +382,7 @@ def output_rest_time(notification_am: Optional[str], notification_pm: Optional[s
         if notification_am == n_through or notification_pm == n_through
     ]
 
-    return {"Off": sum(off_time_list), "Through": sum(through_time_list)}
+    # キャッシュした結果を呼び出し元どうしで共有するため、変更できない形で返す
+    return MappingProxyType(
+        {"Off": sum(off_time_list), "Through": sum(through_time_list)}
+    )
@@ -1,7 +1,10 @@
-from dataclasses import dataclass
+import sqlite3
+from dataclasses import dataclass, field
 from datetime import date
+from typing import Optional
 
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
 
 from app.database.database_base import session
 
@@ -20,6 +23,8 @@ class ContractTimeAttendance:
     staff_id: int
     filter_from_day: date
     filter_to_day: date
+    # 呼び出し側のセッションを使う（MCPツールやベンチマークなど、スレッドごとのセッション）
+    db_session: Session = field(default=session, repr=False)
 
     def _get_base_filter(self) -> list:
         attendance_filters = []
@@ -57,7 +62,7 @@ class ContractTimeAttendance:
 
         # with get_session() as session:
         queries_for_calc_member = (
-            session.query(
+            self.db_session.query(
                 Attendance, StaffJobContract, StaffHolidayContract, Contract.WORKTIME
             )
             .join(
@@ -89,31 +94,90 @@ class ContractTimeAttendance:
 
         return queries_for_calc_member
 
+    def _get_contract_period_filter(self) -> list:
+        # 対象期間と重なる契約（END_DAY が NULL の契約は、勤怠との結合と同じく対象外）
+        return [
+            StaffJobContract.START_DAY <= self.filter_to_day,
+            StaffJobContract.END_DAY >= self.filter_from_day,
+        ]
+
+    def _has_attendance_in_period(self):
+        # 出勤実績があれば、引っかかる（ix_attendance_staff_workday で社員ごとに範囲検索）
+        return (
+            self.db_session.query(Attendance.id)
+            .filter(
+                Attendance.STAFFID == StaffJobContract.STAFFID,
+                Attendance.WORKDAY.between(self.filter_from_day, self.filter_to_day),
+            )
+            .exists()
+        )
+
+    def supports_window_functions(self) -> bool:
+        """ROW_NUMBER() OVER が使えるか（SQLite 3.25+, MySQL 8.0+, MariaDB 10.2+）"""
+        connection = self.db_session.connection()
+        dialect = connection.dialect
+        if dialect.name == "sqlite":
+            return sqlite3.sqlite_version_info >= (3, 25)
+        version = dialect.server_version_info or ()
+        if dialect.name in ("mysql", "mariadb"):
+            minimum = (10, 2) if getattr(dialect, "is_mariadb", False) else (8, 0)
+            return tuple(version[:2]) >= minimum
+        return True
+
     # Query[(User, int)]
-    def get_distinct_user_query(self):
-        # 出勤実績があれば、引っかかる
-        user_filters = self._get_base_filter()[1:] + self._get_job_filter()[0:3]
-        # こちらはあくまで重複を消す
-        # サブクエリでSTAFFIDごとの最新のSTART_DAYを取得
-        subquery = (
-            session.query(
+    def get_distinct_user_query(self, use_window: Optional[bool] = None):
+        """
+        対象期間に契約があり、出勤実績のある社員の一覧（全社員バッチの起点）。
+        各社員について、期間内で最新（START_DAY が最大）の契約の CONTRACT_CODE を返します。
+        """
+        if use_window is None:
+            use_window = self.supports_window_functions()
+        if use_window:
+            return self._distinct_user_query_window()
+        return self._distinct_user_query_group_by()
+
+    def _distinct_user_query_window(self):
+        ranked = (
+            select(
                 StaffJobContract.STAFFID,
-                func.max(StaffJobContract.START_DAY).label("max_start_day"),
-            ).group_by(StaffJobContract.STAFFID)
-            # .filter(*user_filters)
+                StaffJobContract.CONTRACT_CODE,
+                StaffJobContract.START_DAY,
+                func.row_number()
+                .over(
+                    partition_by=StaffJobContract.STAFFID,
+                    order_by=StaffJobContract.START_DAY.desc(),
+                )
+                .label("row_number"),
+            )
+            .where(*self._get_contract_period_filter(), self._has_attendance_in_period())
             .subquery()
         )
+        return (
+            self.db_session.query(User, ranked.c.CONTRACT_CODE)
+            .join(ranked, ranked.c.STAFFID == User.STAFFID)
+            .filter(ranked.c.row_number == 1)
+            .order_by(ranked.c.START_DAY.desc(), User.STAFFID)
+        )
 
-        # サブクエリとStaffJobContractを結合して、各STAFFIDの最新レコードを取得
-        user_order_query = (
-            session.query(User, StaffJobContract.CONTRACT_CODE)
+    def _distinct_user_query_group_by(self):
+        # ウィンドウ関数が使えないDB向け。期間内の最新のSTART_DAYを求めて結合し直す
+        latest = (
+            select(
+                StaffJobContract.STAFFID,
+                func.max(StaffJobContract.START_DAY).label("max_start_day"),
+            )
+            .where(*self._get_contract_period_filter(), self._has_attendance_in_period())
+            .group_by(StaffJobContract.STAFFID)
+            .subquery()
+        )
+        return (
+            self.db_session.query(User, StaffJobContract.CONTRACT_CODE)
+            .select_from(StaffJobContract)
             .join(
-                subquery,
-                (StaffJobContract.STAFFID == subquery.c.STAFFID)
-                & (StaffJobContract.START_DAY == subquery.c.max_start_day),
+                latest,
+                (StaffJobContract.STAFFID == latest.c.STAFFID)
+                & (StaffJobContract.START_DAY == latest.c.max_start_day),
             )
             .join(User, User.STAFFID == StaffJobContract.STAFFID)
-            .filter(and_(*user_filters))
-            .order_by(StaffJobContract.START_DAY.desc())
+            .order_by(StaffJobContract.START_DAY.desc(), User.STAFFID)
         )
-        return user_order_query
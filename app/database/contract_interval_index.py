@@ -0,0 +1,164 @@
+"""
+契約期間のインターバルインデックス（バッチ処理用）。
+
+get_perfect_contract_attendance は勤怠1行ごとに、職種契約・休暇契約を
+範囲結合 (WORKDAY BETWEEN START_DAY AND END_DAY) でDB側で解決します。
+SSHトンネル越しのMySQLでは、この非等価結合がバッチ全体のボトルネックになります。
+
+バッチでは D_JOB_HISTORY と D_HOLIDAY_HISTORY を一度だけ読み込み、
+社員ごとに START_DAY 順に並べて bisect で引きます。勤怠は (STAFFID, WORKDAY) の
+複合インデックスによる単純な範囲検索で取得し、契約はPython側で解決します。
+
+使い方:
+    contract_index = ContractIntervalIndex.load(db, from_day, to_day)
+    for staff_id in staff_ids:
+        collect_attendance_data(staff_id, from_day, to_day, db, contract_index=contract_index)
+"""
+
+from bisect import bisect_right
+from datetime import date
+from itertools import accumulate
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    Attendance,
+    Contract,
+    StaffHolidayContract,
+    StaffJobContract,
+)
+
+
+class ContractRecord(NamedTuple):
+    """get_perfect_contract_attendance の結果行と同じ属性名で参照できる行"""
+
+    Attendance: Attendance
+    StaffJobContract: StaffJobContract
+    StaffHolidayContract: Optional[StaffHolidayContract]
+    WORKTIME: Optional[float]
+
+
+class _StaffIntervals:
+    """
+    1人分の契約を START_DAY 順に保持する。
+    契約は重なることがある（期間の定めのない契約の中に短期の契約がある、など）ため、
+    各位置までの END_DAY の最大値も持ち、該当する契約がない範囲はさかのぼらずに判定する。
+    """
+
+    __slots__ = ("starts", "contracts", "max_ends")
+
+    def __init__(self, contracts: Sequence):
+        # END_DAY が NULL の契約は、DBの範囲結合 (WORKDAY <= END_DAY) と同じく一致しない
+        ordered = sorted(
+            (contract for contract in contracts if contract.END_DAY is not None),
+            key=lambda contract: contract.START_DAY,
+        )
+        self.starts: List[date] = [contract.START_DAY for contract in ordered]
+        self.contracts = ordered
+        self.max_ends: List[date] = list(
+            accumulate((contract.END_DAY for contract in ordered), max)
+        )
+
+    def find(self, day: date):
+        """day を含む契約のうち、START_DAY が最も新しいもの"""
+        position = bisect_right(self.starts, day) - 1
+        if position < 0 or self.max_ends[position] < day:
+            return None
+        while self.contracts[position].END_DAY < day:
+            position -= 1
+        return self.contracts[position]
+
+
+def _group_by_staff(contracts: Iterable) -> Dict[int, _StaffIntervals]:
+    grouped: Dict[int, List] = {}
+    for contract in contracts:
+        grouped.setdefault(contract.STAFFID, []).append(contract)
+    return {staff_id: _StaffIntervals(rows) for staff_id, rows in grouped.items()}
+
+
+def _overlaps(model, from_day, to_day) -> Tuple:
+    # END_DAY が NULL の契約は find で一致しないため、読み込まない
+    return (model.START_DAY <= to_day, model.END_DAY >= from_day)
+
+
+class ContractIntervalIndex:
+    """
+    社員ID → 契約期間の索引。
+
+    契約期間が重複している場合、DBの範囲結合は重複分の行を返しますが、
+    こちらはその日を含む契約のうち START_DAY が最も新しい契約を1件だけ返します
+    （勤怠は日付ごとにまとめるため、どちらでも同じ日が残ります）。
+    """
+
+    def __init__(
+        self,
+        job_contracts: Iterable[StaffJobContract],
+        holiday_contracts: Iterable[StaffHolidayContract],
+        worktimes: Dict[int, Optional[float]],
+    ):
+        self._jobs = _group_by_staff(job_contracts)
+        self._holidays = _group_by_staff(holiday_contracts)
+        self._worktimes = worktimes
+
+    @classmethod
+    def load(
+        cls,
+        db_session: Session,
+        from_day=None,
+        to_day=None,
+        staff_ids: Optional[Sequence[int]] = None,
+    ) -> "ContractIntervalIndex":
+        """バッチの期間（省略時は全期間）に重なる契約を一括で読み込む"""
+        queries = []
+        for model in (StaffJobContract, StaffHolidayContract):
+            query = db_session.query(model)
+            if from_day is not None and to_day is not None:
+                query = query.filter(*_overlaps(model, from_day, to_day))
+            if staff_ids is not None:
+                query = query.filter(model.STAFFID.in_(staff_ids))
+            queries.append(query)
+        worktimes = dict(db_session.query(Contract.CONTRACT_CODE, Contract.WORKTIME))
+        return cls(queries[0].all(), queries[1].all(), worktimes)
+
+    def job_contract(self, staff_id: int, day: date) -> Optional[StaffJobContract]:
+        intervals = self._jobs.get(staff_id)
+        return intervals.find(day) if intervals is not None else None
+
+    def holiday_contract(
+        self, staff_id: int, day: date
+    ) -> Optional[StaffHolidayContract]:
+        intervals = self._holidays.get(staff_id)
+        return intervals.find(day) if intervals is not None else None
+
+    def resolve(self, attendances: Iterable[Attendance]) -> List[ContractRecord]:
+        """
+        勤怠に契約を割り当てる。職種契約は内部結合（なければ除外）、
+        休暇契約は外部結合（なければ None）として扱う。
+        """
+        records = []
+        for attendance in attendances:
+            job = self.job_contract(attendance.STAFFID, attendance.WORKDAY)
+            if job is None:
+                continue
+            records.append(
+                ContractRecord(
+                    attendance,
+                    job,
+                    self.holiday_contract(attendance.STAFFID, attendance.WORKDAY),
+                    self._worktimes.get(job.CONTRACT_CODE),
+                )
+            )
+        return records
+
+
+def attendance_range_query(db_session: Session, staff_id: int, from_day, to_day):
+    """結合なしの勤怠取得（ix_attendance_staff_workday による範囲検索）"""
+    return (
+        db_session.query(Attendance)
+        .filter(
+            Attendance.STAFFID == staff_id,
+            Attendance.WORKDAY.between(from_day, to_day),
+        )
+        .order_by(Attendance.WORKDAY)
+    )
@@ -1,3 +1,4 @@
+import logging
 import os
 from pathlib import Path
 
@@ -5,9 +6,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 basedir = Path(__file__).resolve().parent.parent.parent
-print(f"どこdir: {basedir}")
 
 
 # 環境変数 DATABASE_URL が設定されていればそれを使用、なければMySQL環境変数をチェック
@@ -16,7 +18,7 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL:
     # DATABASE_URL が設定されている場合、それを使用
     DB_URL = DATABASE_URL
-    print(f"Using DATABASE_URL: {DB_URL}")
+    logger.info("Using DATABASE_URL")
 elif (
     os.getenv("DB_USER")
     and os.getenv("DB_PASSWORD")
@@ -34,12 +36,12 @@ elif (
             "db_name": os.getenv("DB_NAME"),
         }
     )
-    print("Using MySQL database from environment variables.")
+    logger.info("Using MySQL database from environment variables.")
 else:
     # どちらも設定されていない場合、テスト用にSQLiteを使用
     DB_FILE = os.path.join(basedir, "test.db")
     DB_URL = f"sqlite:///{DB_FILE}"
-    print(f"Using SQLite database for testing: {DB_FILE}")
+    logger.info("Using SQLite database for testing: %s", DB_FILE)
 
 
 engine = create_engine(DB_URL, echo=False)
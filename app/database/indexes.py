@@ -0,0 +1,245 @@
+"""
+勤怠の結合クエリ向けの複合インデックス。
+
+モデル（app/models/models.py）の __table_args__ に定義した複合インデックスを、
+既存のデプロイにも追加します（create_all は既存テーブルにインデックスを追加しないため）。
+
+- ix_attendance_staff_workday (STAFFID, WORKDAY):
+    get_perfect_contract_attendance の STAFFID = ? AND WORKDAY BETWEEN ? AND ? と、
+    get_distinct_user_query の出勤実績の確認 (EXISTS)
+
+契約の範囲結合 (STAFFID = ? AND START_DAY <= WORKDAY <= END_DAY) は、主キー (STAFFID, START_DAY) で引けます
+（InnoDB では主キーがクラスタ化インデックスのため、END_DAY を含めた複合インデックスは重複になります）。
+以前のバージョンで作成した ix_job_history_staff_range / ix_holiday_history_staff_range は、
+不要なインデックスとして一覧・削除の対象にします。
+
+あわせて、2つのクエリの EXPLAIN（SQLite は EXPLAIN QUERY PLAN）を出力し、
+複合インデックスで不要になる単一列インデックス（書き込みのたびに更新される）を一覧・削除できます。
+モデルの index=True は他の画面のために残しているので、削除は各デプロイで明示的に行ってください。
+
+使い方:
+    python -m app.database.indexes --create --explain --staff-id 1 --month 2025-12
+    python -m app.database.indexes --report-redundant
+    python -m app.database.indexes --drop-redundant
+"""
+
+import argparse
+import calendar
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, Index, MetaData, Table, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.database.attendance_contract_query import ContractTimeAttendance
+from app.models.models import Attendance, StaffHolidayContract, StaffJobContract
+
+logger = logging.getLogger(__name__)
+
+TARGET_TABLES = (
+    Attendance.__table__,
+    StaffJobContract.__table__,
+    StaffHolidayContract.__table__,
+)
+
+# 主キー (STAFFID, START_DAY) と重複するため、モデルから外した複合インデックス
+OBSOLETE_INDEXES = ("ix_job_history_staff_range", "ix_holiday_history_staff_range")
+
+
+@dataclass(frozen=True)
+class RedundantIndex:
+    table: str
+    name: str
+    column: str
+    reason: str
+
+
+def composite_indexes() -> List[Index]:
+    """対象テーブルに定義された、2列以上のインデックス"""
+    return [
+        index
+        for table in TARGET_TABLES
+        for index in sorted(table.indexes, key=lambda index: index.name)
+        if len(index.columns) > 1
+    ]
+
+
+def ensure_composite_indexes(engine: Engine) -> List[str]:
+    """存在しない複合インデックスを作成し、作成したインデックス名を返す"""
+    inspector = inspect(engine)
+    created = []
+    for index in composite_indexes():
+        existing = {
+            existing_index["name"]
+            for existing_index in inspector.get_indexes(index.table.name)
+        }
+        if index.name in existing:
+            continue
+        index.create(bind=engine, checkfirst=True)
+        created.append(index.name)
+        logger.info("Created index %s on %s", index.name, index.table.name)
+    return created
+
+
+def _covered_columns() -> Dict[str, set]:
+    """テーブルごとに、複合インデックスや主キーの先頭列で代用できる列"""
+    covered: Dict[str, set] = {}
+    for table in TARGET_TABLES:
+        leading = {
+            index.columns[0].name
+            for index in composite_indexes()
+            if index.table is table
+        }
+        primary_key = list(table.primary_key.columns)
+        if primary_key:
+            leading.add(primary_key[0].name)
+        covered[table.name] = leading
+    return covered
+
+
+def _foreign_key_columns(table) -> set:
+    return {fk.parent.name for fk in table.foreign_keys}
+
+
+def find_redundant_indexes(engine: Engine) -> List[RedundantIndex]:
+    """
+    DB上の単一列インデックスのうち、勤怠の結合クエリでは使わないもの（と OBSOLETE_INDEXES）。
+    外部キー列は、複合インデックスの先頭列で代用できる場合だけ対象にします
+    （MySQL は外部キー列にインデックスが必要なため）。
+    """
+    inspector = inspect(engine)
+    covered = _covered_columns()
+    composite_names = {index.name for index in composite_indexes()}
+    redundant = []
+    for table in TARGET_TABLES:
+        if not inspector.has_table(table.name):
+            continue
+        foreign_keys = _foreign_key_columns(table)
+        for index in inspector.get_indexes(table.name):
+            columns = index["column_names"]
+            if index["name"] in OBSOLETE_INDEXES:
+                redundant.append(
+                    RedundantIndex(
+                        table.name, index["name"], columns[0], "主キーの先頭列と重複する"
+                    )
+                )
+                continue
+            if index["name"] in composite_names or len(columns) != 1:
+                continue
+            column = columns[0]
+            if column in covered[table.name]:
+                reason = "複合インデックス（または主キー）の先頭列で代用できる"
+            elif column in foreign_keys:
+                continue
+            else:
+                reason = "勤怠の結合クエリで使われない"
+            redundant.append(RedundantIndex(table.name, index["name"], column, reason))
+    return redundant
+
+
+def drop_redundant_indexes(engine: Engine) -> List[str]:
+    """find_redundant_indexes の結果を削除する。先に複合インデックスを作成しておくこと"""
+    inspector = inspect(engine)
+    missing = [
+        index.name
+        for index in composite_indexes()
+        if index.name
+        not in {existing["name"] for existing in inspector.get_indexes(index.table.name)}
+    ]
+    if missing:
+        raise RuntimeError(f"複合インデックスが未作成です: {missing}")
+    dropped = []
+    for redundant in find_redundant_indexes(engine):
+        # モデルのテーブルに Index を作るとメタデータに追加されてしまうため、使い捨てのテーブルで作る
+        table = Table(redundant.table, MetaData(), Column(redundant.column))
+        Index(redundant.name, table.c[redundant.column]).drop(bind=engine)
+        dropped.append(redundant.name)
+        logger.info("Dropped index %s on %s", redundant.name, redundant.table)
+    return dropped
+
+
+def _explain_prefix(engine: Engine) -> str:
+    if engine.dialect.name == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    if engine.dialect.name in ("mysql", "mariadb"):
+        return "EXPLAIN "
+    raise NotImplementedError(f"EXPLAIN is not supported for {engine.dialect.name}")
+
+
+def explain_query(engine: Engine, query) -> List[str]:
+    """ORMクエリの実行計画を、1行1文字列で返す"""
+    compiled = query.statement.compile(dialect=engine.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(_explain_prefix(engine) + compiled.string, params)
+        return [" | ".join(str(value) for value in row) for row in rows]
+
+
+def explain_attendance_queries(
+    engine: Engine, staff_id: int, from_day: date, to_day: date
+) -> Dict[str, List[str]]:
+    with Session(bind=engine) as db:
+        queries = ContractTimeAttendance(staff_id, from_day, to_day, db_session=db)
+        return {
+            "get_perfect_contract_attendance": explain_query(
+                engine, queries.get_perfect_contract_attendance()
+            ),
+            "get_distinct_user_query": explain_query(
+                engine, queries.get_distinct_user_query()
+            ),
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="勤怠クエリ用の複合インデックスの管理")
+    parser.add_argument(
+        "--database-url", default=None, help="省略時は database_base の接続先"
+    )
+    parser.add_argument("--create", action="store_true", help="複合インデックスを作成")
+    parser.add_argument("--explain", action="store_true", help="実行計画を表示")
+    parser.add_argument("--staff-id", type=int, default=1)
+    parser.add_argument("--month", default=date.today().strftime("%Y-%m"))
+    parser.add_argument("--report-redundant", action="store_true")
+    parser.add_argument("--drop-redundant", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.database_url:
+        from sqlalchemy import create_engine
+
+        engine = create_engine(args.database_url)
+    else:
+        from app.database.database_base import engine
+
+    if args.create:
+        created = ensure_composite_indexes(engine)
+        print(f"作成: {created or 'なし'}")
+    if args.explain:
+        year, month = map(int, args.month.split("-"))
+        from_day = date(year, month, 1)
+        to_day = date(year, month, calendar.monthrange(year, month)[1])
+        for name, plan in explain_attendance_queries(
+            engine, args.staff_id, from_day, to_day
+        ).items():
+            print(f"--- {name}")
+            for line in plan:
+                print(line)
+    if args.report_redundant:
+        for redundant in find_redundant_indexes(engine):
+            print(
+                f"{redundant.table}.{redundant.name} ({redundant.column}): "
+                f"{redundant.reason}"
+            )
+    if args.drop_redundant:
+        dropped = drop_redundant_indexes(engine)
+        print(f"削除: {dropped or 'なし'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+参照テーブル（M_NOTIFICATION, M_CONTRACT）のキャッシュ。
+
+collect_attendance_data は勤怠1行ごとに届出名・契約名を引くため、
+起動時（lifespan）に一度だけ読み込んでおき、以降はメモリから返します。
+未読み込みの場合や、キャッシュにないコードはDBから取得します（従来どおり）。
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.metrics import record_cache
+from app.models.models import Contract, Notification
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    def __init__(self):
+        self._notifications: Dict[str, str] = {}
+        # CONTRACT_CODE → (NAME, WORKTIME)
+        self._contracts: Dict[int, Tuple[str, Optional[float]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, db_session: Session) -> None:
+        notifications = {
+            str(code): name
+            for code, name in db_session.query(Notification.CODE, Notification.NAME)
+        }
+        contracts = {
+            code: (name, worktime)
+            for code, name, worktime in db_session.query(
+                Contract.CONTRACT_CODE, Contract.NAME, Contract.WORKTIME
+            )
+        }
+        # 読み込み中の参照を妨げないよう、まとめて差し替える
+        with self._lock:
+            self._notifications = notifications
+            self._contracts = contracts
+            self._loaded = True
+        logger.info(
+            "Reference cache loaded: %d notifications, %d contracts",
+            len(notifications),
+            len(contracts),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._notifications = {}
+            self._contracts = {}
+            self._loaded = False
+
+    def notification_name(self, code: str) -> Optional[str]:
+        if not self._loaded:
+            return None
+        name = self._notifications.get(str(code))
+        record_cache("reference_notification", name is not None)
+        return name
+
+    def contract_name(self, contract_code: int) -> Optional[str]:
+        if not self._loaded:
+            return None
+        contract = self._contracts.get(contract_code)
+        record_cache("reference_contract", contract is not None)
+        return contract[0] if contract is not None else None
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,108 @@
+"""
+ログ設定。
+
+print の代わりに、各モジュールで logging.getLogger(__name__) を使います。
+環境変数で挙動を切り替えます。
+
+- LOG_LEVEL: ルートのレベル (既定: INFO)
+- LOG_LEVELS: モジュール単位のレベル (例: "app.caluculation=DEBUG,app.server=WARNING")
+- LOG_FORMAT: "text" または "json" (既定: text)
+- LOG_ASYNC: "1" のとき QueueHandler 経由で別スレッドから出力する (既定: 1)
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_root_handler: Optional[logging.Handler] = None
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコード1行のJSON形式で出力するフォーマッター"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """'app.a=DEBUG,app.b=INFO' → {'app.a': 'DEBUG', 'app.b': 'INFO'}"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    module_levels: Optional[str] = None,
+    log_format: Optional[str] = None,
+    use_queue: Optional[bool] = None,
+) -> None:
+    """ルートロガーを設定する。2回目以降の呼び出しは何もしない"""
+    global _listener, _root_handler, _configured
+    if _configured:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    module_levels = (
+        module_levels if module_levels is not None else os.getenv("LOG_LEVELS", "")
+    )
+    log_format = (log_format or os.getenv("LOG_FORMAT", "text")).lower()
+    if use_queue is None:
+        use_queue = os.getenv("LOG_ASYNC", "1") == "1"
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    if use_queue:
+        # リクエスト処理のスレッドはキューに積むだけで、書き込みは別スレッドで行う
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _root_handler = logging.handlers.QueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(
+            log_queue, stream_handler, respect_handler_level=True
+        )
+        _listener.start()
+    else:
+        _root_handler = stream_handler
+    root.addHandler(_root_handler)
+
+    for name, module_level in parse_module_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _configured = True
+
+
+def shutdown_logging() -> None:
+    """キューに残ったログを書き出して、リスナーのスレッドを止める"""
+    global _listener, _root_handler, _configured
+    if _root_handler is not None:
+        logging.getLogger().removeHandler(_root_handler)
+        _root_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    _configured = False
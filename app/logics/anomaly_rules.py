@@ -0,0 +1,160 @@
+"""
+勤怠データのイレギュラー判定ルール。
+
+collect_attendance_data の計算中に、一日ごとの計算結果へ異常コードを付与します。
+付与したコードは (社員ID, 対象月) 単位のインデックスに保持し、
+MCPツールやHTML表示で「問題のある日」だけを抽出できるようにします。
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.metrics import record_cache
+
+if TYPE_CHECKING:
+    from app.logics.attendance_records import StaffMonth
+
+# 日ごとの異常コード列を格納するキー（attendance_data[日付]["異常"]）
+ANOMALY_KEY = "異常"
+
+
+@dataclass(frozen=True)
+class DayFacts:
+    """ルール判定に使う、一日分の計算済みの値（文字列整形前）"""
+
+    contract_work_time: timedelta
+    actual_work_time: timedelta
+    real_time: float  # 秒
+    over_time: float  # 秒
+    overtime_check: str
+    time_off: bool  # 時間休(10〜15)の届出あり
+    leave_or_absence: bool  # 全日休暇・欠勤系の届出あり
+    remark: str
+
+
+AnomalyRule = Callable[[DayFacts], bool]
+
+# (コード, 説明, 判定関数) の登録順がそのまま出力順になる
+ANOMALY_RULES: List[Tuple[str, str, AnomalyRule]] = []
+
+
+def anomaly_rule(code: str, description: str):
+    """ルール登録用デコレーター"""
+
+    def register(rule: AnomalyRule) -> AnomalyRule:
+        ANOMALY_RULES.append((code, description, rule))
+        return rule
+
+    return register
+
+
+@anomaly_rule("WT_SHORT", "残業申請なし(oa='0')で、wt が cw 未満")
+def _work_time_short(facts: DayFacts) -> bool:
+    return (
+        facts.overtime_check == "0"
+        and not facts.time_off
+        and not facts.leave_or_absence
+        and facts.actual_work_time < facts.contract_work_time
+    )
+
+
+@anomaly_rule("OT_NEG", "時間外(ot)が負の値")
+def _over_time_negative(facts: DayFacts) -> bool:
+    return facts.over_time < 0
+
+
+@anomaly_rule("TR_RMK", "時間休(tr)の申請があり、備考(rmk)の記載あり")
+def _time_off_with_remark(facts: DayFacts) -> bool:
+    return facts.time_off and bool(facts.remark and facts.remark.strip())
+
+
+@anomaly_rule("RT_DOUBLE", "時間休(tr)が wt と rt で二重に差し引かれている可能性")
+def _real_time_double_deduction(facts: DayFacts) -> bool:
+    return (
+        facts.time_off
+        and facts.actual_work_time < facts.contract_work_time
+        and facts.real_time < facts.actual_work_time.total_seconds()
+    )
+
+
+def classify_day(facts: DayFacts) -> Tuple[str, ...]:
+    """登録済みのルールをすべて適用し、該当した異常コードを返す"""
+    return tuple(code for code, _, rule in ANOMALY_RULES if rule(facts))
+
+
+def describe_anomaly_codes() -> str:
+    """MCPツール説明などに載せる、コード一覧の文字列"""
+    return "\n".join(f"- {code}: {description}" for code, description, _ in ANOMALY_RULES)
+
+
+class AnomalyIndex:
+    """
+    (社員ID, 対象月 YYYY-MM) → {日付: 異常コード} のインデックス。
+    MCPツールはスレッドプールから呼ばれるため、ロックで保護する。
+    """
+
+    def __init__(self, max_months: int = 4096):
+        self.max_months = max_months
+        self._index: "OrderedDict[Tuple[int, str], Dict[int, Tuple[str, ...]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def store(
+        self, staff_id: int, target_month: str, day_codes: Dict[int, Tuple[str, ...]]
+    ) -> None:
+        key = (int(staff_id), target_month)
+        with self._lock:
+            self._index[key] = dict(day_codes)
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_months:
+                self._index.popitem(last=False)
+
+    def flagged_days(
+        self, staff_id: int, target_month: str
+    ) -> Optional[Dict[int, Tuple[str, ...]]]:
+        """異常コードのある日だけを返す。未計算の月は None"""
+        with self._lock:
+            day_codes = self._index.get((int(staff_id), target_month))
+        record_cache("anomaly_index", day_codes is not None)
+        if day_codes is None:
+            return None
+        return {day: codes for day, codes in day_codes.items() if codes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index.clear()
+
+
+anomaly_index = AnomalyIndex()
+
+
+def filter_flagged_days(
+    attendance_data: Union[Dict[Any, Any], "StaffMonth"], staff_id: int, target_month: str
+) -> Union[Dict[Any, Any], "StaffMonth"]:
+    """
+    collect_attendance_data（または collect_staff_month）の結果から、異常コードが付いた日だけを残す。
+    固定項目（社員ID、勤務形態など）はそのまま残します。
+    """
+    # attendance_records はこのモジュールの ANOMALY_KEY を使うため、ここで読み込む
+    from app.logics.attendance_records import StaffMonth
+
+    flagged = anomaly_index.flagged_days(staff_id, target_month)
+    if isinstance(attendance_data, StaffMonth):
+        if flagged is not None:
+            return attendance_data.select_days(lambda record: record.day in flagged)
+        return attendance_data.select_days(lambda record: bool(record.anomaly))
+    filtered = {}
+    for key, value in attendance_data.items():
+        if not isinstance(key, int):
+            filtered[key] = value
+        elif flagged is not None:
+            if key in flagged:
+                filtered[key] = value
+        elif value.get(ANOMALY_KEY):
+            # インデックスから追い出された月は、日ごとのコードで判定
+            filtered[key] = value
+    return filtered
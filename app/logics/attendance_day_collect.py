@@ -1,16 +1,35 @@
 import json
-import math
-from typing import Dict, Any
-import re
+import logging
+import time
 from datetime import timedelta
+from typing import Dict, Any, Optional
 
 from sqlalchemy.orm import Session
 
 from app.database.database_base import session
 from app.database.attendance_contract_query import ContractTimeAttendance
-from app.caluculation.calc_work_classes_4_mcp import CalcTimeFactory
+from app.database.contract_interval_index import (
+    ContractIntervalIndex,
+    attendance_range_query,
+)
+from app.database.reference_cache import reference_cache
+from app.caluculation.calc_backends import (
+    LEAVE_OR_ABSENCE,
+    DayInput,
+    get_calc_backend,
+)
+from app.logics.anomaly_rules import DayFacts, anomaly_index, classify_day
+from app.logics.attendance_records import DayRecord, MonthHeader, StaffMonth
+from app.logics.time_format import format_rt, format_work_time
+from app.metrics import ROWS_PROCESSED, STAGE_SECONDS, span
 from app.models.models import Attendance, Notification, Contract
 
+logger = logging.getLogger(__name__)
+
+
+class NoAttendanceError(LookupError):
+    """対象期間に、契約と結び付く勤怠が1日もない"""
+
 
 def convert_time(str_value):
     if str_value == "":
@@ -22,6 +41,9 @@ def convert_time(str_value):
 
 def get_notification_name(notification_code: str, db_session: Session) -> str:
     if notification_code != "":
+        cached_name = reference_cache.notification_name(notification_code)
+        if cached_name is not None:
+            return cached_name
         notification_query = db_session.get(Notification, notification_code)
         return notification_query.NAME
     else:
@@ -29,141 +51,144 @@ def get_notification_name(notification_code: str, db_session: Session) -> str:
 
 
 def get_user_contract(contract_code: int, db_session: Session) -> str:
+    cached_name = reference_cache.contract_name(contract_code)
+    if cached_name is not None:
+        return cached_name
     contract_query = db_session.get(Contract, contract_code)
     return contract_query.NAME
 
 
-# 秒数を HH:MM に変換する処理を追加
-def format_rt(seconds: float) -> str:
-    if seconds == 0.0:
-        return "00:00"
-    # //演算子は負の無限大方向に丸める（(-2.5 -> -3)）ため、切り上げには適しません。
-    h = math.ceil(seconds / 3600) if seconds < 0 else int(seconds // 3600)
-    # 演算子の結合順序について、Python では % より単項のマイナス - の方が優先度が高いので、たとえば -7 % 2 は (-7) % 2 と解釈されます。
-    print(f"seconds % 3600 // 60: {(-seconds % 3600) // 60}")
-    m = int((-seconds % 3600) // 60) if seconds < 0 else int((seconds % 3600) // 60)
-    # print(f"h: {h}, m: {m}")
-    return f"{h:03d}:{m:02d}" if seconds < 0 else f"{h:02d}:{m:02d}"
-
-
-def collect_attendance_data(
-    staff_id: int, from_day: str, to_day: str, db_session: Session = session
-) -> Dict[Dict[str, int | str | float], Dict[int, Dict[str, Any]]]:
+def collect_staff_month(
+    staff_id: int,
+    from_day: str,
+    to_day: str,
+    db_session: Session = session,
+    contract_index: Optional[ContractIntervalIndex] = None,
+) -> StaffMonth:
     """
     Collects attendance data from various sources and compiles it into a unified format.
+
+    contract_index を渡した場合（バッチ処理）、契約はDBの範囲結合ではなく
+    読み込み済みのインデックスから解決します。
     """
-    # Placeholder for actual implementation
-    attendance_data = {}
-    # Logic to collect data goes here
+    # 日付 → 異常コード（月単位のインデックスへ登録する）
+    day_anomaly_codes = {}
+
+    if contract_index is not None:
+        with span("attendance_range_scan"):
+            attendances = attendance_range_query(
+                db_session, staff_id, from_day, to_day
+            ).all()
+        records = contract_index.resolve(attendances)
+    else:
+        contract_attendance_object = ContractTimeAttendance(
+            staff_id=staff_id,
+            filter_from_day=from_day,
+            filter_to_day=to_day,
+            db_session=db_session,
+        )
+        contract_attendance_query = (
+            contract_attendance_object.get_perfect_contract_attendance()
+        )
+        with span("get_perfect_contract_attendance"):
+            records = contract_attendance_query.all()
 
-    contract_attendance_object = ContractTimeAttendance(
-        staff_id=staff_id, filter_from_day=from_day, filter_to_day=to_day
-    )
-    contract_attendance_query = (
-        contract_attendance_object.get_perfect_contract_attendance()
-    )
-    records = contract_attendance_query.all()
+    if not records:
+        raise NoAttendanceError(
+            f"社員ID {staff_id} の {from_day}〜{to_day} の勤怠がありません"
+        )
 
-    calc_time_factory = CalcTimeFactory()
+    calc_backend = get_calc_backend()
 
-    attendance_data["社員ID"] = staff_id
     # 月途中の契約変更を想定しない場合、最初のレコードから取得
-    attendance_data["勤務形態"] = get_user_contract(
-        records[0].StaffJobContract.CONTRACT_CODE, db_session
-    )
     if records[0].StaffHolidayContract is not None:
-        attendance_data["契約労働時間"] = records[0].StaffJobContract.PART_WORKTIME
-        attendance_data["契約有休時間"] = records[0].StaffHolidayContract.HOLIDAY_TIME
+        contract_work_time = records[0].StaffJobContract.PART_WORKTIME
+        contract_holiday_time = records[0].StaffHolidayContract.HOLIDAY_TIME
     else:
-        attendance_data["契約労働時間"] = records[0].WORKTIME
-        attendance_data["契約有休時間"] = records[0].WORKTIME
+        contract_work_time = records[0].WORKTIME
+        contract_holiday_time = records[0].WORKTIME
+    staff_month = StaffMonth(
+        MonthHeader(
+            staff_id=staff_id,
+            work_type=get_user_contract(
+                records[0].StaffJobContract.CONTRACT_CODE, db_session
+            ),
+            contract_work_time=contract_work_time,
+            contract_holiday_time=contract_holiday_time,
+        )
+    )
+    contract_work_delta = timedelta(hours=contract_work_time)
 
     for record in records:
         attendance_obj: Attendance = record.Attendance
-        print(f"Work Day: {attendance_obj.WORKDAY}, ID: {attendance_obj.id}")
+        logger.debug("Work Day: %s, ID: %s", attendance_obj.WORKDAY, attendance_obj.id)
         work_day = attendance_obj.WORKDAY.day
 
-        # if work_day not in attendance_data:
-        attendance_data[work_day] = {}
-
-        attendance_data[work_day]["日付"] = attendance_obj.WORKDAY.day
-        # オンコール
-        attendance_data[work_day]["オンコール"] = attendance_obj.ONCALL
-        # 開始時間
-        attendance_data[work_day]["出勤"] = convert_time(attendance_obj.STARTTIME)
-        # 終了時間
-        attendance_data[work_day]["退勤"] = convert_time(attendance_obj.ENDTIME)
-        # 申請(AM)
-        attendance_data[work_day]["届出(AM)"] = get_notification_name(
-            attendance_obj.NOTIFICATION, db_session
-        )
-        # 申請(PM)
-        attendance_data[work_day]["届出(PM)"] = get_notification_name(
-            attendance_obj.NOTIFICATION2, db_session
+        row_start = time.perf_counter()
+        day_result = calc_backend.calculate(
+            DayInput(
+                contract_work_time=contract_work_time,
+                contract_holiday_time=contract_holiday_time,
+                start_time=attendance_obj.STARTTIME,
+                end_time=attendance_obj.ENDTIME,
+                notifications=(attendance_obj.NOTIFICATION, attendance_obj.NOTIFICATION2),
+                overtime_check=attendance_obj.OVERTIME,
+                holiday_work=attendance_obj.HOLIDAY,
+            )
         )
-        # 残業申請
-        attendance_data[work_day]["残業申請"] = attendance_obj.OVERTIME
-
-        # if record.StaffHolidayContract is None:
-        #     setting_contract_worktime = record.WORKTIME
-        #     setting_contract_off_time = record.WORKTIME
-        # else:
-        #     setting_contract_worktime = record.StaffJobContract.PART_WORKTIME
-        #     setting_contract_off_time = record.StaffHolidayContract.HOLIDAY_TIME
-
-        # attendance_data[work_day]["勤務形態"] = get_user_contract(
-        #     record.StaffJobContract.CONTRACT_CODE, db_session
-        # )
-        # attendance_data[work_day]["契約労働時間"] = setting_contract_worktime
-        # attendance_data[work_day]["契約有休時間"] = setting_contract_off_time
-
-        calculation_instance = calc_time_factory.get_instance(staff_id=staff_id)
-        calculation_instance.set_data(
-            contract_work_time=attendance_data["契約労働時間"],
-            contract_holiday_time=attendance_data["契約有休時間"],
-            start_time=attendance_obj.STARTTIME,
-            end_time=attendance_obj.ENDTIME,
-            notifications=(attendance_obj.NOTIFICATION, attendance_obj.NOTIFICATION2),
-            overtime_check=attendance_obj.OVERTIME,
-            holiday_work=attendance_obj.HOLIDAY,
+        logger.debug("Over time (seconds): %s", day_result.over_time)
+
+        # 異常コード
+        notifications = (attendance_obj.NOTIFICATION, attendance_obj.NOTIFICATION2)
+        anomaly_codes = classify_day(
+            DayFacts(
+                contract_work_time=contract_work_delta,
+                actual_work_time=day_result.actual_work_time,
+                real_time=day_result.real_time,
+                over_time=day_result.over_time,
+                overtime_check=attendance_obj.OVERTIME,
+                time_off=day_result.time_off,
+                leave_or_absence=any(n in LEAVE_OR_ABSENCE for n in notifications),
+                remark=attendance_obj.REMARK,
+            )
         )
 
-        input_work_time = calculation_instance.calc_base_work_time()
-        normal_rest_time = calculation_instance.calc_normal_rest(input_work_time)
-        normal_rest_time_str = (
-            re.sub(r"([0-9]{1,2}):([0-9]{2}):00", r"\1:\2", f"{normal_rest_time}")
-            if normal_rest_time > timedelta(hours=0)
-            else "0.0"
+        staff_month.days[work_day] = DayRecord(
+            day=work_day,
+            oncall=attendance_obj.ONCALL,
+            start_time=convert_time(attendance_obj.STARTTIME),
+            end_time=convert_time(attendance_obj.ENDTIME),
+            notification_am=get_notification_name(attendance_obj.NOTIFICATION, db_session),
+            notification_pm=get_notification_name(
+                attendance_obj.NOTIFICATION2, db_session
+            ),
+            overtime_application=attendance_obj.OVERTIME,
+            normal_rest=format_work_time(day_result.normal_rest),
+            time_off="1" if day_result.time_off else "0",
+            actual_work_time=format_work_time(day_result.actual_work_time),
+            real_time=format_rt(day_result.real_time),
+            over_time=format_rt(day_result.over_time),
+            remark=attendance_obj.REMARK,
+            anomaly=",".join(anomaly_codes),
+            work_date=attendance_obj.WORKDAY,
         )
-        attendance_data[work_day]["通常休憩時間"] = normal_rest_time_str
-
-        # 時間休の有無
-        attendance_data[work_day]["時間休"] = (
-            "1"
-            if attendance_obj.NOTIFICATION in calculation_instance.n_time_off_list
-            or attendance_obj.NOTIFICATION2 in calculation_instance.n_time_off_list
-            else "0"
-        )
-
-        # 実働時間
-        actual_work_time = calculation_instance.get_actual_work_time()
-        actual_work_time_str = (
-            re.sub(r"([0-9]{1,2}):([0-9]{2}):00", r"\1:\2", f"{actual_work_time}")
-            if actual_work_time > timedelta(hours=0)
-            else "0.0"
-        )
-        attendance_data[work_day]["実働時間"] = actual_work_time_str
+        day_anomaly_codes[work_day] = anomaly_codes
+        STAGE_SECONDS.observe(time.perf_counter() - row_start, "calc_row")
+        ROWS_PROCESSED.inc()
 
-        # 実働時間(リアルタイム)
-        real_time = calculation_instance.get_real_time()
-        attendance_data[work_day]["リアル実働時間"] = format_rt(real_time)
+    anomaly_index.store(staff_id, str(from_day)[:7], day_anomaly_codes)
 
-        # 残業時間
-        over_work_time = calculation_instance.get_over_time()
-        print(f"Over time (seconds): {over_work_time}")
-        attendance_data[work_day]["時間外"] = format_rt(over_work_time)
+    return staff_month
 
-        # 備考
-        attendance_data[work_day]["備考"] = attendance_obj.REMARK
 
-    return attendance_data
+def collect_attendance_data(
+    staff_id: int,
+    from_day: str,
+    to_day: str,
+    db_session: Session = session,
+    contract_index: Optional[ContractIntervalIndex] = None,
+) -> Dict[Dict[str, int | str | float], Dict[int, Dict[str, Any]]]:
+    """collect_staff_month の結果を、従来の dict の形式（固定項目 + 日付ごとの日本語キー）で返す"""
+    return collect_staff_month(
+        staff_id, from_day, to_day, db_session, contract_index=contract_index
+    ).to_dict()
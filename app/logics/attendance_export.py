@@ -0,0 +1,227 @@
+"""
+月次勤怠の出力（CSV / XLSX）。
+
+社員ごとに collect_staff_month で計算し、計算できた社員から順に行を出力します。
+1か月・1社員分のデータだけをメモリに置くため、全社員分を出力してもメモリ使用量は一定です。
+
+レイアウト:
+- legacy: 旧システムの集計CSVと同じ列（社員ごとに1行）。compare_csv_files にそのまま渡せる
+- daily: 社員ID + 勤怠テーブルの列（1日1行）
+
+XLSX は openpyxl が必要です（pyproject.toml の export グループ）。
+"""
+
+import csv
+import io
+import logging
+import re
+import tempfile
+import time
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy.orm import Session
+
+from app.database.attendance_contract_query import ContractTimeAttendance
+from app.database.contract_interval_index import ContractIntervalIndex
+from app.logics.attendance_day_collect import NoAttendanceError, collect_staff_month
+from app.logics.attendance_records import DAY_KEYS, StaffMonth
+from app.logics.day_table import MISSING
+from app.logics.logic_util import get_date_range
+from app.logics.time_format import parse_hours
+from app.models.models import User
+
+logger = logging.getLogger(__name__)
+
+EXPORT_LAYOUTS = ("legacy", "daily")
+EXPORT_FORMATS = ("csv", "xlsx")
+
+# 旧システムの集計CSVの列（compare_csv_files の REQUIRED_COLUMNS + 勤務形態）
+LEGACY_COLUMNS = [
+    "社員ID",
+    "勤務形態",
+    "実働時間計",
+    "リアル実働時間",
+    "年休（全日）",
+    "年休（半日）",
+    "時間外",
+    "時間休計",
+]
+
+# daily レイアウトの列（勤怠テーブルと同じ順）
+DAILY_COLUMNS = ("社員ID", *DAY_KEYS)
+
+ANNUAL_LEAVE_FULL = "年休（全日）"
+ANNUAL_LEAVE_HALF = "年休（半日）"
+# 時間休（1時間）、中抜け（2時間） など
+_TIME_OFF_HOURS = re.compile(r"（(\d+)時間）")
+
+# CSVをまとめて送る大きさ（1社員ごとに送ると、集計レイアウトでは1行ずつになるため）。
+# 計算に時間がかかる場合でも、CSV_FLUSH_SECONDS ごとには送る
+CSV_CHUNK_BYTES = 64 * 1024
+CSV_FLUSH_SECONDS = 1.0
+XLSX_CHUNK_BYTES = 64 * 1024
+
+
+def legacy_row(staff_month: Union[StaffMonth, Dict[Any, Any]]) -> List[Any]:
+    """1社員・1か月分の勤怠から、旧システムの集計CSVの1行を作る"""
+    if not isinstance(staff_month, StaffMonth):
+        staff_month = StaffMonth.from_dict(staff_month)
+    work = real = overtime = 0.0
+    # 年休・時間休は回数・時間数の整数（旧システムのCSVでは "0" のように出力される）
+    leave_full = leave_half = time_off = 0
+    for day in staff_month.days.values():
+        notifications = (day.notification_am or "", day.notification_pm or "")
+        work += parse_hours(day.actual_work_time)
+        real += parse_hours(day.real_time)
+        # 時間外は残業した時間のみ（届出漏れなどによるマイナスは集計しない）
+        overtime += max(parse_hours(day.over_time), 0.0)
+        leave_full += ANNUAL_LEAVE_FULL in notifications
+        leave_half += notifications.count(ANNUAL_LEAVE_HALF)
+        for name in notifications:
+            match = _TIME_OFF_HOURS.search(name)
+            if match:
+                time_off += int(match.group(1))
+    return [
+        staff_month.header.staff_id,
+        staff_month.header.work_type,
+        work,
+        real,
+        leave_full,
+        leave_half,
+        overtime,
+        time_off,
+    ]
+
+
+def daily_rows(staff_month: StaffMonth) -> Iterator[List[Any]]:
+    """社員ID + 日ごとの値（DAILY_COLUMNS の順）"""
+    staff_id = staff_month.header.staff_id
+    for day in staff_month.days.values():
+        yield [staff_id, *day.values()]
+
+
+def select_staff_ids(
+    db_session: Session,
+    from_day: date,
+    to_day: date,
+    staff_id: Optional[int] = None,
+    team_code: Optional[int] = None,
+) -> List[int]:
+    """出力対象の社員。社員指定がなければ、対象期間に契約と出勤実績のある社員（チーム指定で絞り込み）"""
+    if staff_id is not None:
+        return [staff_id]
+    query = ContractTimeAttendance(
+        0, from_day, to_day, db_session=db_session
+    ).get_distinct_user_query()
+    if team_code is not None:
+        query = query.filter(User.TEAM_CODE == team_code)
+    return sorted({user.STAFFID for user, _ in query})
+
+
+def has_staff_attendance(
+    db_session: Session, staff_id: int, from_day: str, to_day: str
+) -> bool:
+    """collect_staff_month で計算できる勤怠（契約と結び付く勤怠）が1日でもあるか"""
+    query = ContractTimeAttendance(
+        staff_id, from_day, to_day, db_session=db_session
+    ).get_perfect_contract_attendance()
+    return query.first() is not None
+
+
+def iter_staff_attendance(
+    db_session: Session, target_month: str, staff_ids: Sequence[int]
+) -> Iterator[StaffMonth]:
+    """社員ごとの collect_staff_month の結果を、計算できた順に返す（勤怠のない社員は飛ばす）"""
+    from_day, to_day = get_date_range(target_month)
+    contract_index = None
+    if len(staff_ids) > 1:
+        # 複数社員のときは、期間内の契約を一度に読み込んで社員ごとの範囲結合を省く
+        # （契約は社員あたり数件のため、IN句を使わず期間だけで絞る）
+        contract_index = ContractIntervalIndex.load(
+            db_session, date.fromisoformat(from_day), date.fromisoformat(to_day)
+        )
+    for staff_id in staff_ids:
+        try:
+            staff_month = collect_staff_month(
+                staff_id, from_day, to_day, db_session, contract_index=contract_index
+            )
+        except NoAttendanceError:
+            # 出力の途中で止めない（契約期間外の勤怠しかない社員など）
+            logger.info("Skipping staff %s: no attendance in %s", staff_id, target_month)
+            continue
+        finally:
+            # 読み込んだ勤怠をセッションに溜めない（全社員分でもメモリを一定に保つ）
+            db_session.expunge_all()
+        if staff_month.days:
+            yield staff_month
+
+
+def iter_export_rows(
+    db_session: Session,
+    target_month: str,
+    staff_ids: Sequence[int],
+    layout: str = "legacy",
+) -> Iterator[List[Any]]:
+    """ヘッダー行に続けて、レイアウトに応じた行を返す"""
+    staff_records = iter_staff_attendance(db_session, target_month, staff_ids)
+    if layout == "legacy":
+        yield list(LEGACY_COLUMNS)
+        for staff_month in staff_records:
+            yield legacy_row(staff_month)
+        return
+    yield list(DAILY_COLUMNS)
+    for staff_month in staff_records:
+        yield from daily_rows(staff_month)
+
+
+def export_cell(value: Any) -> str:
+    if value is None or value is MISSING:
+        return ""
+    if isinstance(value, float):
+        # 旧システムの集計CSVと同じく、時間は小数1桁・回数は整数（int のまま str にする）
+        return f"{value:.1f}"
+    return str(value)
+
+
+def iter_csv_chunks(
+    rows: Iterator[List[Any]],
+    chunk_bytes: int = CSV_CHUNK_BYTES,
+    flush_seconds: float = CSV_FLUSH_SECONDS,
+) -> Iterator[bytes]:
+    """行をCSVにして、chunk_bytes（または flush_seconds）ごとに UTF-8 のバイト列で返す"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    flushed_at = time.monotonic()
+    for row in rows:
+        writer.writerow([export_cell(value) for value in row])
+        if (
+            buffer.tell() >= chunk_bytes
+            or time.monotonic() - flushed_at >= flush_seconds
+        ):
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            flushed_at = time.monotonic()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx_chunks(
+    rows: Iterator[List[Any]], chunk_bytes: int = XLSX_CHUNK_BYTES
+) -> Iterator[bytes]:
+    """
+    行を XLSX にして返す。XLSX は zip のため全行を書いてからでないと送れないが、
+    openpyxl の write_only モードで一時ファイルに書き出し、行をメモリに溜めない。
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("勤怠")
+    for row in rows:
+        sheet.append([None if value is MISSING else value for value in row])
+    with tempfile.TemporaryFile() as fp:
+        workbook.save(fp)
+        fp.seek(0)
+        while chunk := fp.read(chunk_bytes):
+            yield chunk
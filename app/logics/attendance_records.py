@@ -0,0 +1,160 @@
+"""
+1社員・1か月分の勤怠（collect_staff_month の結果）のレコード型。
+
+日ごと・固定項目を __slots__ のデータクラスで持ち、日本語キーの dict（collect_attendance_data の
+従来の形式）、MCP向けの短縮キー、外部向けの AttendanceDataSchema は必要なときに作ります。
+全社員分を処理するバッチでも、1日ごとに dict を作ってキーを付け替える必要がありません。
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import date
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.logics.anomaly_rules import ANOMALY_KEY
+from app.logics.logic_util import FIXED_KEY_MAP
+from app.logics.time_format import parse_hours
+from app.schemas import AttendanceDataSchema
+
+# (属性名, 日本語キー, 短縮キー)。並びは従来の dict のキーの順
+HEADER_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("staff_id", "社員ID", FIXED_KEY_MAP["社員ID"]),
+    ("work_type", "勤務形態", FIXED_KEY_MAP["勤務形態"]),
+    ("contract_work_time", "契約労働時間", FIXED_KEY_MAP["契約労働時間"]),
+    ("contract_holiday_time", "契約有休時間", FIXED_KEY_MAP["契約有休時間"]),
+)
+DAY_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("day", "日付", "d"),
+    ("oncall", "オンコール", "oc"),
+    ("start_time", "出勤", "in"),
+    ("end_time", "退勤", "out"),
+    ("notification_am", "届出(AM)", "am"),
+    ("notification_pm", "届出(PM)", "pm"),
+    ("overtime_application", "残業申請", "oa"),
+    ("normal_rest", "通常休憩時間", "nr"),
+    ("time_off", "時間休", "tr"),
+    ("actual_work_time", "実働時間", "wt"),
+    ("real_time", "リアル実働時間", "rt"),
+    ("over_time", "時間外", "ot"),
+    ("remark", "備考", "rmk"),
+    ("anomaly", ANOMALY_KEY, "an"),
+)
+HEADER_KEYS = tuple(key for _, key, _ in HEADER_FIELDS)
+HEADER_SHORT_KEYS = tuple(short for _, _, short in HEADER_FIELDS)
+DAY_KEYS = tuple(key for _, key, _ in DAY_FIELDS)
+DAY_SHORT_KEYS = tuple(short for _, _, short in DAY_FIELDS)
+
+_header_values = attrgetter(*(name for name, _, _ in HEADER_FIELDS))
+_day_values = attrgetter(*(name for name, _, _ in DAY_FIELDS))
+
+
+@dataclass(frozen=True, slots=True)
+class MonthHeader:
+    staff_id: int
+    work_type: str
+    contract_work_time: float  # 時間
+    contract_holiday_time: float  # 時間
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(HEADER_KEYS, _header_values(self)))
+
+    def to_short(self) -> Dict[str, Any]:
+        return dict(zip(HEADER_SHORT_KEYS, _header_values(self)))
+
+
+@dataclass(frozen=True, slots=True)
+class DayRecord:
+    """一日分の表示用の値（勤怠テーブル・MCPと同じ文字列）"""
+
+    day: int
+    oncall: Any
+    start_time: str
+    end_time: str
+    notification_am: str  # 届出名
+    notification_pm: str
+    overtime_application: Any
+    normal_rest: str
+    time_off: str  # "1" / "0"
+    actual_work_time: str
+    real_time: str
+    over_time: str
+    remark: Any
+    anomaly: str  # 異常コード（カンマ区切り）
+    work_date: Optional[date] = None  # 勤務日（dict の形式には含めない）
+
+    def values(self) -> Tuple[Any, ...]:
+        """DAY_KEYS の順の値"""
+        return _day_values(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(DAY_KEYS, _day_values(self)))
+
+    def to_short(self) -> Dict[str, Any]:
+        return dict(zip(DAY_SHORT_KEYS, _day_values(self)))
+
+    @classmethod
+    def from_dict(cls, day: int, record: Dict[str, Any]) -> "DayRecord":
+        """従来の dict から作る。存在しない項目は空文字"""
+        values = {name: record.get(key, "") for name, key, _ in DAY_FIELDS}
+        values["day"] = record.get("日付", day)
+        return cls(**values)
+
+
+@dataclass(slots=True)
+class StaffMonth:
+    header: MonthHeader
+    days: Dict[int, DayRecord] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[Any, Any]:
+        """collect_attendance_data の従来の形式（固定項目 + 日付 → 日本語キーの dict）"""
+        data: Dict[Any, Any] = self.header.to_dict()
+        for day, record in self.days.items():
+            data[day] = record.to_dict()
+        return data
+
+    def to_short_records(self) -> List[Dict[str, Any]]:
+        """MCPレスポンスの形式（短縮キーの固定項目 + 日ごとのレコード）"""
+        return [self.header.to_short(), *(record.to_short() for record in self.days.values())]
+
+    def to_schema(self) -> List[AttendanceDataSchema]:
+        """外部向けの形式（1日1件）"""
+        header = self.header
+        return [
+            AttendanceDataSchema(
+                work_day=record.work_date.isoformat() if record.work_date else "",
+                staff_id=header.staff_id,
+                start_time=record.start_time,
+                end_time=record.end_time,
+                notification_am=record.notification_am or "",
+                notification_pm=record.notification_pm or "",
+                overtime_application=record.overtime_application or "",
+                work_type=header.work_type,
+                contract_work_time=header.contract_work_time,
+                contract_holiday_time=header.contract_holiday_time,
+                normal_rest_time=parse_hours(record.normal_rest),
+                actual_work_time=record.actual_work_time,
+                real_time=parse_hours(record.real_time),
+                overtime_hours=parse_hours(record.over_time),
+                remarks=record.remark or "",
+            )
+            for record in self.days.values()
+        ]
+
+    def select_days(self, keep: Callable[[DayRecord], bool]) -> "StaffMonth":
+        """条件に合う日だけを残した StaffMonth を返す（元は変更しない）"""
+        return replace(
+            self, days={day: record for day, record in self.days.items() if keep(record)}
+        )
+
+    @classmethod
+    def from_dict(cls, attendance_data: Dict[Any, Any]) -> "StaffMonth":
+        """従来の dict から作る（テストや、dict で受け取った既存の呼び出し元向け）"""
+        header = MonthHeader(
+            **{name: attendance_data.get(key) for name, key, _ in HEADER_FIELDS}
+        )
+        days = {
+            day: DayRecord.from_dict(day, record)
+            for day, record in attendance_data.items()
+            if isinstance(day, int)
+        }
+        return cls(header, days)
@@ -1,7 +1,22 @@
 import argparse
+import io
 import json
-import pandas as pd
+import os
 import sys
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from app.metrics import span
 
 # 照合する項目リスト
 REQUIRED_COLUMNS = [
@@ -15,82 +30,199 @@ REQUIRED_COLUMNS = [
     "時間休計",
 ]
 
+# 1回に解析する行数。必要な列だけを読み、チャンクごとに解析・照合する
+CSV_CHUNK_ROWS = 10_000
+# アップロードされたCSV 1ファイルあたりの上限（バイト）
+MAX_CSV_BYTES = int(os.getenv("CSV_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
 
-def compare_csv_files(old_file_path: str, new_file_path: str) -> str:
+CsvSource = Union[str, "os.PathLike[str]", IO[bytes], IO[str]]
+
+
+class CsvDifference(NamedTuple):
+    """社員1人・1項目の差異"""
+
+    employee_id: str
+    column: str
+    old: Optional[str]
+    new: Optional[str]
+
+
+class CsvTooLargeError(ValueError):
+    """CSVが MAX_CSV_BYTES を超えた"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"CSVファイルが大きすぎます（上限 {limit} バイト）")
+        self.limit = limit
+
+
+class SizeLimitedReader(io.RawIOBase):
+    """
+    ファイルオブジェクトをそのまま読みながら、読み込んだ量が上限を超えたら CsvTooLargeError にする。
+    アップロード（Starlette の SpooledTemporaryFile）を別のファイルにコピーせず、パーサーへ直接渡すために使う。
     """
-    新旧2つの勤怠集計CSVファイルを比較し、差異をJSON形式で返します。
 
-    Args:
-        old_file_path (str): 旧システムのCSVファイルパス。
-        new_file_path (str): 新システムのCSVファイルパス。
+    def __init__(self, fp: IO[bytes], limit: int):
+        self._fp = fp
+        self._limit = limit
+        self._read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._fp.read(len(buffer))
+        self._read += len(data)
+        if self._read > self._limit:
+            raise CsvTooLargeError(self._limit)
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class SizeLimitedTextReader(io.TextIOBase):
+    """
+    SizeLimitedReader のテキスト版。読み込んだ文字列を UTF-8 のバイト数で数え、
+    パスやバイナリのファイルオブジェクトと同じ max_bytes で上限を確認する。
+    """
+
+    def __init__(self, fp: IO[str], limit: int):
+        self._fp = fp
+        self._limit = limit
+        self._read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _count(self, text: str) -> str:
+        self._read += len(text.encode("utf-8"))
+        if self._read > self._limit:
+            raise CsvTooLargeError(self._limit)
+        return text
+
+    def read(self, size: Optional[int] = -1) -> str:
+        return self._count(self._fp.read(size))
+
+    def readline(self, size: Optional[int] = -1) -> str:
+        return self._count(self._fp.readline(size))
+
+
+def _read_required_chunks(source: CsvSource, limit: int) -> Iterator[Any]:
+    """
+    必要な列だけを、CSV_CHUNK_ROWS 行ずつの DataFrame（REQUIRED_COLUMNS の順、値は文字列）で返す。
+    ファイルを開いてヘッダーを読むところまでは呼び出し時に行う（FileNotFoundError などはここで出る）。
+    """
+    import pandas as pd
+
+    if hasattr(source, "read"):
+        if isinstance(source, io.TextIOBase):
+            reader_source = SizeLimitedTextReader(source, limit)
+        else:
+            reader_source = io.BufferedReader(SizeLimitedReader(source, limit))
+    else:
+        if os.path.getsize(source) > limit:
+            raise CsvTooLargeError(limit)
+        reader_source = source
+    # すべての列を文字列(object)として読み込み、pandasの型推論を避ける
+    # これにより、"0.0" と "0" のようなデータ型の違いを厳密に比較できる
+    chunks = pd.read_csv(
+        reader_source,
+        dtype=object,
+        usecols=lambda column: column in REQUIRED_COLUMNS,
+        chunksize=CSV_CHUNK_ROWS,
+    )
+    # 必要な項目が不足していれば KeyError
+    return (chunk[REQUIRED_COLUMNS] for chunk in chunks)
+
+
+def _iter_rows(chunks: Iterable[Any]) -> Iterator[Tuple[Any, ...]]:
+    """チャンクを (社員ID, 項目の値...) のタプルにする。空欄は None"""
+    import pandas as pd
+
+    for chunk in chunks:
+        for row in chunk.itertuples(index=False, name=None):
+            yield tuple(None if pd.isna(value) else value for value in row)
+
+
+@span("compare_csv_files")
+def compare_csv_files(
+    old_file_path: CsvSource, new_file_path: CsvSource, max_bytes: int = MAX_CSV_BYTES
+) -> str:
+    """
+    新旧2つの勤怠集計CSVファイルを比較し、差異をJSON形式で返します。
+    引数と例外は iter_csv_differences と同じです。
 
     Returns:
         str: 差異をJSON形式で表現した文字列。差異がなければ空のJSON '{}' を返します。
+    """
+    differences = iter_csv_differences(old_file_path, new_file_path, max_bytes)
+    return json.dumps(group_differences(differences), indent=2, ensure_ascii=False)
+
+
+def group_differences(
+    differences: Iterable[CsvDifference],
+) -> Dict[str, List[Dict[str, Dict[str, Any]]]]:
+    """差異を社員IDごとにまとめる（compare_csv_files のJSONの形）"""
+    diff_results: Dict[str, List[Dict[str, Dict[str, Any]]]] = {}
+    for difference in differences:
+        diff_results.setdefault(difference.employee_id, []).append(
+            {difference.column: {"旧": difference.old, "新": difference.new}}
+        )
+    return diff_results
+
+
+def iter_csv_differences(
+    old_file_path: CsvSource, new_file_path: CsvSource, max_bytes: int = MAX_CSV_BYTES
+) -> Iterator[CsvDifference]:
+    """
+    新旧2つの勤怠集計CSVファイルを比較し、差異を新ファイルの行順・項目の順に返します。
+
+    旧ファイルは照合する項目だけを社員IDごとのタプルとして保持し、
+    新ファイルは CSV_CHUNK_ROWS 行ずつ読みながら照合します（新ファイル全体をメモリに置かない）。
+    旧ファイルにだけある社員は差異として扱いません。
+
+    Args:
+        old_file_path: 旧システムのCSVファイルパス、またはファイルオブジェクト（アップロードなど）。
+        new_file_path: 新システムのCSVファイルパス、またはファイルオブジェクト。
+        max_bytes: 1ファイルあたりの上限（バイト）。テキストのファイルオブジェクトは UTF-8 に換算して数えます。
+
+    Yields:
+        CsvDifference: 差異のある社員・項目ごとに1件。
 
     Raises:
         FileNotFoundError: 指定されたファイルが存在しない場合。
         ValueError: ファイルがCSV形式でない、または必要な項目が不足している場合。
+        CsvTooLargeError: ファイルが max_bytes を超えた場合。
     """
-    # --- 1. ファイル形式チェック ---
-    if not old_file_path.lower().endswith(".csv") or not new_file_path.lower().endswith(
-        ".csv"
-    ):
-        raise ValueError("指定されたファイルはCSV形式ではありません。")
+    # --- 1. ファイル形式チェック（パス指定のときのみ。アップロードは呼び出し側で確認する） ---
+    for source in (old_file_path, new_file_path):
+        if not hasattr(source, "read") and not os.fspath(source).lower().endswith(
+            ".csv"
+        ):
+            raise ValueError("指定されたファイルはCSV形式ではありません。")
 
     # --- 2. CSV読み込みとヘッダー検証 ---
+    # pandas は読み込みが重いため、照合の実行時に読み込む（サーバーの起動時間短縮）
     try:
-        # すべての列を文字列(object)として読み込み、pandasの型推論を避ける
-        # これにより、"0.0" と "0" のようなデータ型の違いを厳密に比較できる
-        df_old = pd.read_csv(old_file_path, dtype=object).fillna(pd.NA)
-        df_new = pd.read_csv(new_file_path, dtype=object).fillna(pd.NA)
+        old_chunks = _read_required_chunks(old_file_path, max_bytes)
+        new_chunks = _read_required_chunks(new_file_path, max_bytes)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"ファイルが見つかりません: {e.filename}")
 
-    # missing_cols_old = set(REQUIRED_COLUMNS) - set(df_old.columns)
-    # if missing_cols_old:
-    #     raise ValueError(f"旧CSVファイルに必要な項目が不足しています: {missing_cols_old}")
-
-    # missing_cols_new = set(REQUIRED_COLUMNS) - set(df_new.columns)
-    # if missing_cols_new:
-    #     raise ValueError(f"新CSVファイルに必要な項目が不足しています: {missing_cols_new}")
-
-    # --- 3. "社員ID"をキーに外部マージ ---
-    # 必要な項目のみを対象にマージする
-    df_merged = pd.merge(
-        df_old[REQUIRED_COLUMNS],
-        df_new[REQUIRED_COLUMNS],
-        on="社員ID",
-        how="outer",
-        suffixes=("_old", "_new"),
-    )
+    # --- 3. 旧ファイルを社員IDごとにまとめる ---
+    # 同じ社員IDが複数行あれば、すべての組み合わせを照合する（"社員ID"での外部結合と同じ）
+    old_rows: Dict[Any, List[Tuple[Any, ...]]] = {}
+    for employee_id, *values in _iter_rows(old_chunks):
+        old_rows.setdefault(employee_id, []).append(tuple(values))
 
-    # --- 4. 差分抽出 ---
-    diff_results = {}
+    # --- 4. 新ファイルをチャンクごとに照合して差分抽出 ---
     compare_columns = [col for col in REQUIRED_COLUMNS if col != "社員ID"]
-    # print(f"Comparing columns: {compare_columns}")
-
-    for _, row in df_merged.iterrows():
-        employee_id = row["社員ID"]
-        differences = []
-
-        for col in compare_columns:
-            val_old = row[f"{col}_old"]
-            val_new = row[f"{col}_new"]
-            # print(f"New val for {employee_id} {col}: {val_new}")
-
-            # pd.NA を None に変換してから比較
-            v_old = None if pd.isna(val_old) else val_old
-            v_new = None if pd.isna(val_new) else val_new
-
-            if v_old != v_new and v_new is not None:
-                # 元のCSVの値をそのまま使いたいので、数値への変換は行わない
-                differences.append({col: {"旧": v_old, "新": v_new}})
-
-        if differences:
-            diff_results[employee_id] = differences
-
-    # --- 5. JSON形式で返却 ---
-    return json.dumps(diff_results, indent=2, ensure_ascii=False)
+    missing: List[Tuple[Any, ...]] = [(None,) * len(compare_columns)]
+
+    for employee_id, *new_values in _iter_rows(new_chunks):
+        for old_values in old_rows.get(employee_id, missing):
+            for col, v_old, v_new in zip(compare_columns, old_values, new_values):
+                if v_old != v_new and v_new is not None:
+                    # 元のCSVの値をそのまま使いたいので、数値への変換は行わない
+                    yield CsvDifference(employee_id, col, v_old, v_new)
 
 
 def main():
@@ -0,0 +1,99 @@
+"""
+collect_attendance_data の結果（固定項目 + 日ごとのレコード）を表として扱う軽量な層。
+
+1か月分（最大31行）の表示・出力のために DataFrame を作って転置する必要はないため、
+日ごとのレコードから直接 HTML / CSV を出力します。列の順序は convert_to_dataframe と同じ
+（最初に現れた順）で、セルの表示も DataFrame.to_html / to_csv に合わせています。
+pandas は CSV照合（csv_comparator）など、まとめて分析する処理でのみ使います。
+"""
+
+import csv
+import io
+from dataclasses import dataclass
+from html import escape
+from typing import Any, Dict, Iterator, List, Sequence, TextIO, Tuple
+
+from app.logics.logic_util import FIXED_KEY_MAP
+
+
+class _Missing:
+    """その日のレコードに存在しない列（DataFrame では NaN）"""
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+@dataclass(frozen=True)
+class DayTable:
+    header: List[Tuple[str, Any]]  # 固定項目 (社員ID, 勤務形態, ...)
+    columns: List[str]
+    rows: List[List[Any]]  # 1日1行。存在しない列は MISSING
+
+
+def build_day_table(staff_data_dict: Dict[Any, Any]) -> DayTable:
+    """固定項目と日ごとのレコードに分ける。元の dict は変更しない"""
+    header = []
+    days = []
+    for key, value in staff_data_dict.items():
+        if key in FIXED_KEY_MAP:
+            header.append((key, value))
+        else:
+            days.append(value)
+    columns: List[str] = []
+    seen = set()
+    for day in days:
+        for column in day:
+            if column not in seen:
+                seen.add(column)
+                columns.append(column)
+    rows = [[day.get(column, MISSING) for column in columns] for day in days]
+    return DayTable(header, columns, rows)
+
+
+def html_cell(value: Any) -> str:
+    # DataFrame.to_html と同じく、None は "None"、欠けた列は "NaN" と表示する
+    return "NaN" if value is MISSING else str(value)
+
+
+def csv_cell(value: Any) -> str:
+    # DataFrame.to_csv と同じく、None と欠けた列は空欄
+    return "" if value is None or value is MISSING else str(value)
+
+
+def to_html(table: DayTable, classes: Sequence[str] = ("table", "table-striped")) -> str:
+    """DataFrame.to_html(index=False) と同じ構造の <table> を返す（値はエスケープする）"""
+    class_attr = " ".join(("dataframe", *classes))
+    parts = [
+        f'<table border="1" class="{escape(class_attr)}">\n',
+        '  <thead>\n    <tr style="text-align: right;">\n',
+    ]
+    parts.extend(f"      <th>{escape(column)}</th>\n" for column in table.columns)
+    parts.append("    </tr>\n  </thead>\n  <tbody>\n")
+    for row in table.rows:
+        parts.append("    <tr>\n")
+        parts.extend(f"      <td>{escape(html_cell(value))}</td>\n" for value in row)
+        parts.append("    </tr>\n")
+    parts.append("  </tbody>\n</table>")
+    return "".join(parts)
+
+
+def iter_csv_rows(table: DayTable, include_header: bool = True) -> Iterator[List[str]]:
+    if include_header:
+        yield list(table.columns)
+    for row in table.rows:
+        yield [csv_cell(value) for value in row]
+
+
+def write_csv(table: DayTable, fp: TextIO, include_header: bool = True) -> None:
+    writer = csv.writer(fp, lineterminator="\n")
+    writer.writerows(iter_csv_rows(table, include_header))
+
+
+def to_csv(table: DayTable, include_header: bool = True) -> str:
+    """DataFrame.to_csv(index=False) と同じ内容の文字列を返す"""
+    buffer = io.StringIO()
+    write_csv(table, buffer, include_header)
+    return buffer.getvalue()
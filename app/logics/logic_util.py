@@ -1,7 +1,8 @@
 import calendar
-from typing import Dict, Tuple, Any
+from typing import TYPE_CHECKING, Dict, Tuple, Any
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def get_date_range(specified_month: str) -> Tuple[str, str]:
@@ -22,6 +23,10 @@ FIXED_KEY_MAP = {
 
 
 def convert_to_dataframe(dict_data: Dict[Any, Any]) -> "pd.DataFrame":
+    # まとめて分析する処理向け。画面表示・出力は app.logics.day_table を使う
+    # pandas は読み込みが重いため、使うときに読み込む
+    import pandas as pd
+
     for key in list(dict_data.keys()):
         if key in FIXED_KEY_MAP.keys():
             del dict_data[key]
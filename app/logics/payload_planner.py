@@ -0,0 +1,163 @@
+"""
+AIに送る勤怠データ（diet_collect_attendance_data の出力）の量の調整。
+
+送る前にトークン数を見積もり、上限 (LLM_PAYLOAD_TOKEN_BUDGET) 以内ならそのまま送ります。
+超える場合（複数月・複数社員など）は、社員・月ごとの合計と異常のある日だけに切り替え、
+それでも超える場合は異常のある日を多い社員・月から後ろの日付順に省きます。
+省いた内容は PayloadPlan.omitted に記録し、AIと画面の両方に伝えます。
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.logics.time_format import parse_hours
+
+logger = logging.getLogger(__name__)
+
+LLM_PAYLOAD_TOKEN_BUDGET = int(os.getenv("LLM_PAYLOAD_TOKEN_BUDGET", "8000"))
+
+# 社員・月ごとの送信データ: (対象月, [固定項目, 日ごとのレコード...])
+PayloadSection = Tuple[str, List[Dict[str, Any]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数の概算。英数字・記号は約4文字で1トークン、日本語は約1文字で1トークンとして数える
+    （モデルのトークナイザーを呼ばずに、送信前に手元で判定するため）。
+    """
+    ascii_count = len(text.encode("ascii", "ignore"))
+    return ascii_count // 4 + (len(text) - ascii_count) + 1
+
+
+def dump_payload(payload: Any) -> str:
+    # diet_collect_attendance_data と同じく区切りの空白を省く
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass
+class PayloadPlan:
+    text: str
+    mode: str  # full: そのまま / summary: 合計と異常のある日のみ
+    estimated_tokens: int
+    budget: int
+    omitted: Dict[str, int] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        """省略した内容の説明（AIへの指示と画面表示に使う）。省略がなければ空文字"""
+        if self.mode == "full":
+            return ""
+        parts = [
+            f"データ量が上限（約{self.budget}トークン）を超えるため、"
+            "社員・月ごとの合計（totals）と異常のある日（days）のみを送っています。"
+        ]
+        if self.omitted.get("normal_days"):
+            parts.append(f"異常のない {self.omitted['normal_days']} 日分は合計のみです。")
+        if self.omitted.get("anomalous_days"):
+            parts.append(
+                f"異常のある日のうち {self.omitted['anomalous_days']} 日分も省略しました"
+                "（各社員・月の anomalous_days_omitted）。"
+            )
+        if self.estimated_tokens > self.budget:
+            parts.append("合計だけでも上限を超えています。")
+        return "".join(parts)
+
+
+def summarize_section(month: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """1社員・1か月分を、合計と異常のある日だけにする"""
+    header, days = (records[0], records[1:]) if records else ({}, [])
+    anomaly_counts: Counter = Counter()
+    notifications: Counter = Counter()
+    overtime = shortfall = work = real = 0.0
+    overtime_application_days = time_off_days = 0
+    for day in days:
+        work += parse_hours(day.get("wt", ""))
+        real += parse_hours(day.get("rt", ""))
+        ot = parse_hours(day.get("ot", ""))
+        if ot > 0:
+            overtime += ot
+        else:
+            shortfall += ot
+        overtime_application_days += day.get("oa") == "1"
+        time_off_days += day.get("tr") not in ("", "0", None)
+        notifications.update(name for name in (day.get("am"), day.get("pm")) if name)
+        anomaly_counts.update(code for code in (day.get("an") or "").split(",") if code)
+    return {
+        "m": month,
+        **header,
+        "totals": {
+            "days": len(days),
+            "wt": round(work, 2),
+            "rt": round(real, 2),
+            # 時間外の正負は意味が違う（残業 / 届出漏れの可能性）ため分けて合計する
+            "ot_plus": round(overtime, 2),
+            "ot_minus": round(shortfall, 2),
+            "oa_days": overtime_application_days,
+            "tr_days": time_off_days,
+            "notifications": dict(notifications),
+            "an": dict(anomaly_counts),
+        },
+        "days": [day for day in days if day.get("an")],
+    }
+
+
+def plan_payload(
+    sections: Sequence[PayloadSection], budget: int = LLM_PAYLOAD_TOKEN_BUDGET
+) -> PayloadPlan:
+    """送信するデータを決める。1件だけならその出力のまま、複数なら月ごとの配列のまま送る"""
+    full = sections[0][1] if len(sections) == 1 else [
+        {"m": month, "data": records} for month, records in sections
+    ]
+    text = dump_payload(full)
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return PayloadPlan(text, "full", tokens, budget)
+
+    summaries = [summarize_section(month, records) for month, records in sections]
+    total_days = sum(max(len(records) - 1, 0) for _, records in sections)
+    anomalous = sum(len(summary["days"]) for summary in summaries)
+    omitted = {"normal_days": total_days - anomalous, "anomalous_days": 0}
+
+    # 日ごとのレコードの分を個別に見積もり、全体を何度も文字列化せずに削る量を決める
+    # （省いた件数の項目が増える分があるため、削った後に全体を数え直す）
+    day_tokens = [[estimate_tokens(dump_payload(day)) for day in s["days"]] for s in summaries]
+    tokens = estimate_tokens(dump_payload(summaries))
+    while tokens > budget and any(summary["days"] for summary in summaries):
+        remaining = tokens
+        while remaining > budget:
+            index = max(range(len(summaries)), key=lambda i: len(summaries[i]["days"]))
+            if not summaries[index]["days"]:
+                break
+            summaries[index]["days"].pop()
+            remaining -= day_tokens[index].pop() + 1  # 区切りのカンマの分
+            summaries[index]["anomalous_days_omitted"] = (
+                summaries[index].get("anomalous_days_omitted", 0) + 1
+            )
+            omitted["anomalous_days"] += 1
+        tokens = estimate_tokens(dump_payload(summaries))
+
+    text = dump_payload(summaries)
+    plan = PayloadPlan(text, "summary", estimate_tokens(text), budget, omitted)
+    logger.info(
+        "Payload summarized: %d tokens (budget %d), omitted %s",
+        plan.estimated_tokens,
+        budget,
+        omitted,
+    )
+    return plan
+
+
+def plan_tool_result(
+    month: str, tool_text: str, budget: int = LLM_PAYLOAD_TOKEN_BUDGET
+) -> PayloadPlan:
+    """MCPツールの結果（JSON文字列）から計画する。エラーなどJSONでないものはそのまま送る"""
+    try:
+        records = json.loads(tool_text)
+    except ValueError:
+        return PayloadPlan(tool_text, "full", estimate_tokens(tool_text), budget)
+    if not isinstance(records, list):
+        return PayloadPlan(tool_text, "full", estimate_tokens(tool_text), budget)
+    return plan_payload([(month, records)], budget)
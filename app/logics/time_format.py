@@ -0,0 +1,61 @@
+"""
+勤怠表示用の時間フォーマット。
+
+timedelta や秒数を、正規表現や str(timedelta) を使わずに整数演算だけで
+"H:MM" / "HH:MM" 形式へ変換します。一日の範囲（0〜24時間）の文字列は
+あらかじめテーブル化しておき、行ごとの計算ではインデックス参照だけで済ませます。
+"""
+
+from datetime import timedelta
+
+# 事前に文字列化しておく範囲（分単位、0〜24時間）
+TABLE_MAX_MINUTES = 24 * 60
+
+# 実働時間・通常休憩時間用 "7:00"（時は0埋めなし、str(timedelta) 互換）
+_WORK_TIME_TABLE = [
+    f"{m // 60}:{m % 60:02d}" for m in range(TABLE_MAX_MINUTES + 1)
+]
+# リアル実働時間・時間外用 "07:00"
+_RT_TABLE = [f"{m // 60:02d}:{m % 60:02d}" for m in range(TABLE_MAX_MINUTES + 1)]
+
+
+def format_work_time(value: timedelta) -> str:
+    """
+    実働時間・通常休憩時間の表示。0以下は "0.0" を返します。
+    例: timedelta(hours=7) → "7:00", timedelta(minutes=45) → "0:45"
+    """
+    if value <= timedelta(0):
+        return "0.0"
+    # timedelta の内部値から分を取り出す（秒未満は切り捨て）
+    minutes = (value.days * 86400 + value.seconds) // 60
+    if minutes <= TABLE_MAX_MINUTES:
+        return _WORK_TIME_TABLE[minutes]
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def format_rt(seconds: float) -> str:
+    """
+    秒数を HH:MM に変換します。負の値は "-03:18" のように符号を付けます。
+    1時間未満の負の値も "-00:30" となり、符号が落ちません。
+    """
+    if seconds == 0.0:
+        return "00:00"
+    # 絶対値で分を求めてから符号を付けるので、丸め方向を気にしなくてよい
+    minutes = int(-seconds if seconds < 0 else seconds) // 60
+    if minutes <= TABLE_MAX_MINUTES:
+        hm = _RT_TABLE[minutes]
+    else:
+        hm = f"{minutes // 60:02d}:{minutes % 60:02d}"
+    return f"-{hm}" if seconds < 0 else hm
+
+
+def parse_hours(text: str) -> float:
+    """
+    format_work_time / format_rt の表示を時間数に戻します（集計用）。
+    例: "7:30" → 7.5, "-00:30" → -0.5, "0.0" や空文字 → 0.0
+    """
+    if not text or ":" not in text:
+        return 0.0
+    sign = -1.0 if text.startswith("-") else 1.0
+    hours, minutes = text.lstrip("-").split(":")
+    return sign * (int(hours) + int(minutes) / 60)
@@ -0,0 +1,294 @@
+"""
+処理段階ごとの計測と、Prometheus テキスト形式での出力。
+
+外部ライブラリを増やさないよう、カウンター・ヒストグラム・ゲージを最小限で実装しています。
+/metrics エンドポイント（app/server/endpoint.py）から REGISTRY.render() を返します。
+
+使い方:
+    with span("get_perfect_contract_attendance"):
+        records = query.all()
+
+    @span("compare_csv_files")
+    def compare_csv_files(...): ...
+"""
+
+import bisect
+import functools
+import os
+import resource
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# 勤怠一ヶ月分の処理を想定したバケット（秒）
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}"
+            )
+        return lines
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 → ([バケットごとの件数..., +Inf], 合計)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, amount: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, amount)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                labelvalues, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += amount
+
+    def count(self, *labelvalues: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(labelvalues, ([0], [0.0]))
+            return sum(counts)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = [
+                (labelvalues, list(counts), total[0])
+                for labelvalues, (counts, total) in self._values.items()
+            ]
+        for labelvalues, counts, total in items:
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if upper == float("inf") else repr(upper)
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """出力時に関数を呼んで値を取得するゲージ（DBプールの状態など）"""
+
+    metric_type = "gauge"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labelnames=(),
+        metric_type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        try:
+            values = self.callback()
+        except Exception:
+            # 計測のために本処理を止めない
+            return lines
+        for labelvalues, value in values.items():
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "attendance_stage_duration_seconds",
+        "Duration of each processing stage.",
+        labelnames=("stage",),
+    )
+)
+ROWS_PROCESSED: Counter = REGISTRY.register(
+    Counter(
+        "attendance_rows_processed_total",
+        "Attendance rows calculated by collect_attendance_data.",
+    )
+)
+CACHE_HITS: Counter = REGISTRY.register(
+    Counter("attendance_cache_hits_total", "Cache hits.", labelnames=("cache",))
+)
+CACHE_MISSES: Counter = REGISTRY.register(
+    Counter("attendance_cache_misses_total", "Cache misses.", labelnames=("cache",))
+)
+
+
+class span:
+    """処理段階の所要時間を STAGE_SECONDS に記録する（with文・デコレーター兼用）"""
+
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+
+    def __call__(self, func):
+        # デコレーターとして使う場合、呼び出しごとに別インスタンスで計測する（スレッド安全）
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(self.stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, self.stage)
+        return False
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    (CACHE_HITS if hit else CACHE_MISSES).inc(1.0, cache)
+
+
+def register_db_pool_metrics(engine) -> None:
+    """SQLAlchemy のコネクションプールの状態をゲージとして出力する"""
+
+    def collect() -> Dict[LabelValues, float]:
+        pool = engine.pool
+        values: Dict[LabelValues, float] = {}
+        # プールの種類によって持っているメソッドが違う（SQLiteはSingletonThreadPoolなど）
+        for stat in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, stat, None)
+            if callable(method):
+                values[(stat,)] = float(method())
+        return values
+
+    REGISTRY.register(
+        CallbackGauge(
+            "attendance_db_pool_connections",
+            "SQLAlchemy connection pool statistics.",
+            collect,
+            labelnames=("state",),
+        )
+    )
+
+
+def _collect_process() -> Dict[LabelValues, float]:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    values = {("cpu_seconds",): usage.ru_utime + usage.ru_stime}
+    rss = _current_rss_bytes()
+    if rss is not None:
+        values[("resident_memory_bytes",)] = float(rss)
+    return values
+
+
+def _current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+REGISTRY.register(
+    CallbackGauge(
+        "attendance_process",
+        "Resource usage of this worker process.",
+        _collect_process,
+        labelnames=("resource",),
+    )
+)
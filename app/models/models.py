@@ -7,6 +7,7 @@ from sqlalchemy import (
     Float,
     DateTime,
     Date,
+    Index,
     PrimaryKeyConstraint,
 )
 from sqlalchemy.orm import relationship
@@ -292,6 +293,9 @@ class StaffLogin(Base):
 
 class Attendance(Base):
     __tablename__ = "M_ATTENDANCE"
+    # 社員・期間での絞り込み (STAFFID = ? AND WORKDAY BETWEEN ? AND ?) 用
+    # get_distinct_user_query の出勤実績の確認 (EXISTS) も、社員ごとにこのインデックスを使う
+    __table_args__ = (Index("ix_attendance_staff_workday", "STAFFID", "WORKDAY"),)
     id = Column(Integer, primary_key=True)
     STAFFID = Column(Integer, ForeignKey("M_LOGGININFO.STAFFID"), index=True)
     WORKDAY = Column(Date, index=True, nullable=True)
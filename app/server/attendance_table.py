@@ -0,0 +1,103 @@
+"""
+/make-attendance-list の勤怠テーブル（HTML断片）の描画とキャッシュ。
+
+collect_attendance_data の結果を app.logics.day_table で表にし（pandas を使わない）、
+Jinja テンプレート (prompt/attendance_table.html) に埋め込んで描画します。
+描画結果は (社員ID, 対象月, 異常のみ, データの指紋) ごとにメモリへ保存し、
+同じデータの再表示（/chat-with-ai, /user-attendance）では描画をやり直しません。
+テンプレートディレクトリにはファイルを書き込みません。
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from markupsafe import Markup
+
+from app.logics.day_table import build_day_table, to_html
+from app.metrics import record_cache, span
+
+TABLE_TEMPLATE = "prompt/attendance_table.html"
+
+
+class FragmentKey(NamedTuple):
+    staff_id: int
+    target_month: str
+    only_flagged: bool
+    fingerprint: str
+
+
+def data_fingerprint(staff_data_dict: Dict[Any, Any]) -> str:
+    """勤怠データの内容から作る短いハッシュ（データが変われば別のキャッシュになる）"""
+    # 日付(int)と固定項目(str)のキーが混在するため、並びはそのまま文字列化する
+    payload = json.dumps(
+        [[str(key), value] for key, value in staff_data_dict.items()],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class AttendanceFragmentCache:
+    """描画済みのHTML断片のLRUキャッシュ。ワーカーのスレッドから参照されるためロックで保護する"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._fragments: "OrderedDict[FragmentKey, Markup]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: FragmentKey) -> Optional[Markup]:
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+        record_cache("attendance_fragment", fragment is not None)
+        return fragment
+
+    def store(self, key: FragmentKey, fragment: Markup) -> None:
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fragments.clear()
+
+
+attendance_fragments = AttendanceFragmentCache()
+
+
+def render_attendance_table(
+    template,
+    staff_id: int,
+    target_month: str,
+    staff_data_dict: Dict[Any, Any],
+    only_flagged: bool = False,
+) -> Tuple[FragmentKey, Markup]:
+    """キャッシュにあればそれを、なければ template（jinja2.Template）で描画して返す"""
+    key = FragmentKey(
+        int(staff_id), target_month, bool(only_flagged), data_fingerprint(staff_data_dict)
+    )
+    fragment = attendance_fragments.get(key)
+    if fragment is None:
+        with span("render_attendance_table"):
+            table = build_day_table(staff_data_dict)
+            fragment = Markup(
+                template.render(header=table.header, table=Markup(to_html(table)))
+            )
+        attendance_fragments.store(key, fragment)
+    return key, fragment
+
+
+def cached_attendance_table(
+    staff_id: int, target_month: str, only_flagged: bool, fingerprint: str
+) -> Optional[Markup]:
+    """リダイレクト先の画面で、描画済みの断片を取り出す（ほかのワーカーで描画した場合は None）"""
+    return attendance_fragments.get(
+        FragmentKey(int(staff_id), target_month, bool(only_flagged), fingerprint)
+    )
@@ -0,0 +1,236 @@
+"""
+CSV照合（/output-csv-compare）の結果の保存先。
+
+照合結果は社員・項目ごとに1行として SQLite に保存し、画面からは社員ID・項目で絞り込んで
+ページ単位で取り出します（差異が多くても、表示する分だけを読み込む）。
+結果ごとに推測できないIDを振るため、同時に照合しても結果が混ざりません。
+複数ワーカーからは同じファイルを WAL モードで共有します（DIFF_STORE_PATH）。
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.logics.csv_comparator import CsvDifference
+
+DIFF_STORE_PATH = os.getenv("DIFF_STORE_PATH", "state/csv_diff.db")
+# この日数より古い照合結果は、新しい結果を保存するときに削除する
+DIFF_RETENTION_DAYS = float(os.getenv("DIFF_RETENTION_DAYS", "30"))
+# 1ページの件数（既定値と上限）
+DIFF_PAGE_SIZE = 100
+DIFF_PAGE_LIMIT = 500
+# 保存時に一度に INSERT する行数
+_INSERT_BATCH = 1000
+
+
+class DiffRun(NamedTuple):
+    diff_id: str
+    created_at: float
+    old_name: str
+    new_name: str
+    employee_count: int
+    difference_count: int
+    columns: List[str]
+
+
+class DiffStore:
+    """照合結果の保存と検索。ワーカーのスレッドから使われるため、接続はロックで保護する"""
+
+    def __init__(self, path: str = DIFF_STORE_PATH):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS diff_run ("
+                "diff_id TEXT PRIMARY KEY, created_at REAL NOT NULL, "
+                "old_name TEXT NOT NULL, new_name TEXT NOT NULL, "
+                "employee_count INTEGER NOT NULL, difference_count INTEGER NOT NULL)"
+            )
+            # seq: CSVの社員・項目の並び順。ページングの順序に使う
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS diff_row ("
+                "diff_id TEXT NOT NULL REFERENCES diff_run (diff_id) ON DELETE CASCADE, "
+                "seq INTEGER NOT NULL, employee_id TEXT NOT NULL, column_name TEXT NOT NULL, "
+                "old_value TEXT, new_value TEXT, PRIMARY KEY (diff_id, seq)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_diff_row_employee "
+                "ON diff_row (diff_id, employee_id, seq)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_diff_row_column "
+                "ON diff_row (diff_id, column_name, seq)"
+            )
+
+    def save(
+        self,
+        differences: Iterable[CsvDifference],
+        old_name: str = "",
+        new_name: str = "",
+    ) -> str:
+        """
+        差異を保存して照合結果のIDを返す。差異は一括で読み込まず、_INSERT_BATCH 行ずつ書き込む。
+        differences の計算（CSVの解析）中はロックを持たないため、ほかのリクエストの検索を止めない。
+        IDは保存が終わるまで呼び出し元以外に知られないため、途中の結果が見えることはない。
+        """
+        diff_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM diff_run WHERE created_at < ?",
+                (now - DIFF_RETENTION_DAYS * 86400,),
+            )
+            self._conn.execute(
+                "INSERT INTO diff_run VALUES (?, ?, ?, ?, 0, 0)",
+                (diff_id, now, old_name, new_name),
+            )
+        employees = set()
+        count = 0
+        try:
+            batch: List[Tuple[Any, ...]] = []
+            for difference in differences:
+                if difference.employee_id is None:
+                    # 社員IDが空欄の行（CSVの空欄は None で届く）
+                    difference = difference._replace(employee_id="")
+                employees.add(difference.employee_id)
+                batch.append((diff_id, count, *difference))
+                count += 1
+                if len(batch) >= _INSERT_BATCH:
+                    self._insert_rows(batch)
+                    batch = []
+            self._insert_rows(batch)
+        except BaseException:
+            with self._lock:
+                self._conn.execute("DELETE FROM diff_run WHERE diff_id = ?", (diff_id,))
+            raise
+        with self._lock:
+            self._conn.execute(
+                "UPDATE diff_run SET employee_count = ?, difference_count = ? "
+                "WHERE diff_id = ?",
+                (len(employees), count, diff_id),
+            )
+        return diff_id
+
+    def _insert_rows(self, rows: List[Tuple[Any, ...]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            # 自動コミットのままだと1行ごとにコミットされるため、まとめて1トランザクションにする
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO diff_row (diff_id, seq, employee_id, column_name, "
+                    "old_value, new_value) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def run(self, diff_id: str) -> Optional[DiffRun]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT diff_id, created_at, old_name, new_name, employee_count, "
+                "difference_count FROM diff_run WHERE diff_id = ?",
+                (diff_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            columns = [
+                column
+                for (column,) in self._conn.execute(
+                    "SELECT DISTINCT column_name FROM diff_row WHERE diff_id = ? "
+                    "ORDER BY column_name",
+                    (diff_id,),
+                )
+            ]
+        return DiffRun(*row, columns)
+
+    def query(
+        self,
+        diff_id: str,
+        employee_id: Optional[str] = None,
+        column: Optional[str] = None,
+        offset: int = 0,
+        limit: int = DIFF_PAGE_SIZE,
+    ) -> Tuple[int, List[CsvDifference]]:
+        """絞り込み後の件数と、offset から limit 件の差異を返す"""
+        where = "diff_id = ?"
+        params: List[Any] = [diff_id]
+        # 統計情報がないと、ORDER BY seq のために主キーを全件たどる計画になるため、
+        # 絞り込みに合わせてインデックスを指定する
+        indexed_by = ""
+        if column:
+            where += " AND column_name = ?"
+            params.append(column)
+            indexed_by = "INDEXED BY ix_diff_row_column"
+        if employee_id:
+            where += " AND employee_id = ?"
+            params.append(employee_id)
+            indexed_by = "INDEXED BY ix_diff_row_employee"
+        limit = max(0, min(limit, DIFF_PAGE_LIMIT))
+        with self._lock:
+            (total,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM diff_row {indexed_by} WHERE {where}", params
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT employee_id, column_name, old_value, new_value "
+                f"FROM diff_row {indexed_by} WHERE {where} ORDER BY seq LIMIT ? OFFSET ?",
+                (*params, limit, max(offset, 0)),
+            ).fetchall()
+        return total, [CsvDifference(*row) for row in rows]
+
+    def iter_all(
+        self, diff_id: str, batch_size: int = _INSERT_BATCH
+    ) -> Iterator[CsvDifference]:
+        """
+        すべての差異を、社員IDごと（社員内は保存した順）に返す（ダウンロード用）。
+        同じ社員IDが新CSVの離れた行にあっても、連続して返す。batch_size 行ずつ読む
+        """
+        last: Tuple[str, int] = ("", -1)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT employee_id, column_name, old_value, new_value, seq "
+                    "FROM diff_row INDEXED BY ix_diff_row_employee "
+                    "WHERE diff_id = ? AND (employee_id, seq) > (?, ?) "
+                    "ORDER BY employee_id, seq LIMIT ?",
+                    (diff_id, *last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield CsvDifference(*row[:4])
+            last = (rows[-1][0], rows[-1][4])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def difference_to_dict(difference: CsvDifference) -> Dict[str, Any]:
+    return {
+        "employee_id": difference.employee_id,
+        "column": difference.column,
+        "old": difference.old,
+        "new": difference.new,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def get_diff_store() -> DiffStore:
+    """プロセスで共有するストア（最初の呼び出しで作成する）"""
+    return DiffStore(DIFF_STORE_PATH)
@@ -1,29 +1,83 @@
 from fastapi import FastAPI, Request, status, UploadFile, File, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi import Query
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from starlette.responses import Response
+from markupsafe import Markup
+from starlette.responses import PlainTextResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from mcp.server.sse import SseServerTransport
-from mcp import ClientSession
-from mcp.client.sse import sse_client
-from dotenv import load_dotenv
-from google import genai
 
-import os
+import functools
+import importlib.util
+import itertools
+import json
+import logging
 import anyio
 import jwt
 from pathlib import Path
 import uuid
-from datetime import datetime
+from datetime import date
+from typing import Optional, Tuple
+from urllib.parse import urlencode
 
 from app.logics.attendance_day_collect import collect_attendance_data
-from app.logics.csv_comparator import compare_csv_files
-from app.logics.logic_util import get_date_range, convert_to_dataframe, FIXED_KEY_MAP
+from app.logics.csv_comparator import (
+    MAX_CSV_BYTES,
+    CsvTooLargeError,
+    group_differences,
+    iter_csv_differences,
+)
+from app.logics.anomaly_rules import filter_flagged_days
+from app.logics.payload_planner import plan_tool_result
+from app.logics.logic_util import get_date_range
+from app.database.database_base import Session, engine
+from app.logics.attendance_export import (
+    EXPORT_FORMATS,
+    EXPORT_LAYOUTS,
+    has_staff_attendance,
+    iter_csv_chunks,
+    iter_export_rows,
+    iter_xlsx_chunks,
+    select_staff_ids,
+)
+from app.logging_config import setup_logging
+from app.metrics import REGISTRY, register_db_pool_metrics, span
+from app.server.attendance_table import (
+    TABLE_TEMPLATE,
+    FragmentKey,
+    cached_attendance_table,
+    render_attendance_table,
+)
+from app.server.diff_store import (
+    DIFF_PAGE_LIMIT,
+    DIFF_PAGE_SIZE,
+    difference_to_dict,
+    get_diff_store,
+)
+from app.server.lifespan import app_lifespan, during_lifespan, on_shutdown
+from app.server.llm_gateway import LlmBusyError, get_llm_gateway, llm_gateway_lifespan
+from app.server.profiling import (
+    is_admin_token,
+    list_profiles,
+    profiled,
+    run_in_threadpool,  # 計測中のリクエストではワーカースレッド内で計測する
+)
+from app.server.session_routing import McpSessionRouter
+from app.server.sse_sessions import sse_sessions
+from app.server.streamable_http import StreamableHttpEndpoint
+from app.server.state_backend import get_state_backend
 from .mcp_tools_call import mcp_server  # MCPサーバーインスタンス
 
-app = FastAPI()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(lifespan=app_lifespan)
 
 # 先ほど定義したツール群を登録
 # @mcp_server.list_tools() ...
@@ -31,11 +85,24 @@ app = FastAPI()
 
 # SSEトランスポートのインスタンス化
 sse_transport = SseServerTransport("/messages")
+# 複数ワーカーのとき、ほかのワーカーのセッション宛ての /messages を中継する
+session_router = McpSessionRouter(sse_transport, get_state_backend)
+
+# 同じ mcp_server を Streamable HTTP（stateless）でも公開する。
+# 1回のPOSTで完結するため、SSEの常時接続やセッションの振り分けが要らない
+streamable_http = StreamableHttpEndpoint(mcp_server)
+during_lifespan(streamable_http.run)
+during_lifespan(llm_gateway_lifespan)
+app.add_route("/mcp", streamable_http, include_in_schema=False)
 
 
 async def sse_cleanup(client_ip: str):
-    # ここでセッションの強制クローズやログ記録を行う
-    print(f"Cleaning up resources for {client_ip}")
+    # セッションの強制クローズは sse_sessions（シャットダウン時のドレイン）で行う
+    logger.info(
+        "SSE session closed for %s (%d active)",
+        client_ip,
+        sse_sessions.active_sessions,
+    )
 
 
 # @app.get("/sse")
@@ -78,7 +145,10 @@ async def sse_cleanup(client_ip: str):
 # endpoint.py に追加
 # 以前提供してくれたもの
 class SuppressResponseStartMiddleware:
-    """SSE終了後の二重 http.response.start エラーを抑制するミドルウェア"""
+    """
+    SSE終了後の二重 http.response.start エラーを抑制するミドルウェア
+    （問題になるのは /sse のみ。/mcp は transport が応答を返し切る）
+    """
 
     def __init__(self, app):
         self.app = app
@@ -119,13 +189,26 @@ app.add_middleware(CustomMiddleware)
 @app.get("/sse")
 async def handle_sse(request: Request):
     """MCPクライアントが最初に接続するエンドポイント"""
-    async with sse_transport.connect_sse(
-        request.scope, request.receive, request._send  # type: ignore[reportPrivateUsage]
-    ) as (read_stream, write_stream):
-        # MCPサーバーをこのSSEコネクション上で実行
-        await mcp_server.run(
-            read_stream, write_stream, mcp_server.create_initialization_options()
+    if sse_sessions.draining:
+        # シャットダウン中は、ほかのワーカーに接続し直してもらう
+        return Response(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
         )
+    async with sse_sessions.session():
+        async with session_router.track(
+            request._send  # type: ignore[reportPrivateUsage]
+        ) as send:
+            async with sse_transport.connect_sse(
+                request.scope, request.receive, send
+            ) as (read_stream, write_stream):
+                # MCPサーバーをこのSSEコネクション上で実行
+                await mcp_server.run(
+                    read_stream,
+                    write_stream,
+                    mcp_server.create_initialization_options(),
+                )
+    await sse_cleanup(request.client.host if request.client else "")
 
 
 @app.post("/messages")
@@ -135,7 +218,43 @@ async def handle_messages(request: Request):
     send = request._send  # type: ignore[reportPrivateUsage]
     # send = request.scope.get("send")
     """クライアントからのJSON-RPCリクエストを受けるエンドポイント"""
-    await sse_transport.handle_post_message(scope, recieve, send)
+    await session_router.handle_post(scope, recieve, send)
+
+
+# 計測値の出力（Prometheus テキスト形式）
+register_db_pool_metrics(engine)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def _profile_token(request: Request):
+    return request.headers.get("x-profile-token") or request.query_params.get(
+        "profile_token"
+    )
+
+
+@app.get("/profiles")
+async def handle_list_profiles(request: Request):
+    """保存済みプロファイルの一覧（管理者のみ）"""
+    if not is_admin_token(_profile_token(request)):
+        return Response(status_code=status.HTTP_403_FORBIDDEN)
+    return {"profiles": [path.name for path in list_profiles()]}
+
+
+@app.get("/profiles/{name}")
+async def handle_download_profile(request: Request, name: str):
+    if not is_admin_token(_profile_token(request)):
+        return Response(status_code=status.HTTP_403_FORBIDDEN)
+    # 一覧にあるファイル名のみ許可（パストラバーサル対策）
+    for path in list_profiles():
+        if path.name == name:
+            return FileResponse(path, filename=name)
+    return Response(status_code=status.HTTP_404_NOT_FOUND)
 
 
 # 補足: Webで公開する場合、CORS設定が必要になることが多いです
@@ -161,21 +280,33 @@ def verify_token(token: str):
         return "無効なトークンです"
 
 
-token_store = {}
+# 認証トークン・画面用UUIDは、ユーザーごとのキーで共有状態（state_backend）に保存する
+# （複数ワーカーでも、どのワーカーからも参照できるように）
+AUTH_TOKEN_TTL_SECONDS = 300
+SESSION_UUID_TTL_SECONDS = 8 * 60 * 60
+# AIへの質問を受け付けてから、回答のストリームに接続するまで
+LLM_REQUEST_TTL_SECONDS = 300
+
+
+def is_valid_uuid(uuid: str) -> bool:
+    return get_state_backend().get(f"uuid:{uuid}") is not None
 
 
 @app.get("/secure-data")
 async def read_users_me(request: Request):
     param_token = request.query_params.get("token")
 
-    # トークンを一時的に保存
-    token_store["Auth token"] = param_token
+    # トークンを一時的に保存（リダイレクト先で1回だけ取り出す）
+    token_id = uuid.uuid4().hex
+    get_state_backend().set(
+        f"auth_token:{token_id}", param_token or "", AUTH_TOKEN_TTL_SECONDS
+    )
 
     # リダイレクト時にトークンIDのみを渡す
     # 303 See Other - Must
     # https://stackoverflow.com/questions/73076517/how-to-send-redirectresponse-from-a-post-to-a-get-route-in-fastapi
     return RedirectResponse(
-        url=f"/read-secure?token_id={param_token}",
+        url=f"/read-secure?token_id={token_id}",
         status_code=status.HTTP_303_SEE_OTHER,
     )
 
@@ -185,7 +316,21 @@ async def read_users_me(request: Request):
 BASE_DIR = Path(__file__).resolve().parent.parent
 # print(f"どこdir: {BASE_DIR}")
 
-templates = Jinja2Templates(directory=str(Path(BASE_DIR, "templates")))
+
+@functools.lru_cache(maxsize=None)
+def get_templates():
+    # jinja2 の読み込みは、最初の画面表示まで遅らせる（起動時間の短縮）
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory=str(Path(BASE_DIR, "templates")))
+
+
+@functools.lru_cache(maxsize=None)
+def get_table_template():
+    # 勤怠テーブルの断片はリクエストごとに探さず、コンパイル済みのテンプレートを使い回す
+    return get_templates().get_template(TABLE_TEMPLATE)
+
+
 app.mount(
     path="/static",
     app=StaticFiles(directory=str(Path(BASE_DIR, "static"))),
@@ -196,24 +341,32 @@ app.mount(
 @app.get("/read-secure")
 async def read_secure_data(request: Request):
     token_id = request.query_params.get("token_id")
-    print(f"Received url token: {token_id}")
-    token = token_store.get("Auth token")
+    logger.debug("Received url token: %s", token_id)
+    backend = get_state_backend()
+    token = backend.get(f"auth_token:{token_id}")
+    backend.delete(f"auth_token:{token_id}")
+    if token is None:
+        return {"error": "無効なトークンです"}
 
     verification_result = verify_token(token)
-    # 新しいトークンIDを生成
-    inner_token_id = str(uuid.uuid4())
-    token_store["UUID"] = inner_token_id
 
     if isinstance(verification_result, dict):
+        # 新しいトークンIDを生成
+        inner_token_id = str(uuid.uuid4())
+        backend.set(
+            f"uuid:{inner_token_id}",
+            json.dumps(verification_result, default=str),
+            SESSION_UUID_TTL_SECONDS,
+        )
         # トークンが有効な場合の処理
         # return {
         #     "message": "セキュアデータにアクセスしました",
         #     "user_data": verification_result,
         # }
-        return templates.TemplateResponse(
+        return get_templates().TemplateResponse(
+            request,
             "select_home.html",
             {
-                "request": request,
                 "user_data": verification_result,
                 "uuid": inner_token_id,
             },
@@ -224,19 +377,30 @@ async def read_secure_data(request: Request):
 
 
 @app.get("/csv-diff")
-async def handle_csv_diff(request: Request, uuid: str, filename: str = ""):
+async def handle_csv_diff(request: Request, uuid: str, diff_id: str = ""):
     # UUIDを使ってトークンを取得
-    stored_uuid = token_store.get("UUID")
-    if stored_uuid != uuid:
+    if not is_valid_uuid(uuid):
         return {"error": "無効なUUIDです"}
 
-    return templates.TemplateResponse(
+    diff_run = None
+    if diff_id:
+        diff_run = await run_in_threadpool(get_diff_store().run, diff_id)
+    return get_templates().TemplateResponse(
+        request,
         "csv/csv_diff.html",
-        {"request": request, "uuid": uuid, "json_file_name": filename},
+        {"uuid": uuid, "diff": diff_run, "page_size": DIFF_PAGE_SIZE},
     )
 
 
+def _save_csv_diff(old_csv: UploadFile, new_csv: UploadFile) -> str:
+    # 照合しながら差異を保存する（差異の一覧をメモリにまとめない）
+    with span("compare_csv_files"):
+        differences = iter_csv_differences(old_csv.file, new_csv.file)
+        return get_diff_store().save(differences, old_csv.filename, new_csv.filename)
+
+
 @app.post("/output-csv-compare")
+@profiled("output-csv-compare")
 async def handle_output_csv_diff(
     request: Request,
     uuid: str = Form(...),
@@ -244,132 +408,316 @@ async def handle_output_csv_diff(
     new_csv: UploadFile = File(...),
 ):
     # print(f"Old CSV Path: {old_csv.filename}, New CSV Path: {new_csv.filename}")
-    print(f"Received UUID: {uuid}")
-    stored_uuid = token_store.get("UUID")
-    if stored_uuid != uuid:
+    logger.debug("Received UUID: %s", uuid)
+    if not is_valid_uuid(uuid):
         return {"error": "無効なUUIDです"}
 
-    # ここでCSV差分データの処理を行う
-    json_data = compare_csv_files(old_csv.filename, new_csv.filename)
-    # print(f"CSV差分JSONデータ: {json_data}")
-
-    dateime_format = datetime.today().strftime("%Y%m%d%H%M")
-    json_file = f"csv_diff_{dateime_format}.json"
-    output_file = Path("output_json", json_file)
+    uploads = (old_csv, new_csv)
+    if not all((upload.filename or "").lower().endswith(".csv") for upload in uploads):
+        return {"error": "指定されたファイルはCSV形式ではありません。"}
+    # Content-Length が分かれば、解析を始める前に断る
+    if any(
+        upload.size is not None and upload.size > MAX_CSV_BYTES for upload in uploads
+    ):
+        return JSONResponse(
+            {"error": str(CsvTooLargeError(MAX_CSV_BYTES))},
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        )
 
-    with output_file.open("w", encoding="utf-8") as f:
-        f.write(json_data)
+    # Starlette が受け取ったアップロード（SpooledTemporaryFile）をコピーせずに解析する
+    for upload in uploads:
+        await upload.seek(0)
+    try:
+        diff_id = await run_in_threadpool(_save_csv_diff, old_csv, new_csv)
+    except CsvTooLargeError as e:
+        return JSONResponse(
+            {"error": str(e)}, status_code=status.HTTP_413_CONTENT_TOO_LARGE
+        )
+    except (KeyError, ValueError) as e:
+        logger.warning("CSV comparison failed: %s", e)
+        return {"error": f"CSVを読み込めませんでした: {e}"}
 
-    # return {"message": "CSV差分データを受け取りました"}
     return RedirectResponse(
-        url=f"/csv-diff?uuid={uuid}&filename={json_file}",
+        url=f"/csv-diff?uuid={uuid}&diff_id={diff_id}",
         status_code=status.HTTP_303_SEE_OTHER,
     )
 
 
+@app.get("/csv-diff/{diff_id}/rows")
+async def csv_diff_rows(
+    diff_id: str,
+    uuid: str,
+    employee_id: str = "",
+    column: str = "",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DIFF_PAGE_SIZE, ge=1, le=DIFF_PAGE_LIMIT),
+):
+    """照合結果の差異を、社員ID・項目で絞り込んでページ単位で返す"""
+    if not is_valid_uuid(uuid):
+        return {"error": "無効なUUIDです"}
+    store = get_diff_store()
+    if await run_in_threadpool(store.run, diff_id) is None:
+        return JSONResponse(
+            {"error": "照合結果が見つかりません"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+    total, differences = await run_in_threadpool(
+        store.query, diff_id, employee_id.strip(), column, offset, limit
+    )
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "items": [difference_to_dict(difference) for difference in differences],
+    }
+
+
+def _iter_diff_json(diff_id: str):
+    # compare_csv_files と同じ形（社員IDごとの配列）のJSONを、社員ごとに書き出す
+    # （iter_all は社員IDごとにまとめて返す）
+    yield "{"
+    separator = "\n"
+    for employee_id, group in itertools.groupby(
+        get_diff_store().iter_all(diff_id), key=lambda difference: difference.employee_id
+    ):
+        entries = group_differences(group)[employee_id]
+        yield f"{separator}  {json.dumps(employee_id, ensure_ascii=False)}: "
+        yield json.dumps(entries, ensure_ascii=False)
+        separator = ",\n"
+    yield "\n}\n"
+
+
+@app.get("/csv-diff/{diff_id}/download")
+async def download_csv_diff(diff_id: str, uuid: str):
+    """照合結果の全件を、従来の差分JSONファイルの形式でダウンロードする"""
+    if not is_valid_uuid(uuid):
+        return {"error": "無効なUUIDです"}
+    if await run_in_threadpool(get_diff_store().run, diff_id) is None:
+        return JSONResponse(
+            {"error": "照合結果が見つかりません"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+    return StreamingResponse(
+        _iter_diff_json(diff_id),
+        media_type="application/json",
+        headers={
+            "Content-Disposition": f'attachment; filename="csv_diff_{diff_id}.json"'
+        },
+    )
+
+
+def _collect_in_session(staff_id: int, from_day: str, to_day: str):
+    # スレッドプールで実行する。Session はスレッド間で共有できないため、呼び出しごとに作る
+    with Session() as db:
+        return collect_attendance_data(
+            staff_id=staff_id, from_day=from_day, to_day=to_day, db_session=db
+        )
+
+
+async def _attendance_table(
+    staff_id: int, target_month: str, only_flagged: bool
+) -> Tuple[FragmentKey, Markup]:
+    """勤怠データを集計し、勤怠テーブルのHTML断片を返す（描画済みならキャッシュから）"""
+    from_day, to_day = get_date_range(target_month)
+    staff_data_dict = await run_in_threadpool(
+        _collect_in_session, staff_id, from_day, to_day
+    )
+    if only_flagged:
+        # 異常コードのある日のみ表示
+        staff_data_dict = filter_flagged_days(staff_data_dict, staff_id, target_month)
+    return render_attendance_table(
+        get_table_template(), staff_id, target_month, staff_data_dict, only_flagged
+    )
+
+
+async def _attendance_table_for_page(
+    staff_id: int, target_month: str, only_flagged: bool, fingerprint: str
+) -> Markup:
+    # /make-attendance-list で描画した断片を使う。別のワーカーや追い出し済みなら描画し直す
+    fragment = cached_attendance_table(staff_id, target_month, only_flagged, fingerprint)
+    if fragment is None:
+        _, fragment = await _attendance_table(staff_id, target_month, only_flagged)
+    return fragment
+
+
 @app.post("/make-attendance-list")
+@profiled("make-attendance-list")
 async def get_attendance(
     request: Request,
     uuid: str = Form(...),
     staff_id: str = Form(...),
     target_month: str = Form(...),
+    only_flagged: bool = Form(False),
 ):
     # UUIDを使ってトークンを取得
-    stored_uuid = token_store.get("UUID")
-    if stored_uuid != uuid:
+    if not is_valid_uuid(uuid):
         return {"error": "無効なUUIDです"}
 
-    os.remove("app/templates/prompt/user_attendance.html")
-    import shutil
+    key, _ = await _attendance_table(int(staff_id), target_month, only_flagged)
 
-    # ファイルの入れ替え（移動と上書き）
-    source = "app/templates/user_attendance_front.html"  # 元のファイル
-    destination = (
-        "app/templates/prompt/user_attendance.html"  # 移動先または新しいファイル名
+    query = urlencode(
+        {
+            # 表示先でも同じUUIDで確認する（DBの集計を伴うため）
+            "uuid": uuid,
+            "staff_id": staff_id,
+            "target_month": target_month,
+            "only_flagged": int(only_flagged),
+            "fingerprint": key.fingerprint,
+        }
     )
-
-    # 移動を実行（同名ファイルがある場合は上書き）
-    shutil.copyfile(source, destination)
-
-    from_day, to_day = get_date_range(target_month)
-    staff_data_dict = collect_attendance_data(
-        staff_id=int(staff_id), from_day=from_day, to_day=to_day
+    return RedirectResponse(
+        # url="/user-attendance",
+        url=f"/chat-with-ai?{query}",
+        status_code=status.HTTP_303_SEE_OTHER,
     )
 
-    head_section_html = "<section><div class='flex gap-10 p-4 bg-purple-200 mb-4'>"
-    for head_key, head_value in staff_data_dict.items():
-        if head_key in FIXED_KEY_MAP:
-            head_section_html += f"<div>{head_key}: {head_value}</div>"
-    head_section_html += "</div></section>"
-    template_content = head_section_html
 
-    table_wrap = "<div class='w-[80%] mx-auto border-2 table-wrap overflow-y-auto'>"
-    template_content += table_wrap
+@app.get("/user-attendance")
+async def render_user_attendance(
+    request: Request,
+    uuid: str,
+    staff_id: int,
+    target_month: str,
+    only_flagged: bool = False,
+    fingerprint: str = "",
+):
+    # 断片がキャッシュにない場合は集計し直すため、UUIDを確認する
+    if not is_valid_uuid(uuid):
+        return {"error": "無効なUUIDです"}
 
-    staff_data_df = convert_to_dataframe(staff_data_dict)
-    template_content += staff_data_df.to_html(
-        classes="table table-striped", index=False
+    attendance_table = await _attendance_table_for_page(
+        staff_id, target_month, only_flagged, fingerprint
     )
-    close_table = "</div>"
-    template_content += close_table
-    # print(f"Template Content: {template_content}")
-    # close_html = """</body></html>"""
-    # template_content += close_html
-
-    # with open(
-    #     Path("app/templates/prompt/user_attendance.html"), "a", encoding="utf-8"
-    # ) as f:
-    #     f.write(template_content)
-
-    with open(
-        Path("app/templates/prompt/user_attendance.html"),
-        "a",
-        encoding="utf-8",
-    ) as f:
-        f.write(template_content)
-
-    return RedirectResponse(
-        # url="/user-attendance",
-        url=f"/chat-with-ai?staff_id={staff_id}&target_month={target_month}&list_table=prompt/user_attendance.html",
-        status_code=status.HTTP_303_SEE_OTHER,
+    return get_templates().TemplateResponse(
+        request,
+        "user_attendance_front.html",
+        {"df_data_html": attendance_table},
     )
 
 
-@app.get("/user-attendance")
-async def render_user_attendance(request: Request):
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
 
-    return templates.TemplateResponse(
-        "prompt/user_attendance.html",
-        {"request": request},
+def _iter_export(
+    target_month: str,
+    staff_id: Optional[int],
+    team_code: Optional[int],
+    layout: str,
+    file_format: str,
+):
+    # StreamingResponse がスレッドプールで回す同期ジェネレーター。出力の間だけセッションを持つ
+    with Session() as db:
+        from_day, to_day = get_date_range(target_month)
+        staff_ids = select_staff_ids(
+            db,
+            date.fromisoformat(from_day),
+            date.fromisoformat(to_day),
+            staff_id=staff_id,
+            team_code=team_code,
+        )
+        logger.info(
+            "Exporting %s (%s, %s) for %d staff",
+            target_month,
+            layout,
+            file_format,
+            len(staff_ids),
+        )
+        rows = iter_export_rows(db, target_month, staff_ids, layout)
+        if file_format == "xlsx":
+            yield from iter_xlsx_chunks(rows)
+        else:
+            yield from iter_csv_chunks(rows)
+
+
+def _staff_has_attendance(staff_id: int, target_month: str) -> bool:
+    with Session() as db:
+        return has_staff_attendance(db, staff_id, *get_date_range(target_month))
+
+
+@app.get("/export/attendance")
+async def export_attendance(
+    uuid: str,
+    target_month: str = Query(..., pattern=r"^\d{4}-\d{2}$"),
+    staff_id: Optional[int] = None,
+    team_code: Optional[int] = None,
+    layout: str = "legacy",
+    file_format: str = Query("csv", alias="format"),
+):
+    """
+    月次勤怠のダウンロード（社員・チーム・全社）。
+    社員ごとに計算しながら送るため、全社員分でもメモリ使用量は一定です。
+    layout=legacy は旧システムの集計CSVと同じ列で、/output-csv-compare にそのまま使えます。
+    """
+    if not is_valid_uuid(uuid):
+        return {"error": "無効なUUIDです"}
+    if layout not in EXPORT_LAYOUTS or file_format not in EXPORT_FORMATS:
+        return {"error": "未対応の出力形式です"}
+    if file_format == "xlsx" and importlib.util.find_spec("openpyxl") is None:
+        return {"error": "XLSX出力には openpyxl が必要です"}
+    # 社員指定で勤怠がなければ、出力を始める前に断る（空のファイルを返さない）
+    if staff_id is not None and not await run_in_threadpool(
+        _staff_has_attendance, staff_id, target_month
+    ):
+        return JSONResponse(
+            {"error": "指定された社員の勤怠がありません"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+
+    scope = (
+        f"staff{staff_id}"
+        if staff_id is not None
+        else f"team{team_code}" if team_code is not None else "all"
+    )
+    filename = f"attendance_{target_month}_{scope}_{layout}.{file_format}"
+    return StreamingResponse(
+        _iter_export(target_month, staff_id, team_code, layout, file_format),
+        media_type=EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
-# The client gets the API key from the environment variable `GEMINI_API_KEY`.
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+@on_shutdown
+def close_state_backend():
+    if get_state_backend.cache_info().currsize:
+        get_state_backend().close()
+        get_state_backend.cache_clear()
+
+
+@on_shutdown
+def close_diff_store():
+    if get_diff_store.cache_info().currsize:
+        get_diff_store().close()
+        get_diff_store.cache_clear()
 
 
 @app.get("/chat-with-ai")
 async def chat_with_ai(
     request: Request,
-    list_table: str,
-    # uuid: str,  # = Form(...),
+    uuid: str,
     staff_id: str,  # = Form(...),
     target_month: str,  # = Form(...),
+    only_flagged: bool = False,
+    fingerprint: str = "",
 ):
-    # with open(Path(list_table), "r", encoding="utf-8") as f:
-    #     table_content = f.read()
-
     """Renders the initial prompt page for attendance analysis."""
-    return templates.TemplateResponse(
+    # 断片がキャッシュにない場合は集計し直すため、UUIDを確認する
+    if not is_valid_uuid(uuid):
+        return {"error": "無効なUUIDです"}
+
+    attendance_table = await _attendance_table_for_page(
+        int(staff_id), target_month, only_flagged, fingerprint
+    )
+    return get_templates().TemplateResponse(
+        request,
         "prompt/mcp_prompt.html",
         {
-            "request": request,
-            # "uuid": uuid,
+            "uuid": uuid,
             "staff_id": staff_id,
             "target_month": target_month,
-            "list_table": list_table,
+            "attendance_table": attendance_table,
         },
     )
 
@@ -383,12 +731,18 @@ async def analyze_attendance_prompt(
 ):
     """Fetches attendance data by calling the MCP tool
     and returns the result rendered in HTML."""
-    # 1. MCP サーバーに接続（SSEクライアントとして）
-    async with sse_client("http://127.0.0.1:8001/sse") as (read_stream, write_stream):
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamable_http_client
+
+    # 1. MCP サーバーに接続（Streamable HTTP。SSEの常時接続を張らない）
+    async with streamable_http_client("http://127.0.0.1:8001/mcp") as (
+        read_stream,
+        write_stream,
+        _,
+    ):
         async with ClientSession(read_stream, write_stream) as session:
             await session.initialize()
-            print(f"Staff ID: {request.query_params.get('staff_id')}")
-            print(f"Staff ID: {type(staff_id)}, Target Month: {target_month}")
+            logger.debug("Staff ID: %s, Target Month: %s", staff_id, target_month)
 
             # 2. ツールを呼び出す
             result = await session.call_tool(
@@ -400,18 +754,67 @@ async def analyze_attendance_prompt(
             )
             raw_json = result.content[0].text
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        # contents=f"次の勤怠データを解析して、異常がないか確認してください：{raw_json}",
-        contents=f"{user_input}\n\n{raw_json}",
+    # 3. 上限を超えるデータは、合計と異常のある日だけにする（省いた内容はAIにも伝える）
+    plan = plan_tool_result(target_month, raw_json)
+    payload_note = plan.describe()
+    prompt = f"{user_input}\n\n（{payload_note}）" if payload_note else user_input
+
+    # 4. 質問とデータを保存し、回答は /analyze-attendance-stream からSSEで受け取る
+    #    （ほかのワーカーに接続しても取り出せるよう、共有のバックエンドに置く）
+    request_id = uuid.uuid4().hex
+    get_state_backend().set(
+        f"llm_request:{request_id}",
+        json.dumps({"user_input": prompt, "payload": plan.text}, ensure_ascii=False),
+        ttl=LLM_REQUEST_TTL_SECONDS,
     )
 
-    # 3. 結果を Jinja2 で HTML に変換して返す（htmxがこれを受け取って画面を更新）
-    return templates.TemplateResponse(
+    # 5. 質問と回答の枠を Jinja2 で HTML に変換して返す（htmxがこれを受け取って画面を更新）
+    return get_templates().TemplateResponse(
+        request,
         "prompt/ai_response.html",
         {
-            "request": request,
             "user_input": user_input,
-            "ai_response": response.text,
+            "payload_note": payload_note,
+            "stream_url": f"/analyze-attendance-stream/{request_id}",
         },
     )
+
+
+def sse_event(event: str, data: str) -> str:
+    # 改行を含むテキストは複数の data 行に分ける（ブラウザが改行で連結する）
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+@app.get("/analyze-attendance-stream/{request_id}")
+async def analyze_attendance_stream(request_id: str):
+    """AIの回答を、生成された順に Server-Sent Events で送る（token を繰り返し、最後に done）"""
+    backend = get_state_backend()
+    key = f"llm_request:{request_id}"
+    stored = backend.get(key)
+    if stored is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    # 1回だけ使う（EventSource の再接続で同じ質問を送り直さない）
+    backend.delete(key)
+    question = json.loads(stored)
+
+    async def events():
+        # シャットダウン時のドレインで閉じる対象にする
+        async with sse_sessions.session():
+            try:
+                async for text in get_llm_gateway().stream(
+                    question["user_input"], question["payload"]
+                ):
+                    yield sse_event("token", text)
+            except LlmBusyError as e:
+                yield sse_event("error", str(e))
+            except Exception:
+                logger.exception("LLM streaming failed")
+                yield sse_event("error", "AIの解析に失敗しました")
+            yield sse_event("done", "")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
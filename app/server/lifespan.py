@@ -0,0 +1,216 @@
+"""
+アプリケーションのライフサイクル（FastAPI の lifespan）。
+
+起動時:
+- ログ設定
+- DBコネクションプールの事前接続（SSHトンネル越しの初回接続コストを最初のリクエストに回さない）
+- 参照テーブル（届出・契約）のキャッシュ読み込み
+- 勤怠クエリの事前実行（SQLAlchemy のコンパイル済みクエリキャッシュを温める）
+- バックグラウンドワーカーの開始（参照キャッシュの再読み込み、プロファイルの保持件数の整理）
+- 登録済みの非同期コンテキストに入る（Streamable HTTP トランスポートのタスクグループなど）
+
+終了時:
+- SSEセッションのドレイン（処理中のツール呼び出しを待ってから閉じる）
+- 登録済みの非同期コンテキストを抜ける、ワーカーの停止、
+  登録済みの終了処理（Geminiクライアントのクローズなど）
+- エンジンの破棄、ログの書き出し
+
+環境変数:
+- DB_POOL_WARM_CONNECTIONS: 起動時に接続しておく数 (既定: プールサイズ)
+- REFERENCE_REFRESH_SECONDS: 参照キャッシュの再読み込み間隔 (既定: 600)
+- SSE_DRAIN_TIMEOUT: 処理中の呼び出しを待つ最大秒数 (既定: 30)
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import date
+from typing import AsyncContextManager, Callable, Dict, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.database.attendance_contract_query import ContractTimeAttendance
+from app.database.contract_interval_index import attendance_range_query
+from app.database.database_base import Session, engine
+from app.database.reference_cache import reference_cache
+from app.logging_config import setup_logging, shutdown_logging
+from app.server.profiling import enforce_retention
+from app.server.sse_sessions import sse_sessions
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_WARM_CONNECTIONS = int(os.getenv("DB_POOL_WARM_CONNECTIONS", "0"))
+REFERENCE_REFRESH_SECONDS = float(os.getenv("REFERENCE_REFRESH_SECONDS", "600"))
+SSE_DRAIN_TIMEOUT = float(os.getenv("SSE_DRAIN_TIMEOUT", "30"))
+PROFILE_RETENTION_SECONDS = 300.0
+
+# クエリの事前実行に使う、どの勤怠にも一致しない条件
+_WARM_STAFF_ID = -1
+_WARM_DAY = date(1900, 1, 1)
+
+_shutdown_callbacks: List[Callable[[], None]] = []
+_lifespan_contexts: List[Callable[[], AsyncContextManager]] = []
+
+
+def on_shutdown(callback: Callable[[], None]) -> Callable[[], None]:
+    """終了時に呼ぶ処理を登録する（デコレーターとしても使える）"""
+    _shutdown_callbacks.append(callback)
+    return callback
+
+
+def during_lifespan(
+    factory: Callable[[], AsyncContextManager],
+) -> Callable[[], AsyncContextManager]:
+    """起動から終了まで入っておく非同期コンテキストを登録する（ドレインの後に抜ける）"""
+    _lifespan_contexts.append(factory)
+    return factory
+
+
+class BackgroundWorkers:
+    """一定間隔で同期関数をスレッドプールで実行する、簡易ワーカー"""
+
+    def __init__(self):
+        self._workers: List[Tuple[str, float, Callable[[], None]]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, name: str, interval: float, func: Callable[[], None]) -> None:
+        self._workers.append((name, interval, func))
+
+    def start(self) -> None:
+        for name, interval, func in self._workers:
+            self._tasks.append(
+                asyncio.create_task(self._run(name, interval, func), name=name)
+            )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    @staticmethod
+    async def _run(name: str, interval: float, func: Callable[[], None]) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(func)
+            except Exception:
+                # 1回の失敗でワーカーを止めない
+                logger.exception("Background worker %s failed", name)
+
+
+def warm_db_pool() -> int:
+    """プールのコネクションを先に確立しておく。確立した数を返す"""
+    size = DB_POOL_WARM_CONNECTIONS
+    if size <= 0:
+        pool_size = getattr(engine.pool, "size", None)
+        size = pool_size() if callable(pool_size) else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def load_reference_cache() -> None:
+    with Session() as db:
+        reference_cache.load(db)
+
+
+def warm_compiled_queries() -> None:
+    """勤怠の主要クエリを空振りで実行し、コンパイル結果をキャッシュさせる"""
+    with Session() as db:
+        queries = ContractTimeAttendance(
+            _WARM_STAFF_ID, _WARM_DAY, _WARM_DAY, db_session=db
+        )
+        queries.get_perfect_contract_attendance().all()
+        queries.get_distinct_user_query().all()
+        attendance_range_query(db, _WARM_STAFF_ID, _WARM_DAY, _WARM_DAY).all()
+
+
+def warm_up() -> None:
+    # DBに接続できなくても起動は続ける（最初のリクエストで通常どおり接続する）
+    for step in (warm_db_pool, load_reference_cache, warm_compiled_queries):
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %s failed", step.__name__)
+
+
+workers = BackgroundWorkers()
+workers.register(
+    "reference_cache_refresh", REFERENCE_REFRESH_SECONDS, load_reference_cache
+)
+workers.register("profile_retention", PROFILE_RETENTION_SECONDS, enforce_retention)
+
+
+def _install_drain_on_signal(loop: asyncio.AbstractEventLoop) -> Dict[int, object]:
+    """
+    uvicorn は SIGTERM を受けると、SSE接続が終わるまで lifespan の終了処理を呼ばない。
+    そのため、シグナルの時点でドレインを始める（uvicorn のハンドラーも続けて呼ぶ）。
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return {}
+    drain_tasks = []
+
+    def start_drain() -> None:
+        drain_tasks.append(
+            asyncio.ensure_future(sse_sessions.drain(SSE_DRAIN_TIMEOUT))
+        )
+
+    previous_handlers = {}
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(start_drain)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+        previous_handlers[sig] = previous
+    return previous_handlers
+
+
+def _restore_signal_handlers(previous_handlers: Dict[int, object]) -> None:
+    for sig, handler in previous_handlers.items():
+        signal.signal(sig, handler)
+
+
+@asynccontextmanager
+async def app_lifespan(app):
+    setup_logging()
+    sse_sessions.reset()
+    await run_in_threadpool(warm_up)
+    workers.start()
+    previous_handlers = _install_drain_on_signal(asyncio.get_running_loop())
+    try:
+        async with AsyncExitStack() as contexts:
+            for factory in _lifespan_contexts:
+                await contexts.enter_async_context(factory())
+            logger.info("Application startup complete")
+            try:
+                yield
+            finally:
+                # 処理中の呼び出しを待ってから、登録済みのコンテキストを抜ける
+                await sse_sessions.drain(SSE_DRAIN_TIMEOUT)
+    finally:
+        await workers.stop()
+        for callback in _shutdown_callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Shutdown callback %s failed", callback)
+        _restore_signal_handlers(previous_handlers)
+        engine.dispose()
+        logger.info("Application shutdown complete")
+        shutdown_logging()
@@ -0,0 +1,244 @@
+"""
+LLM（Gemini）呼び出しの窓口。
+
+- 非同期のストリーミングAPIで呼び出し、生成された順にテキストを返す（イベントループを止めない）
+- 同じ (モデル, 質問, データ) の回答はメモリにキャッシュし、再送しない
+- 同時に呼び出す数をセマフォで制限し、超えた分は待たせる。待ちが LLM_MAX_QUEUE を超えたら
+  LlmBusyError で断る（API の利用上限に当たる前に、こちらで流量を抑える）
+- LLM_BACKEND=fake でローカルの偽モデルを使う（テスト・開発用。APIキー不要）
+"""
+
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional, Tuple, Union
+
+from app.metrics import record_cache, span
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+# 待ち行列で待つ最大秒数
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_CACHE_ENTRIES = int(os.getenv("LLM_CACHE_ENTRIES", "256"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+
+class LlmBusyError(RuntimeError):
+    """同時実行数と待ち行列がいっぱいで、受け付けられない"""
+
+
+class LlmBackend(ABC):
+    @abstractmethod
+    def stream(self, model: str, contents: str) -> AsyncIterator[str]:
+        """生成されたテキストを、届いた順に返す"""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class GeminiBackend(LlmBackend):
+    """google-genai の非同期クライアント。クライアントは重いため、最初の呼び出しで作成する"""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._api_key = api_key
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from dotenv import load_dotenv
+            from google import genai
+
+            # The client gets the API key from the environment variable `GEMINI_API_KEY`.
+            load_dotenv()
+            self._client = genai.Client(
+                api_key=self._api_key or os.getenv("GEMINI_API_KEY")
+            )
+        return self._client
+
+    async def stream(self, model: str, contents: str) -> AsyncIterator[str]:
+        chunks = await self._get_client().aio.models.generate_content_stream(
+            model=model, contents=contents
+        )
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+    async def aclose(self) -> None:
+        # 作成済みの場合のみ閉じる
+        if self._client is not None:
+            await self._client.aio.aclose()
+            self._client.close()
+            self._client = None
+
+
+class FakeLlmBackend(LlmBackend):
+    """
+    ローカルの偽モデル。reply（文字列、または contents を受け取る関数）を
+    chunk_size 文字ずつ、delay 秒おきに返す。呼び出された contents を calls に記録する。
+    """
+
+    def __init__(
+        self,
+        reply: Union[str, Callable[[str], str]] = "勤怠データを確認しました。",
+        chunk_size: int = 8,
+        delay: float = 0.0,
+    ):
+        self._reply = reply
+        self._chunk_size = chunk_size
+        self._delay = delay
+        self.calls: List[str] = []
+
+    async def stream(self, model: str, contents: str) -> AsyncIterator[str]:
+        self.calls.append(contents)
+        text = self._reply(contents) if callable(self._reply) else self._reply
+        for start in range(0, len(text), self._chunk_size):
+            await asyncio.sleep(self._delay)
+            yield text[start : start + self._chunk_size]
+
+
+def response_key(model: str, prompt: str, payload: str) -> str:
+    """キャッシュのキー。データ（payload）は大きいため、ハッシュにして持つ"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model, prompt, payload):
+        encoded = part.encode("utf-8")
+        # 区切りを含む文字列どうしが同じキーにならないよう、長さも入れる
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class LlmResponseCache:
+    """回答のLRUキャッシュ（期限付き）。イベントループからのみ使うため、ロックは持たない"""
+
+    def __init__(self, max_entries: int = LLM_CACHE_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._responses: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._responses.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._responses[key]
+            entry = None
+        if entry is not None:
+            self._responses.move_to_end(key)
+        record_cache("llm_response", entry is not None)
+        return entry[1] if entry is not None else None
+
+    def store(self, key: str, text: str) -> None:
+        if self.max_entries <= 0:
+            return
+        self._responses[key] = (time.monotonic() + self.ttl, text)
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        self._responses.clear()
+
+
+class LlmGateway:
+    def __init__(
+        self,
+        backend: LlmBackend,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        cache: Optional[LlmResponseCache] = None,
+    ):
+        self.backend = backend
+        self.model = model
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cache = cache if cache is not None else LlmResponseCache()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @asynccontextmanager
+    async def _slot(self):
+        """同時実行の枠を1つ取る。空きがなければ待ち行列に並ぶ"""
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue:
+                raise LlmBusyError("AIの解析が混み合っています。しばらくしてから再度お試しください")
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise LlmBusyError("AIの解析の待ち時間が上限を超えました") from None
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def stream(self, prompt: str, payload: str = "") -> AsyncIterator[str]:
+        """
+        質問 (prompt) とデータ (payload) をモデルに送り、回答を届いた順に返す。
+        キャッシュにあれば、まとめて1回で返す。途中で切断された回答はキャッシュしない。
+        """
+        key = response_key(self.model, prompt, payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        contents = f"{prompt}\n\n{payload}" if payload else prompt
+        chunks: List[str] = []
+        async with self._slot():
+            with span("llm_stream"):
+                async for text in self.backend.stream(self.model, contents):
+                    chunks.append(text)
+                    yield text
+        self.cache.store(key, "".join(chunks))
+
+    async def generate(self, prompt: str, payload: str = "") -> str:
+        """回答の全文を返す"""
+        return "".join([text async for text in self.stream(prompt, payload)])
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+
+def create_llm_backend(kind: str = LLM_BACKEND) -> LlmBackend:
+    if kind == "gemini":
+        backend: LlmBackend = GeminiBackend()
+    elif kind == "fake":
+        backend = FakeLlmBackend()
+    else:
+        raise ValueError(f"未対応の LLM_BACKEND です: {kind}")
+    logger.info("LLM backend: %s", kind)
+    return backend
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm_gateway() -> LlmGateway:
+    """プロセスで共有するゲートウェイ（最初の呼び出しで作成する）"""
+    return LlmGateway(create_llm_backend())
+
+
+@asynccontextmanager
+async def llm_gateway_lifespan():
+    """アプリケーションの終了時に、作成済みのクライアントを閉じる（during_lifespan に登録する）"""
+    try:
+        yield
+    finally:
+        if get_llm_gateway.cache_info().currsize:
+            await get_llm_gateway().aclose()
+            get_llm_gateway.cache_clear()
@@ -1,4 +1,3 @@
-from fastapi.concurrency import run_in_threadpool  # FastAPIのユーティリティ
 from mcp.types import Tool, TextContent
 from mcp.server import Server
 from mcp.types import (
@@ -10,11 +9,19 @@ from mcp.types import (
 )
 
 import json
-from typing import Dict, List, Any
+import logging
+from typing import Dict, List, Any, Union
 
 from app.database.database_base import Session
-from app.logics.attendance_day_collect import collect_attendance_data
+from app.logics.attendance_day_collect import collect_staff_month
+from app.logics.attendance_records import StaffMonth
+from app.logics.anomaly_rules import describe_anomaly_codes, filter_flagged_days
 from app.logics.logic_util import get_date_range, FIXED_KEY_MAP
+from app.metrics import span
+from app.server.profiling import profiled, run_in_threadpool  # starlette と同じ（計測中はワーカースレッド内で計測）
+from app.server.sse_sessions import sse_sessions
+
+logger = logging.getLogger(__name__)
 
 # 1. サーバーインスタンスの作成
 mcp_server = Server("attendance-management")
@@ -49,6 +56,9 @@ async def handle_list_tools():
                 "- am: 届出(AM)\n"
                 "- pm: 届出(PM)\n"
                 "- typ: 勤務形態\n"
+                "- an: 異常コード（カンマ区切り、空なら該当なし）。コードの意味は以下の通りです：\n"
+                f"{describe_anomaly_codes()}\n"
+                "only_flagged を true にすると、異常コードのある日だけが返ります。"
             ),
             inputSchema={
                 "type": "object",
@@ -59,6 +69,11 @@ async def handle_list_tools():
                         "pattern": r"^\d{4}-\d{2}$",
                         "description": "開始日 (YYYY-MM形式)",
                     },
+                    "only_flagged": {
+                        "type": "boolean",
+                        "description": "true のとき、異常コード(an)のある日のみ返す",
+                        "default": False,
+                    },
                 },
                 "required": ["staff_id", "target_month"],
             },
@@ -84,15 +99,27 @@ ATTENDANCE_KEY_MAP = {
     "リアル実働時間": "rt",
     "時間外": "ot",
     "備考": "rmk",
+    "異常": "an",
 }
 
 
+@span("diet_collect_attendance_data")
 def diet_collect_attendance_data(
-    attendance_data: Dict[Any, Any],
+    attendance_data: Union[Dict[Any, Any], StaffMonth],
 ) -> List[TextContent]:
     """
     元の巨大な辞書データから、必要なキーだけを短縮して抽出するユーティリティ。
+    StaffMonth は短縮キーの形式を直接作る（辞書を経由しない）。
     """
+    if isinstance(attendance_data, StaffMonth):
+        with span("json_serialization"):
+            text = json.dumps(
+                attendance_data.to_short_records(),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        return [TextContent(type="text", text=text)]
+
     lightweight_list = []
     shortened_fix_record = {}
     for key, value in attendance_data.items():
@@ -103,7 +130,7 @@ def diet_collect_attendance_data(
         else:
             break
     lightweight_list.append(shortened_fix_record)
-    print(f"Fixed part processed: {lightweight_list}")
+    logger.debug("Fixed part processed: %s", lightweight_list)
 
     shortened_day_record = {}
     for day, record in attendance_data.items():
@@ -122,24 +149,22 @@ def diet_collect_attendance_data(
             lightweight_list.append(shortened_day_record)
 
     # MCPのレスポンス形式（TextContent）に変換
-    return [
-        TextContent(
-            type="text",
-            text=json.dumps(
-                lightweight_list, ensure_ascii=False, separators=(",", ":")
-            ),
-        )
-    ]
+    with span("json_serialization"):
+        text = json.dumps(lightweight_list, ensure_ascii=False, separators=(",", ":"))
+    return [TextContent(type="text", text=text)]
 
 
 async def get_specific_attendance(arguments: Dict):
     """
     Retrieves specific attendance data for a given staff member and date range.
-    This function is a wrapper around collect_attendance_data to fit the MCP tool format.
+    This function is a wrapper around collect_staff_month to fit the MCP tool format.
     """
     from_day, to_day = get_date_range(arguments["target_month"])
-    print(
-        f"Fetching attendance for Staff ID: {type(arguments['staff_id'])} from {from_day} to {to_day}"
+    logger.info(
+        "Fetching attendance for Staff ID: %s from %s to %s",
+        arguments["staff_id"],
+        from_day,
+        to_day,
     )
 
     # 1. ツール実行ごとに新しいセッションを生成
@@ -148,12 +173,16 @@ async def get_specific_attendance(arguments: Dict):
             # 2. 同期関数をスレッドプールで実行（FastAPIを止めないため）
             # run_in_threadpool を使うことで、同期的なDB操作を安全に非同期実行できます
             data = await run_in_threadpool(
-                collect_attendance_data,
+                collect_staff_month,
                 staff_id=arguments["staff_id"],
                 from_day=from_day,
                 to_day=to_day,
                 db_session=db,  # セッションを注入
             )
+            if arguments.get("only_flagged"):
+                data = filter_flagged_days(
+                    data, arguments["staff_id"], arguments["target_month"]
+                )
             shaped_data = diet_collect_attendance_data(data)
             return shaped_data
             # MCPのレスポンス形式（TextContent）に変換
@@ -166,11 +195,22 @@ async def get_specific_attendance(arguments: Dict):
             return [TextContent(type="text", text=f"Error: {str(e)}")]
 
 
+def _current_http_request():
+    """SSE経由の呼び出しなら、/messages の HTTP リクエスト（プロファイル指定の判定用）"""
+    try:
+        return mcp_server.request_context.request
+    except LookupError:
+        return None
+
+
 # 3. ツールの実行ロジック
 @mcp_server.call_tool()
+@profiled("mcp-call-tool", request_getter=_current_http_request)
 async def handle_call_tool(name: str, arguments: Dict):
     if name == "get_specific_attendance":
-        return await get_specific_attendance(arguments)
+        # シャットダウン時のドレインで、完了を待つ対象にする
+        with sse_sessions.in_flight(), span("mcp_get_specific_attendance"):
+            return await get_specific_attendance(arguments)
 
     raise ValueError(f"Tool not found: {name}")
 
@@ -212,7 +252,8 @@ async def handle_get_prompt(name: str, arguments: dict):
                             "2. rt が、有休等の届出(am / pm)と矛盾なく算出されているか？\n"
                             "3. 時間休(tr)が申請されている日は、wt が cw 未満になっていたら、wt に反映されていると判断すること。\n"
                             "4. tr が申請されている日は、備考(rmk)をチェックすること。\n"
-                            "5. 法的な適否ではなく、『システムの計算仕様として正しいか』を最優先に判断すること。\n"
+                            "5. 異常コード(an)が付いた日を優先して確認すること。ただし、コードのない日を問題なしと断定しないこと。\n"
+                            "6. 法的な適否ではなく、『システムの計算仕様として正しいか』を最優先に判断すること。\n"
                             "※『信頼性を証明する』といったメタな目的を回答文に含める必要はありません。"
                         ),
                     ),
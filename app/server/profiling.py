@@ -0,0 +1,270 @@
+"""
+リクエスト単位のプロファイリング（管理者向け、オプトイン）。
+
+特定の社員・月の処理が遅いときに、そのリクエストだけを計測します。
+
+- 環境変数 PROFILING_TOKEN を設定したときだけ有効になります。
+  未設定の場合、@profiled は元の関数をそのまま返すため、コストは一切かかりません。
+- リクエストに ヘッダー X-Profile（またはクエリ profile）で "cprofile" か "sample" を指定し、
+  ヘッダー X-Profile-Token（またはクエリ profile_token）に PROFILING_TOKEN を渡します。
+- 結果は PROFILE_DIR（既定: output_profiles）に保存し、新しい順に PROFILE_MAX_FILES 件（既定: 20）だけ残します。
+  cprofile は pstats 形式、sample はフレームグラフ用の collapsed stacks 形式です。
+- 計測するのは、そのリクエストが run_in_threadpool（このモジュールのもの）で
+  ワーカースレッドに渡した処理だけです。イベントループのスレッドは他のリクエストの
+  コルーチンも動かしているため計測しません。
+- 計測は同時に1件だけです（Python 3.12 以降の cProfile はプロセスで1つしか有効にできません）。
+  計測中に別の計測を要求すると ProfileBusyError になり、HTTPハンドラーでは 409 を返します。
+"""
+
+import cProfile
+import functools
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+from starlette import status
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "output_profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "20"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+PROFILE_MODES = ("cprofile", "sample")
+PROFILE_SUFFIXES = {"cprofile": ".pstats", "sample": ".collapsed"}
+
+# 計測は同時に1件だけ
+_profile_lock = threading.Lock()
+
+
+class ProfileBusyError(RuntimeError):
+    """別のリクエストを計測中"""
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    if not PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def requested_profile_mode(request) -> Optional[str]:
+    """リクエストからプロファイルの種類を取り出す。管理者でなければ None"""
+    if request is None:
+        return None
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    if mode not in PROFILE_MODES:
+        return None
+    token = request.headers.get("x-profile-token") or request.query_params.get(
+        "profile_token"
+    )
+    if not is_admin_token(token):
+        logger.warning("Profiling requested without a valid token")
+        return None
+    return mode
+
+
+class StackSampler:
+    """
+    別スレッドから一定間隔でスタックを採取する、簡易サンプリングプロファイラー。
+    thread_ids を渡した場合、その時点で集合に含まれるスレッドだけを採取します。
+    """
+
+    def __init__(
+        self, interval: float = SAMPLE_INTERVAL, thread_ids: Optional[Set[int]] = None
+    ):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            targets = None if self.thread_ids is None else set(self.thread_ids)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if targets is not None and thread_id not in targets:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profile_path(label: str, mode: str) -> Path:
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    name = f"{timestamp}_{label}_{uuid.uuid4().hex[:8]}{PROFILE_SUFFIXES[mode]}"
+    return PROFILE_DIR / name
+
+
+def list_profiles() -> List[Path]:
+    """保存済みのプロファイルを新しい順に返す"""
+    if not PROFILE_DIR.is_dir():
+        return []
+    files = [
+        path
+        for path in PROFILE_DIR.iterdir()
+        if path.is_file() and path.suffix in PROFILE_SUFFIXES.values()
+    ]
+    return sorted(files, key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def enforce_retention(max_files: Optional[int] = None) -> None:
+    if max_files is None:
+        max_files = PROFILE_MAX_FILES
+    for path in list_profiles()[max_files:]:
+        path.unlink(missing_ok=True)
+
+
+class _RequestProfile:
+    """1リクエスト分の計測。ワーカースレッドで実行する処理を計測する"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.profiler = cProfile.Profile() if mode == "cprofile" else None
+        self.thread_ids: Set[int] = set()
+        self.sampler = (
+            StackSampler(SAMPLE_INTERVAL, self.thread_ids) if mode == "sample" else None
+        )
+        # 1つの cProfile.Profile を複数スレッドで同時に有効にはできない
+        self._profiler_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def run(self, func, *args, **kwargs):
+        """ワーカースレッドで呼ばれる"""
+        if self.profiler is None:
+            thread_id = threading.get_ident()
+            self.thread_ids.add(thread_id)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.thread_ids.discard(thread_id)
+        if not self._profiler_lock.acquire(blocking=False):
+            # 同じリクエストで並行して渡された処理は計測しない
+            return func(*args, **kwargs)
+        try:
+            return self.profiler.runcall(func, *args, **kwargs)
+        finally:
+            self._profiler_lock.release()
+
+    def save(self, path: Path) -> None:
+        if self.profiler is not None:
+            self.profiler.dump_stats(str(path))
+        else:
+            self.sampler.stop()
+            self.sampler.dump(path)
+
+
+_current_profile: ContextVar[Optional[_RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """
+    starlette の run_in_threadpool と同じ。
+    計測中のリクエストから呼ばれた場合は、ワーカースレッドの中で計測する。
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+    return await _run_in_threadpool(profile.run, func, *args, **kwargs)
+
+
+async def run_profiled(label: str, mode: str, call):
+    """
+    call() の中で run_in_threadpool に渡された処理を指定の方法で計測し、結果をファイルに保存する。
+    別のリクエストを計測中なら ProfileBusyError。
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfileBusyError("別のリクエストをプロファイリング中です")
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = _profile_path(label, mode)
+        started = time.perf_counter()
+        profile = _RequestProfile(mode)
+        profile.start()
+        token = _current_profile.set(profile)
+        try:
+            return await call()
+        finally:
+            _current_profile.reset(token)
+            profile.save(path)
+            enforce_retention()
+            logger.info(
+                "Profile saved: %s (%.3fs)", path.name, time.perf_counter() - started
+            )
+    finally:
+        _profile_lock.release()
+
+
+def profiled(label: str, request_getter: Optional[Callable] = None):
+    """
+    非同期ハンドラーをプロファイリング対象にするデコレーター。
+    request_getter を省略した場合、キーワード引数 request から判定し、
+    計測中に別の計測を要求されたら 409 を返します（request_getter を渡した場合は
+    ProfileBusyError をそのまま送出します）。
+    """
+
+    def decorator(handler):
+        if not PROFILING_TOKEN:
+            # 無効時はラップしない
+            return handler
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request = (
+                request_getter() if request_getter is not None else kwargs.get("request")
+            )
+            mode = requested_profile_mode(request)
+            if mode is None:
+                return await handler(*args, **kwargs)
+            try:
+                return await run_profiled(label, mode, lambda: handler(*args, **kwargs))
+            except ProfileBusyError as e:
+                if request_getter is not None:
+                    raise
+                return JSONResponse(
+                    {"error": str(e)}, status_code=status.HTTP_409_CONFLICT
+                )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,226 @@
+"""
+複数ワーカーでのMCPセッション（SSE）の振り分け。
+
+SseServerTransport はセッションをプロセス内に持つため、/sse を受けたワーカー以外に
+/messages が届くと 404 になります。gunicorn のワーカーは同じソケットを共有しており、
+特定のワーカーを指定して転送できないため、共有状態（state_backend）を経由して中継します。
+
+- /sse を受けたワーカーは、セッションID → 自ワーカーID を共有状態に登録する
+- 別のワーカーに /messages が届いたら、本文をセッションの受信キューに積んで 202 を返す
+- セッションを持つワーカーはキューを定期的に取り出し、自分の transport に渡す
+  （中継がない間は間隔を MCP_RELAY_MAX_POLL_SECONDS まで倍々に延ばし、届いたら元に戻す）
+
+ロードバランサーで session_id による固定振り分け（nginx の hash $arg_session_id など）が
+できる場合は中継は発生しません。STATE_BACKEND=memory（1ワーカー）のときは何もしません。
+"""
+
+import json
+import logging
+import os
+import re
+import socket
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional, Set
+from uuid import UUID
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import Message, Receive, Scope, Send
+
+from mcp.server.sse import SseServerTransport
+
+from app.metrics import span
+from app.server.state_backend import StateBackend
+
+logger = logging.getLogger(__name__)
+
+RELAY_POLL_SECONDS = float(os.getenv("MCP_RELAY_POLL_SECONDS", "0.05"))
+RELAY_MAX_POLL_SECONDS = float(os.getenv("MCP_RELAY_MAX_POLL_SECONDS", "1.0"))
+# ワーカーが落ちた場合に登録が残り続けないよう、期限付きで登録して更新する
+ROUTE_TTL_SECONDS = 120.0
+ROUTE_REFRESH_SECONDS = 30.0
+# 中継する /messages 本文の上限（SseServerTransport の既定と同じ）
+MAX_RELAY_BODY_BYTES = 4 * 1024 * 1024
+
+# endpoint イベントの data: /messages?session_id=<hex>
+_SESSION_ID_PATTERN = re.compile(rb"session_id=([0-9a-f]{32})")
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _route_key(session_id: str) -> str:
+    return f"mcp_session:{session_id}"
+
+
+def _inbox_key(session_id: str) -> str:
+    return f"mcp_inbox:{session_id}"
+
+
+def _parse_session_id(scope: Scope) -> Optional[str]:
+    query = scope.get("query_string", b"").decode("latin-1")
+    for part in query.split("&"):
+        name, _, value = part.partition("=")
+        if name == "session_id":
+            try:
+                return UUID(hex=value).hex
+            except ValueError:
+                return None
+    return None
+
+
+class McpSessionRouter:
+    def __init__(
+        self,
+        transport: SseServerTransport,
+        backend_factory: Callable[[], StateBackend],
+    ):
+        self._transport = transport
+        self._backend_factory = backend_factory
+        self._local: Set[str] = set()
+        self.worker_id = worker_id()
+
+    @property
+    def backend(self) -> StateBackend:
+        return self._backend_factory()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend.shared
+
+    @asynccontextmanager
+    async def track(self, send: Send):
+        """
+        1本のSSE接続の間、セッションIDを共有状態に登録し、ほかのワーカーからの中継を受け取る。
+        connect_sse に渡す send を返す（endpoint イベントからセッションIDを読み取るため）。
+        """
+        session_found = anyio.Event()
+        session_ids = []
+
+        async def tracking_send(message: Message) -> None:
+            if not session_found.is_set() and message["type"] == "http.response.body":
+                match = _SESSION_ID_PATTERN.search(message.get("body", b""))
+                if match:
+                    session_ids.append(match.group(1).decode())
+                    session_found.set()
+            await send(message)
+
+        if not self.enabled:
+            yield send
+            return
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(self._relay, session_found, session_ids)
+            try:
+                yield tracking_send
+            finally:
+                tg.cancel_scope.cancel()
+        if session_ids:
+            session_id = session_ids[0]
+            self._local.discard(session_id)
+            await run_in_threadpool(self.backend.delete, _route_key(session_id))
+            # 届いたまま処理されなかったメッセージは捨てる
+            await run_in_threadpool(self.backend.pop_all, _inbox_key(session_id))
+
+    async def _relay(self, session_found: anyio.Event, session_ids: list) -> None:
+        await session_found.wait()
+        session_id = session_ids[0]
+        self._local.add(session_id)
+        backend = self.backend
+        registered_at = 0.0
+        poll_seconds = RELAY_POLL_SECONDS
+        while True:
+            if time.monotonic() - registered_at >= ROUTE_REFRESH_SECONDS:
+                await run_in_threadpool(
+                    backend.set, _route_key(session_id), self.worker_id, ROUTE_TTL_SECONDS
+                )
+                registered_at = time.monotonic()
+            messages = await run_in_threadpool(backend.pop_all, _inbox_key(session_id))
+            for raw in messages:
+                await self._deliver(session_id, json.loads(raw))
+            # 中継はほかのワーカーに届いた場合だけのため、アイドルなセッションの読み取りを減らす
+            if messages:
+                poll_seconds = RELAY_POLL_SECONDS
+            else:
+                poll_seconds = min(
+                    poll_seconds * 2, max(RELAY_MAX_POLL_SECONDS, RELAY_POLL_SECONDS)
+                )
+            await anyio.sleep(poll_seconds)
+
+    async def _deliver(self, session_id: str, relayed: dict) -> None:
+        """中継されたメッセージを、通常の POST /messages と同じ経路で transport に渡す"""
+        body = relayed["body"].encode("utf-8")
+        scope: Scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/messages",
+            "root_path": "",
+            "query_string": f"session_id={session_id}".encode(),
+            "headers": [
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in relayed["headers"]
+            ],
+        }
+        sent = False
+
+        async def receive() -> Message:
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status = []
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        with span("mcp_relay_deliver"):
+            await self._transport.handle_post_message(scope, receive, send)
+        if status and status[0] >= 400:
+            logger.warning(
+                "Relayed message for session %s was rejected (%d)", session_id, status[0]
+            )
+
+    async def handle_post(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """POST /messages: 自ワーカーのセッションでなければ、持ち主のワーカーへ中継する"""
+        session_id = _parse_session_id(scope)
+        if not self.enabled or session_id is None or session_id in self._local:
+            await self._transport.handle_post_message(scope, receive, send)
+            return
+        owner = await run_in_threadpool(self.backend.get, _route_key(session_id))
+        if owner is None or owner == self.worker_id:
+            # 未登録のセッションは transport に任せる（404 を返す）
+            await self._transport.handle_post_message(scope, receive, send)
+            return
+
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_RELAY_BODY_BYTES:
+                await Response("Payload too large", status_code=413)(scope, receive, send)
+                return
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in scope.get("headers", [])
+            if name.lower() in (b"content-type", b"host", b"origin")
+        ]
+        relayed = {"body": b"".join(chunks).decode("utf-8"), "headers": headers}
+        await run_in_threadpool(
+            self.backend.push, _inbox_key(session_id), json.dumps(relayed)
+        )
+        logger.debug("Relayed message for session %s to %s", session_id, owner)
+        await Response("Accepted", status_code=202)(scope, receive, send)
@@ -0,0 +1,77 @@
+"""
+SSEセッションの追跡と、シャットダウン時のドレイン。
+
+ローリングリスタート時に処理中のツール呼び出しを落とさないよう、
+シャットダウンが始まったら新しい /sse 接続を 503 で断り、
+処理中の呼び出しが終わるのを待ってから、残ったSSEセッションを閉じます。
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Set
+
+import anyio
+
+logger = logging.getLogger(__name__)
+
+
+class SseSessionTracker:
+    def __init__(self):
+        self._scopes: Set[anyio.CancelScope] = set()
+        self._in_flight = 0
+        self.draining = False
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._scopes)
+
+    @property
+    def in_flight_calls(self) -> int:
+        return self._in_flight
+
+    @asynccontextmanager
+    async def session(self):
+        """1本のSSE接続の間、キャンセル用のスコープを登録しておく"""
+        with anyio.CancelScope() as scope:
+            self._scopes.add(scope)
+            try:
+                yield scope
+            finally:
+                self._scopes.discard(scope)
+
+    @contextmanager
+    def in_flight(self):
+        """ツール呼び出し1件を処理中として数える"""
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+    async def drain(self, timeout: float) -> int:
+        """
+        処理中の呼び出しを最大 timeout 秒待ち、残ったセッションを閉じる。
+        閉じたセッション数を返す。2回目以降の呼び出しは、残っているものだけを閉じる。
+        """
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self._in_flight and time.monotonic() < deadline:
+            await anyio.sleep(0.05)
+        if self._in_flight:
+            logger.warning(
+                "Drain timed out with %d tool calls in flight", self._in_flight
+            )
+        scopes = list(self._scopes)
+        for scope in scopes:
+            scope.cancel()
+        if scopes:
+            logger.info("Closed %d SSE sessions", len(scopes))
+        return len(scopes)
+
+    def reset(self) -> None:
+        """再起動（--reload やテスト）のために、受け付けを再開する"""
+        self.draining = False
+
+
+sse_sessions = SseSessionTracker()
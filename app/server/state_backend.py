@@ -0,0 +1,283 @@
+"""
+プロセスの外に置く共有状態（認証トークン、画面用UUID、MCPセッションの所在）。
+
+uvicorn / gunicorn を複数ワーカーで動かすと、モジュール変数の dict はワーカーごとに別物になるため、
+環境変数 STATE_BACKEND で保存先を切り替えます。
+
+- memory: プロセス内の dict（既定。1ワーカー専用）
+- sqlite: 同じホストのワーカー間で共有するSQLiteファイル (STATE_SQLITE_PATH)
+- redis: Redis 互換サーバー (STATE_REDIS_URL)。redis パッケージが必要（pyproject.toml の redis グループ）
+
+値はすべて文字列で、ttl（秒）を指定したキーは期限切れ後に読めなくなります。
+push / pop_all は、ほかのワーカーが持つMCPセッションへメッセージを中継するためのキューです。
+"""
+
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "state/app_state.db")
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://127.0.0.1:6379/0")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "attendance:")
+# SQLite: 期限切れのキーは get で読まれない限り残るため、書き込みのついでにこの間隔でまとめて消す
+STATE_SQLITE_SWEEP_SECONDS = float(os.getenv("STATE_SQLITE_SWEEP_SECONDS", "60"))
+
+
+class StateBackend(ABC):
+    # ほかのプロセスと状態を共有できるか（False のときはワーカー1つで動かす）
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def push(self, key: str, value: str) -> None:
+        """キューの末尾に追加する"""
+
+    @abstractmethod
+    def pop_all(self, key: str) -> List[str]:
+        """キューの中身を追加順にすべて取り出す"""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    def __init__(self):
+        # key → (value, 期限の monotonic 時刻 or None)
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._queues: Dict[str, List[str]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._values[key] = (value, expires_at)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def push(self, key: str, value: str) -> None:
+        with self._lock:
+            self._queues[key].append(value)
+
+    def pop_all(self, key: str) -> List[str]:
+        with self._lock:
+            return self._queues.pop(key, [])
+
+
+class SqliteStateBackend(StateBackend):
+    """同じホストの複数ワーカーで共有する。WALモードで読み書きを並行させる"""
+
+    shared = True
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: 自動コミット（キューの取り出しだけ明示的にトランザクションを張る）
+        self._conn = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, value TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_queue_key ON queue (key, id)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_kv_expires_at ON kv (expires_at)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            # ワーカー間で比較するため、期限は壁時計の時刻で持つ
+            if expires_at is not None and expires_at <= time.time():
+                self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            if time.monotonic() - self._swept_at >= STATE_SQLITE_SWEEP_SECONDS:
+                self._sweep_expired()
+
+    def _sweep_expired(self) -> None:
+        """期限切れのキー（使い捨てのUUIDやトークンなど）を削除する。_lock を持って呼ぶ"""
+        deleted = self._conn.execute(
+            "DELETE FROM kv WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+        self._swept_at = time.monotonic()
+        if deleted:
+            logger.debug("Swept %d expired state keys", deleted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def push(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO queue (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def pop_all(self, key: str) -> List[str]:
+        with self._lock:
+            # 受信キューは定期的に空読みされるため、空なら書き込みロックを取らずに返す
+            if (
+                self._conn.execute(
+                    "SELECT 1 FROM queue WHERE key = ? LIMIT 1", (key,)
+                ).fetchone()
+                is None
+            ):
+                return []
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, value FROM queue WHERE key = ? ORDER BY id", (key,)
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        "DELETE FROM queue WHERE key = ? AND id <= ?", (key, rows[-1][0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return [value for _, value in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisStateBackend(StateBackend):
+    """Redis 互換サーバー（Redis / Valkey / KeyDB など）。ホストをまたいで共有できる"""
+
+    shared = True
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "STATE_BACKEND=redis には redis パッケージが必要です (pyproject.toml の redis グループ)"
+            ) from e
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        if ttl is not None:
+            self._client.set(key, value, px=max(1, int(ttl * 1000)))
+        else:
+            self._client.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def push(self, key: str, value: str) -> None:
+        self._client.rpush(key, value)
+
+    def pop_all(self, key: str) -> List[str]:
+        # 取り出しと削除をまとめて行い、ほかのワーカーと二重に取り出さない
+        pipeline = self._client.pipeline(transaction=True)
+        pipeline.lrange(key, 0, -1)
+        pipeline.delete(key)
+        values, _ = pipeline.execute()
+        return values
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class PrefixedStateBackend(StateBackend):
+    """キーに接頭辞を付ける（同じ Redis をほかのアプリと共有する場合のため）"""
+
+    def __init__(self, backend: StateBackend, prefix: str):
+        self._backend = backend
+        self._prefix = prefix
+        self.shared = backend.shared
+
+    def get(self, key: str) -> Optional[str]:
+        return self._backend.get(self._prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._backend.set(self._prefix + key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self._backend.delete(self._prefix + key)
+
+    def push(self, key: str, value: str) -> None:
+        self._backend.push(self._prefix + key, value)
+
+    def pop_all(self, key: str) -> List[str]:
+        return self._backend.pop_all(self._prefix + key)
+
+    def close(self) -> None:
+        self._backend.close()
+
+
+def create_state_backend(kind: str = STATE_BACKEND) -> StateBackend:
+    if kind == "memory":
+        backend: StateBackend = MemoryStateBackend()
+    elif kind == "sqlite":
+        backend = SqliteStateBackend(STATE_SQLITE_PATH)
+    elif kind == "redis":
+        backend = RedisStateBackend(STATE_REDIS_URL)
+    else:
+        raise ValueError(f"未対応の STATE_BACKEND です: {kind}")
+    logger.info("State backend: %s", kind)
+    return PrefixedStateBackend(backend, STATE_KEY_PREFIX)
+
+
+@functools.lru_cache(maxsize=None)
+def get_state_backend() -> StateBackend:
+    """プロセスで共有するバックエンド（最初の呼び出しで作成する）"""
+    return create_state_backend()
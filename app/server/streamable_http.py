@@ -0,0 +1,59 @@
+"""
+MCP の Streamable HTTP トランスポート（/mcp）。
+
+/sse + /messages と同じ mcp_server を、1回のPOSTで要求と応答が完結する形で公開します。
+stateless モードでは、リクエストごとにサーバー側の状態を作って捨てるため、
+どのワーカー・どのホストに届いても処理でき、SSEの常時接続も必要ありません。
+
+- MCP_HTTP_JSON_RESPONSE: "1" のとき応答をSSEではなくJSONで返す (既定: 1)
+"""
+
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from mcp.server import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.server.sse_sessions import sse_sessions
+
+logger = logging.getLogger(__name__)
+
+MCP_HTTP_JSON_RESPONSE = os.getenv("MCP_HTTP_JSON_RESPONSE", "1") == "1"
+
+
+class StreamableHttpEndpoint:
+    """
+    /mcp の ASGI アプリ。
+    StreamableHTTPSessionManager.run() は1つのインスタンスで1回しか呼べないため、
+    lifespan（--reload やテストでは複数回）ごとにマネージャーを作り直す。
+    """
+
+    def __init__(self, server: Server, json_response: bool = MCP_HTTP_JSON_RESPONSE):
+        self._server = server
+        self._json_response = json_response
+        self._manager: Optional[StreamableHTTPSessionManager] = None
+
+    @asynccontextmanager
+    async def run(self):
+        manager = StreamableHTTPSessionManager(
+            app=self._server, stateless=True, json_response=self._json_response
+        )
+        async with manager.run():
+            self._manager = manager
+            logger.info("Streamable HTTP transport started (stateless)")
+            try:
+                yield
+            finally:
+                self._manager = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._manager is None or sse_sessions.draining:
+            # 起動前・シャットダウン中は、ほかのワーカーに送り直してもらう
+            response = Response(status_code=503, headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+        await self._manager.handle_request(scope, receive, send)
@@ -1,48 +1,105 @@
-window.addEventListener('DOMContentLoaded', (event) => {
+// 差分一覧の表示
+// - CSV照合の結果画面 (csv_diff.html): サーバーの照合結果を、表示する分だけページ単位で取得する
+// - 選択画面 (select_home.html): ダウンロード済みの差分一覧ファイル(JSON)を読み込む
+
+// 社員ごとの <details> に、差異1件（{"項目": {"旧": ..., "新": ...}}）を追加する
+function appendDifference(elemDisplayData, employeeId, difference) {
+    let details = elemDisplayData.lastElementChild;
+    if (!details || details.dataset.employeeId !== employeeId) {
+        details = document.createElement('details');
+        details.open = true;
+        details.dataset.employeeId = employeeId;
+        const summary = document.createElement('summary');
+        summary.textContent = employeeId;
+        details.appendChild(summary);
+        elemDisplayData.appendChild(details);
+    }
+    const pre = document.createElement('pre');
+    const code = document.createElement('code');
+    code.textContent = JSON.stringify(difference);
+    pre.appendChild(code);
+    details.appendChild(pre);
+}
+
+// 照合結果をページ単位で取得する
+function setupDiffPages(elemDisplayData) {
+    const elemFilter = document.getElementById('diff-filter');
+    const elemMore = document.getElementById('diff-more');
+    const elemStatus = document.getElementById('diff-status');
+    const pageSize = Number(elemDisplayData.dataset.pageSize);
+    let offset = 0;
+
+    const loadPage = async () => {
+        const params = new URLSearchParams(new FormData(elemFilter));
+        params.set('uuid', elemDisplayData.dataset.uuid);
+        params.set('offset', offset);
+        params.set('limit', pageSize);
+        elemMore.disabled = true;
+        try {
+            const response = await fetch(elemDisplayData.dataset.rowsUrl + '?' + params);
+            const page = await response.json();
+            if (!response.ok || page.error) {
+                elemStatus.textContent = page.error || '差分を取得できませんでした';
+                return;
+            }
+            page.items.forEach((item) => {
+                appendDifference(elemDisplayData, item.employee_id, {
+                    [item.column]: { '旧': item.old, '新': item.new },
+                });
+            });
+            offset += page.items.length;
+            elemStatus.textContent = offset + ' / ' + page.total + ' 件';
+            elemMore.hidden = offset >= page.total;
+        } finally {
+            elemMore.disabled = false;
+        }
+    };
+
+    elemFilter.addEventListener('submit', (event) => {
+        event.preventDefault();
+        // 条件を変えたら最初のページから表示し直す
+        elemDisplayData.replaceChildren();
+        offset = 0;
+        loadPage();
+    });
+    elemMore.addEventListener('click', loadPage);
+    loadPage();
+}
 
+// ダウンロード済みの差分一覧ファイルを読み込む
+function setupFileLoad(elemFileLoad) {
     // File APIが利用できるか確認
-    if (window.File && window.FileReader) {
-        const elemFileLoad = document.getElementById("file_load");
-
-        elemFileLoad.addEventListener("change", (event) => {
-            const inputFile = event.target.files[0];
-            // オブジェクト。ユーザーが指定したファイルを非同期で読み取る。
-            const fReader = new FileReader();
-
-            // ファイル内容の読み込み(fReader.readAsText)が正常に完了した際、コールされる
-            fReader.onload = (event) => {
-                const elemDisplayData = document.getElementById("json-diff");
-                // file内容を取得
-                // console.log(event.target.result)
-                // elemDisplayData.innerHTML += event.target.result;
-                const parseData = JSON.parse(event.target.result);
-                const parser = new DOMParser();
-
-                // キーと値を取得
-                Object.entries(parseData).forEach(([key, value]) => {
-                    let details = '<details open><summary>' + key + '</summary>';
-                    // const result = value.map(item = JSON.stringify(item)).join('\n');
-                    // details += '<pre><code>' + result + '</code></pre>';
-                    // 「インデックス（添字）」と「その要素」のペアが返される。
-                    // const arrayValue = Object.entries(value);
-                    // console.log(arrayValue);
-                    // 2. 各要素をJSON文字列に戻して、改行で結合
-                    const result = value.map((v, k) => {
-                        const diffData = '<pre><code>' + JSON.stringify(v) + '</code></pre>';
-                        // const diffData = JSON.stringify(v);
-                        return diffData;
-                    }).join('\n');
-                    // console.log(result);
-                    details += result + '</details>';
-                    const doc = parser.parseFromString(details, "text/html");
-                    elemDisplayData.innerHTML += doc.body.innerHTML;
-                }); // Object.entriesの終了
-            } // fReader.onloadの終了
-            // ファイル内容読み込み実施
-            fReader.readAsText(inputFile);
-        }); // elemFileLoadの終了
-    } else {
+    if (!(window.File && window.FileReader)) {
         alert("File API is not available");
-        return false;
-    } // File API
+        return;
+    }
+    elemFileLoad.addEventListener("change", (event) => {
+        const inputFile = event.target.files[0];
+        // オブジェクト。ユーザーが指定したファイルを非同期で読み取る。
+        const fReader = new FileReader();
+
+        // ファイル内容の読み込み(fReader.readAsText)が正常に完了した際、コールされる
+        fReader.onload = (event) => {
+            const elemDisplayData = document.getElementById("json-diff");
+            const parseData = JSON.parse(event.target.result);
+
+            // キー（社員ID）と差異の配列を取得
+            Object.entries(parseData).forEach(([key, value]) => {
+                value.forEach((difference) => appendDifference(elemDisplayData, key, difference));
+            });
+        } // fReader.onloadの終了
+        // ファイル内容読み込み実施
+        fReader.readAsText(inputFile);
+    }); // elemFileLoadの終了
+}
+
+window.addEventListener('DOMContentLoaded', (event) => {
+    const elemDisplayData = document.getElementById('json-diff');
+    if (elemDisplayData && elemDisplayData.dataset.rowsUrl) {
+        setupDiffPages(elemDisplayData);
+    }
+    const elemFileLoad = document.getElementById('file_load');
+    if (elemFileLoad) {
+        setupFileLoad(elemFileLoad);
+    }
 }); // DOMContentLoadedの終了
@@ -0,0 +1,82 @@
+"""
+ベンチマーク用のフィクスチャ。
+
+合成データ（tools/synthetic_data.py）をスケールごとのローカルSQLiteに作成します。
+スケールは「スタッフ月数」で、1 / 100 / 1000 を用意しています。
+同じデータから、照合ベンチマーク用の新旧集計CSV（old.csv / new.csv）も出力します。
+
+実行とベースライン比較:
+    # ベースラインを保存（benchmarks/.baselines に JSON で保存）
+    PYTHONPATH=. pytest benchmarks --benchmark-only \
+        --benchmark-storage=benchmarks/.baselines --benchmark-autosave
+    # 保存済みの最新ベースラインと比較し、平均が20%以上遅くなったら失敗
+    PYTHONPATH=. pytest benchmarks --benchmark-only \
+        --benchmark-storage=benchmarks/.baselines \
+        --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tools.synthetic_data import SyntheticConfig, generate
+
+SCALES = (1, 100, 1000)
+BENCH_MONTH = "2025-12"
+
+
+@dataclass
+class BenchDatabase:
+    scale: int
+    engine: object
+    Session: sessionmaker
+    staff_ids: List[int]
+    csv_dir: Path
+    from_day: str = f"{BENCH_MONTH}-01"
+    to_day: str = f"{BENCH_MONTH}-31"
+
+    @property
+    def csv_pair(self) -> Tuple[str, str]:
+        return str(self.csv_dir / "old.csv"), str(self.csv_dir / "new.csv")
+
+
+@pytest.fixture(scope="session")
+def bench_database_factory(tmp_path_factory):
+    created = {}
+
+    def factory(scale: int) -> BenchDatabase:
+        if scale not in created:
+            bench_dir = tmp_path_factory.mktemp("bench")
+            engine = create_engine(f"sqlite:///{bench_dir / f'bench_{scale}.db'}")
+            # 計算ロジックの分岐を網羅するため、届出の組み合わせを多めに割り当てる
+            summary = generate(
+                engine,
+                SyntheticConfig(
+                    staff_count=scale,
+                    months=1,
+                    start_month=BENCH_MONTH,
+                    combination_ratio=0.3,
+                ),
+                csv_dir=bench_dir,
+            )
+            created[scale] = BenchDatabase(
+                scale=scale,
+                engine=engine,
+                Session=sessionmaker(bind=engine),
+                staff_ids=summary.staff_ids,
+                csv_dir=bench_dir,
+            )
+        return created[scale]
+
+    yield factory
+    for database in created.values():
+        database.engine.dispose()
+
+
+@pytest.fixture(params=SCALES, ids=lambda scale: f"{scale}staff-months")
+def bench_database(request, bench_database_factory) -> BenchDatabase:
+    return bench_database_factory(request.param)
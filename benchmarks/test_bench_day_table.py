@@ -0,0 +1,49 @@
+"""
+1スタッフ月の勤怠テーブルの HTML / CSV 出力（pandas と app.logics.day_table）。
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.logics.day_table import build_day_table, to_csv, to_html  # noqa: E402
+from app.logics.logic_util import convert_to_dataframe  # noqa: E402
+
+COLUMNS = (
+    "日付", "オンコール", "出勤", "退勤", "届出(AM)", "届出(PM)", "残業申請",
+    "通常休憩時間", "時間休", "実働時間", "リアル実働時間", "時間外", "備考", "異常",
+)  # fmt: skip
+
+
+def _month_data():
+    data = {"社員ID": 1, "勤務形態": "7H常勤", "契約労働時間": 7.0, "契約有休時間": 7.0}
+    for day in range(1, 32):
+        data[day] = {column: f"{day:02d}:00" for column in COLUMNS}
+        data[day]["日付"] = day
+    return data
+
+
+@pytest.mark.benchmark(group="day_table_html")
+def test_bench_pandas_to_html(benchmark):
+    html = benchmark(
+        lambda: convert_to_dataframe(_month_data()).to_html(
+            classes="table table-striped", index=False
+        )
+    )
+    assert html.count("<tr>") == 31
+
+
+@pytest.mark.benchmark(group="day_table_html")
+def test_bench_day_table_to_html(benchmark):
+    html = benchmark(lambda: to_html(build_day_table(_month_data())))
+    assert html.count("<tr>") == 31
+
+
+@pytest.mark.benchmark(group="day_table_csv")
+def test_bench_pandas_to_csv(benchmark):
+    benchmark(lambda: convert_to_dataframe(_month_data()).to_csv(index=False))
+
+
+@pytest.mark.benchmark(group="day_table_csv")
+def test_bench_day_table_to_csv(benchmark):
+    benchmark(lambda: to_csv(build_day_table(_month_data())))
@@ -0,0 +1,166 @@
+"""
+計算・集計パイプラインのベンチマーク。
+
+- collect_attendance_data: 1スタッフ月（DBの規模ごと）と、全スタッフのバッチ
+  （範囲結合と、契約のインターバルインデックス）
+- CalcTimeClass: 一日あたりの計算コスト（DBなし）と、計算バックエンド（reference / fast）
+- diet_collect_attendance_data: MCPレスポンスへの整形（従来の dict と StaffMonth）
+- compare_csv_files: 新旧集計CSVの照合
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.caluculation.calc_backends import DayInput, create_calc_backend  # noqa: E402
+from app.caluculation.calc_work_classes_4_mcp import CalcTimeClass  # noqa: E402
+from app.database.contract_interval_index import ContractIntervalIndex  # noqa: E402
+from app.logics.attendance_day_collect import (  # noqa: E402
+    collect_attendance_data,
+    collect_staff_month,
+)
+from app.logics.csv_comparator import compare_csv_files  # noqa: E402
+from app.server.mcp_tools_call import diet_collect_attendance_data  # noqa: E402
+from tools.synthetic_data import NOTIFICATION_PAIRS, make_day_times  # noqa: E402
+
+
+@pytest.mark.benchmark(group="collect_one_staff_month")
+def test_bench_collect_one_staff_month(benchmark, bench_database):
+    staff_id = bench_database.staff_ids[len(bench_database.staff_ids) // 2]
+    with bench_database.Session() as db:
+        result = benchmark(
+            collect_attendance_data,
+            staff_id=staff_id,
+            from_day=bench_database.from_day,
+            to_day=bench_database.to_day,
+            db_session=db,
+        )
+    assert result["社員ID"] == staff_id
+
+
+@pytest.mark.benchmark(group="collect_all_staff")
+def test_bench_collect_all_staff(benchmark, bench_database):
+    def run_batch():
+        with bench_database.Session() as db:
+            for staff_id in bench_database.staff_ids:
+                collect_attendance_data(
+                    staff_id=staff_id,
+                    from_day=bench_database.from_day,
+                    to_day=bench_database.to_day,
+                    db_session=db,
+                )
+
+    benchmark.pedantic(run_batch, rounds=3, iterations=1)
+
+
+@pytest.mark.benchmark(group="collect_all_staff")
+def test_bench_collect_all_staff_interval_index(benchmark, bench_database):
+    def run_batch():
+        with bench_database.Session() as db:
+            contract_index = ContractIntervalIndex.load(
+                db, bench_database.from_day, bench_database.to_day
+            )
+            for staff_id in bench_database.staff_ids:
+                collect_attendance_data(
+                    staff_id=staff_id,
+                    from_day=bench_database.from_day,
+                    to_day=bench_database.to_day,
+                    db_session=db,
+                    contract_index=contract_index,
+                )
+
+    benchmark.pedantic(run_batch, rounds=3, iterations=1)
+
+
+def _day_inputs(count: int):
+    rng = random.Random(0)
+    inputs = []
+    for index in range(count):
+        notifications = NOTIFICATION_PAIRS[index % len(NOTIFICATION_PAIRS)]
+        overtime = "1" if index % 5 == 0 else "0"
+        start_time, end_time = make_day_times(rng, notifications, overtime)
+        inputs.append((start_time, end_time, notifications, overtime))
+    return inputs
+
+
+@pytest.mark.benchmark(group="calc_per_day")
+def test_bench_calc_time_class_per_day(benchmark):
+    day_inputs = _day_inputs(len(NOTIFICATION_PAIRS))
+    calc = CalcTimeClass(staff_id=1)
+
+    def run_days():
+        for start_time, end_time, notifications, overtime in day_inputs:
+            calc.set_data(
+                contract_work_time=8.0,
+                contract_holiday_time=8.0,
+                start_time=start_time,
+                end_time=end_time,
+                notifications=notifications,
+                overtime_check=overtime,
+                holiday_work="0",
+            )
+            input_work_time = calc.calc_base_work_time()
+            calc.calc_normal_rest(input_work_time)
+            calc.get_actual_work_time()
+            calc.get_real_time()
+            calc.get_over_time()
+
+    benchmark(run_days)
+    benchmark.extra_info["days_per_round"] = len(day_inputs)
+
+
+@pytest.mark.benchmark(group="calc_per_day")
+@pytest.mark.parametrize("kind", ["reference", "fast"])
+def test_bench_calc_backend_per_day(benchmark, kind):
+    backend = create_calc_backend(kind)
+    days = [
+        DayInput(8.0, 8.0, start_time, end_time, notifications, overtime)
+        for start_time, end_time, notifications, overtime in _day_inputs(
+            len(NOTIFICATION_PAIRS)
+        )
+    ]
+
+    def run_days():
+        for day in days:
+            backend.calculate(day)
+
+    benchmark(run_days)
+    benchmark.extra_info["days_per_round"] = len(days)
+
+
+@pytest.mark.benchmark(group="diet_collect")
+def test_bench_diet_collect_attendance_data(benchmark, bench_database_factory):
+    database = bench_database_factory(1)
+    with database.Session() as db:
+        attendance_data = collect_attendance_data(
+            staff_id=database.staff_ids[0],
+            from_day=database.from_day,
+            to_day=database.to_day,
+            db_session=db,
+        )
+    benchmark(diet_collect_attendance_data, attendance_data)
+
+
+@pytest.mark.benchmark(group="diet_collect")
+def test_bench_diet_collect_staff_month(benchmark, bench_database_factory):
+    database = bench_database_factory(1)
+    with database.Session() as db:
+        staff_month = collect_staff_month(
+            staff_id=database.staff_ids[0],
+            from_day=database.from_day,
+            to_day=database.to_day,
+            db_session=db,
+        )
+    benchmark(diet_collect_attendance_data, staff_month)
+
+
+@pytest.fixture(params=(100, 1000), ids=lambda rows: f"{rows}staff")
+def legacy_csv_pair(request, bench_database_factory):
+    return bench_database_factory(request.param).csv_pair
+
+
+@pytest.mark.benchmark(group="compare_csv_files")
+def test_bench_compare_csv_files(benchmark, legacy_csv_pair):
+    benchmark(compare_csv_files, *legacy_csv_pair)
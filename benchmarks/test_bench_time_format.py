@@ -0,0 +1,68 @@
+"""
+時間フォーマットのマイクロベンチマーク（旧実装との比較）。
+
+実行例: PYTHONPATH=. pytest benchmarks/test_bench_time_format.py --benchmark-only
+"""
+
+import math
+import re
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.logics.time_format import format_rt, format_work_time  # noqa: E402
+
+# 一ヶ月分の行でよく出る値
+WORK_TIMES = [timedelta(hours=h, minutes=m) for h in range(0, 12) for m in (0, 15, 45)]
+RT_SECONDS = [s * 60.0 for s in range(-240, 720, 7)]
+
+
+# --- 旧実装（collect_attendance_data の per-row 処理をそのまま再現） ---
+def legacy_format_work_time(value: timedelta) -> str:
+    return (
+        re.sub(r"([0-9]{1,2}):([0-9]{2}):00", r"\1:\2", f"{value}")
+        if value > timedelta(hours=0)
+        else "0.0"
+    )
+
+
+def legacy_format_rt(seconds: float) -> str:
+    if seconds == 0.0:
+        return "00:00"
+    h = math.ceil(seconds / 3600) if seconds < 0 else int(seconds // 3600)
+    print(f"seconds % 3600 // 60: {(-seconds % 3600) // 60}")
+    m = int((-seconds % 3600) // 60) if seconds < 0 else int((seconds % 3600) // 60)
+    return f"{h:03d}:{m:02d}" if seconds < 0 else f"{h:02d}:{m:02d}"
+
+
+def test_work_time_matches_legacy():
+    for value in WORK_TIMES:
+        assert format_work_time(value) == legacy_format_work_time(value)
+
+
+def _run_all(func, values):
+    for value in values:
+        func(value)
+
+
+@pytest.mark.benchmark(group="work_time")
+def test_bench_legacy_format_work_time(benchmark):
+    benchmark(_run_all, legacy_format_work_time, WORK_TIMES)
+
+
+@pytest.mark.benchmark(group="work_time")
+def test_bench_format_work_time(benchmark):
+    benchmark(_run_all, format_work_time, WORK_TIMES)
+
+
+@pytest.mark.benchmark(group="rt")
+def test_bench_legacy_format_rt(benchmark, capsys):
+    # print のコストも含めて計測する（出力は捨てる）
+    benchmark(_run_all, legacy_format_rt, RT_SECONDS)
+
+
+@pytest.mark.benchmark(group="rt")
+def test_bench_format_rt(benchmark):
+    benchmark(_run_all, format_rt, RT_SECONDS)
@@ -20,4 +20,8 @@ sleep 5
 
 # Gunicornを起動
 # ローカルの場合、8001ポートでアプリケーションを起動
+# WEB_CONCURRENCY が2以上のときは gunicorn で複数ワーカーを起動する（gunicorn.conf.py）
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+    exec poetry run gunicorn -c gunicorn.conf.py app.server.endpoint:app
+fi
 exec poetry run uvicorn app.server.endpoint:app --host 0.0.0.0 --port 8001
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+gunicorn の設定（複数ワーカーでの起動）。
+
+    STATE_BACKEND=sqlite WEB_CONCURRENCY=4 gunicorn app.server.endpoint:app
+
+- WEB_CONCURRENCY: ワーカー数 (既定: CPUコア数)
+- BIND: 待ち受けアドレス (既定: 0.0.0.0:8001)
+- STATE_BACKEND: memory のままワーカーを2つ以上にすると、トークンやMCPセッションが
+  ワーカー間で共有されないため起動を止める（app/server/state_backend.py を参照）
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8001")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# SSE は長時間つながったままになるため、ワーカーのタイムアウトで切らない
+timeout = 0
+keepalive = 5
+# 終了時は lifespan で処理中のツール呼び出しを待つ（SSE_DRAIN_TIMEOUT + 余裕）
+graceful_timeout = int(float(os.getenv("SSE_DRAIN_TIMEOUT", "30"))) + 10
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    if workers > 1 and os.getenv("STATE_BACKEND", "memory") == "memory":
+        raise RuntimeError(
+            "WEB_CONCURRENCY > 1 の場合は STATE_BACKEND=sqlite か redis を指定してください"
+        )
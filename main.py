@@ -1,4 +1,5 @@
 import calendar
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastmcp import FastMCP
@@ -26,8 +27,15 @@ def get_attendance_details_wrapper(staff_id: int, target_month: str) -> str:
         return f"Error: {e}"
 
 
+@asynccontextmanager
+async def lifespan(app):
+    # データベース初期化（import 時ではなく、起動時に行う）
+    init_db()
+    yield
+
+
 # 最初のFastAPIインスタンス
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 # テストエンドポイントを、 app に追加
@@ -52,9 +60,6 @@ app.mount("/mcp", mcp.http_app())
 #     lifespan=mcp_app.lifespan,
 # )
 
-# データベース初期化
-init_db()
-
 if __name__ == "__main__":
     uvicorn.run("main:app", port=8000, reload=True)
     # mcp_router.run()
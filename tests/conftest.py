@@ -1,6 +1,101 @@
 import pathlib
 import sys
+from dataclasses import astuple, dataclass
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 
 packagedir = pathlib.Path(__file__).resolve().parent.parent.parent
 print(packagedir)
 sys.path.append(str(packagedir))
+
+if TYPE_CHECKING:
+    from tools.synthetic_data import SyntheticConfig, SyntheticSummary
+
+# 合成データを作った後に、テスト用の行を追加する関数
+PrepareDatabase = Callable[[Session, "SyntheticSummary"], None]
+
+
+@dataclass
+class SyntheticDatabase:
+    engine: Engine
+    Session: sessionmaker
+    summary: "SyntheticSummary"
+
+    @property
+    def staff_ids(self) -> List[int]:
+        return self.summary.staff_ids
+
+
+@pytest.fixture(scope="session")
+def synthetic_database_factory(tmp_path_factory):
+    """
+    合成データ（tools/synthetic_data.py）のローカルSQLiteを作る。
+    同じ設定・同じ prepare の組み合わせは、テストセッションの間で使い回す。
+    """
+    # 合成データを使うテストだけが tools パッケージに依存するよう、ここで読み込む
+    from tools.synthetic_data import generate
+
+    created = {}
+
+    def factory(
+        config: "SyntheticConfig", prepare: Optional[PrepareDatabase] = None
+    ) -> SyntheticDatabase:
+        key = (astuple(config), prepare)
+        if key not in created:
+            path = tmp_path_factory.mktemp("synthetic") / "synthetic.db"
+            engine = create_engine(f"sqlite:///{path}")
+            summary = generate(engine, config)
+            database = SyntheticDatabase(engine, sessionmaker(bind=engine), summary)
+            if prepare is not None:
+                with database.Session() as db:
+                    prepare(db, summary)
+                    db.commit()
+            created[key] = database
+        return created[key]
+
+    yield factory
+    for database in created.values():
+        database.engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def synthetic_config(request) -> "SyntheticConfig":
+    """
+    合成データの設定。既定ではすべてのテストモジュールで同じデータを使う
+    （2025-11〜12 の2か月、届出の組み合わせ・月途中の契約変更を多めにする）。
+    別のデータが必要なテストだけ parametrize(..., indirect=True) で SyntheticConfig を渡す。
+    """
+    from tools.synthetic_data import SyntheticConfig
+
+    default = SyntheticConfig(
+        staff_count=20,
+        months=2,
+        start_month="2025-11",
+        seed=7,
+        combination_ratio=0.3,
+        contract_change_ratio=0.5,
+    )
+    return getattr(request, "param", default)
+
+
+@pytest.fixture(scope="module")
+def synthetic_prepare(request) -> Optional[PrepareDatabase]:
+    """合成データに行を追加するテストは、parametrize(..., indirect=True) で関数を渡す"""
+    return getattr(request, "param", None)
+
+
+@pytest.fixture(scope="module")
+def synthetic_database(
+    synthetic_database_factory, synthetic_config, synthetic_prepare
+) -> SyntheticDatabase:
+    return synthetic_database_factory(synthetic_config, synthetic_prepare)
+
+
+@pytest.fixture(scope="module")
+def synthetic_session(synthetic_database):
+    with synthetic_database.Session() as db:
+        yield db
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from app.logics.anomaly_rules import (
+    ANOMALY_KEY,
+    AnomalyIndex,
+    DayFacts,
+    anomaly_index,
+    classify_day,
+    filter_flagged_days,
+)
+
+
+def make_facts(**kwargs) -> DayFacts:
+    values = dict(
+        contract_work_time=timedelta(hours=7),
+        actual_work_time=timedelta(hours=7),
+        real_time=7 * 3600.0,
+        over_time=0.0,
+        overtime_check="0",
+        time_off=False,
+        leave_or_absence=False,
+        remark="",
+    )
+    values.update(kwargs)
+    return DayFacts(**values)
+
+
+def test_classify_normal_day():
+    assert classify_day(make_facts()) == ()
+
+
+def test_classify_irregular_days():
+    assert classify_day(make_facts(actual_work_time=timedelta(hours=6))) == (
+        "WT_SHORT",
+    )
+    # 欠勤・全日休暇の日は wt < cw でも対象外
+    assert (
+        classify_day(
+            make_facts(actual_work_time=timedelta(0), leave_or_absence=True)
+        )
+        == ()
+    )
+    assert classify_day(make_facts(overtime_check="1", over_time=-1800.0)) == (
+        "OT_NEG",
+    )
+    # 時間休が出退勤に反映済みで、rt からさらに差し引かれているケース
+    assert classify_day(
+        make_facts(
+            actual_work_time=timedelta(hours=6),
+            real_time=5 * 3600.0,
+            time_off=True,
+            remark="時間休1h",
+        )
+    ) == ("TR_RMK", "RT_DOUBLE")
+
+
+def test_anomaly_index_is_bounded():
+    index = AnomalyIndex(max_months=2)
+    index.store(1, "2025-10", {1: ("OT_NEG",), 2: ()})
+    index.store(1, "2025-11", {1: ()})
+    index.store(1, "2025-12", {3: ("WT_SHORT",)})
+
+    assert index.flagged_days(1, "2025-10") is None
+    assert index.flagged_days(1, "2025-11") == {}
+    assert index.flagged_days(1, "2025-12") == {3: ("WT_SHORT",)}
+
+
+def test_filter_flagged_days():
+    attendance_data = {
+        "社員ID": 201,
+        "勤務形態": "常勤",
+        1: {"日付": 1, ANOMALY_KEY: ""},
+        2: {"日付": 2, ANOMALY_KEY: "OT_NEG"},
+    }
+    anomaly_index.store(201, "2025-12", {1: (), 2: ("OT_NEG",)})
+
+    filtered = filter_flagged_days(attendance_data, 201, "2025-12")
+
+    assert list(filtered.keys()) == ["社員ID", "勤務形態", 2]
+    # インデックスにない月は、日ごとのコードで判定する
+    assert list(filter_flagged_days(attendance_data, 201, "2020-01").keys()) == [
+        "社員ID",
+        "勤務形態",
+        2,
+    ]
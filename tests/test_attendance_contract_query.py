@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+from app.database.attendance_contract_query import ContractTimeAttendance
+from app.models.models import Attendance, StaffJobContract, StaffLogin, User
+
+
+def _add_staff_outside_period(db, summary):
+    # 101: 期間前に契約終了（出勤実績は期間前のみ）
+    # 102: 契約はあるが、期間内の出勤実績なし
+    for staff_id in (101, 102):
+        db.execute(
+            insert(User.__table__),
+            {"STAFFID": staff_id, "CONTRACT_CODE": 1, "DISPLAY": True},
+        )
+        db.execute(insert(StaffLogin.__table__), {"STAFFID": staff_id, "ADMIN": False})
+    db.execute(
+        insert(StaffJobContract.__table__),
+        [
+            {
+                "STAFFID": 101,
+                "JOBTYPE_CODE": 2,
+                "CONTRACT_CODE": 1,
+                "START_DAY": date(2024, 1, 1),
+                "END_DAY": date(2025, 10, 31),
+            },
+            {
+                "STAFFID": 102,
+                "JOBTYPE_CODE": 2,
+                "CONTRACT_CODE": 1,
+                "START_DAY": date(2024, 1, 1),
+                "END_DAY": date(9999, 12, 31),
+            },
+        ],
+    )
+    db.execute(
+        insert(Attendance.__table__),
+        {"STAFFID": 101, "WORKDAY": date(2025, 10, 1), "STARTTIME": "09:00"},
+    )
+
+
+pytestmark = pytest.mark.parametrize(
+    "synthetic_prepare", [_add_staff_outside_period], ids=["outside"], indirect=True
+)
+
+
+@pytest.mark.parametrize("use_window", [True, False])
+def test_distinct_users_in_period(synthetic_database, synthetic_session, use_window):
+    query = ContractTimeAttendance(
+        0, date(2025, 12, 1), date(2025, 12, 31), db_session=synthetic_session
+    ).get_distinct_user_query(use_window=use_window)
+
+    rows = query.all()
+
+    staff_ids = [user.STAFFID for user, _ in rows]
+    assert sorted(staff_ids) == synthetic_database.staff_ids
+    assert len(staff_ids) == len(set(staff_ids))
+
+
+def test_window_and_fallback_pick_the_latest_contract(synthetic_session):
+    queries = ContractTimeAttendance(
+        0, date(2025, 11, 1), date(2025, 12, 31), db_session=synthetic_session
+    )
+
+    window = [(u.STAFFID, code) for u, code in queries.get_distinct_user_query(True)]
+    fallback = [(u.STAFFID, code) for u, code in queries.get_distinct_user_query(False)]
+
+    assert window == fallback
+    assert queries.supports_window_functions()
@@ -0,0 +1,168 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+
+from app.logics.attendance_day_collect import collect_attendance_data
+from app.logics.attendance_export import (
+    LEGACY_COLUMNS,
+    has_staff_attendance,
+    iter_csv_chunks,
+    iter_export_rows,
+    iter_xlsx_chunks,
+    legacy_row,
+    select_staff_ids,
+)
+from app.logics.csv_comparator import compare_csv_files
+
+TARGET_MONTH = "2025-12"
+
+
+def _read_csv(chunks):
+    return list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+
+
+def test_legacy_row_totals():
+    data = {
+        "社員ID": 7,
+        "勤務形態": "8H常勤",
+        1: {"届出(AM)": "年休（全日）", "届出(PM)": None, "実働時間": "0.0"},
+        2: {
+            "届出(AM)": "年休（半日）",
+            "届出(PM)": "時間休（2時間）",
+            "実働時間": "2:30",
+            "リアル実働時間": "02:45",
+            "時間外": "-00:30",
+        },
+        3: {"実働時間": "8:00", "リアル実働時間": "09:15", "時間外": "01:15"},
+    }
+
+    assert legacy_row(data) == [7, "8H常勤", 10.5, 12.0, 1, 1, 1.25, 2]
+
+
+def test_legacy_export_matches_legacy_csv_format():
+    rows = [
+        LEGACY_COLUMNS,
+        legacy_row(
+            {
+                "社員ID": "001",
+                "勤務形態": "常勤",
+                1: {"実働時間": "8:00", "リアル実働時間": "08:00", "時間外": "00:30"},
+            }
+        ),
+        legacy_row(
+            {
+                "社員ID": "002",
+                "勤務形態": "パート",
+                1: {"届出(AM)": "年休（全日）", "届出(PM)": "年休（全日）"},
+                2: {
+                    "届出(AM)": "時間休（2時間）",
+                    "実働時間": "4:00",
+                    "リアル実働時間": "06:00",
+                },
+            }
+        ),
+    ]
+    # 旧システムの集計CSV：時間は小数1桁、年休・時間休は整数
+    legacy = io.BytesIO(
+        "\n".join(
+            [
+                ",".join(LEGACY_COLUMNS),
+                "001,常勤,8.0,8.0,0,0,0.5,0",
+                "002,パート,4.0,6.0,1,0,0.0,2",
+            ]
+        ).encode()
+    )
+    exported = io.BytesIO(b"".join(iter_csv_chunks(rows)))
+
+    assert json.loads(compare_csv_files(legacy, exported)) == {}
+
+
+def test_legacy_export_feeds_csv_comparator(
+    synthetic_database, synthetic_session, tmp_path
+):
+    db = synthetic_session
+    staff_ids = select_staff_ids(db, date(2025, 12, 1), date(2025, 12, 31))
+    assert staff_ids == sorted(synthetic_database.staff_ids)
+
+    rows = _read_csv(
+        iter_csv_chunks(iter_export_rows(db, TARGET_MONTH, staff_ids), chunk_bytes=64)
+    )
+    assert rows[0] == LEGACY_COLUMNS
+    assert [int(row[0]) for row in rows[1:]] == staff_ids
+
+    exported = tmp_path / "new.csv"
+    exported.write_text("\n".join(",".join(row) for row in rows) + "\n")
+    # 同じ内容どうしは差分なし、1か所変えるとその社員だけが差分になる
+    assert json.loads(compare_csv_files(str(exported), str(exported))) == {}
+    changed = [list(row) for row in rows]
+    changed[1][2] = "999.0"
+    old = tmp_path / "old.csv"
+    old.write_text("\n".join(",".join(row) for row in changed) + "\n")
+    diff = json.loads(compare_csv_files(str(old), str(exported)))
+    assert list(diff) == [rows[1][0]]
+
+
+def test_daily_export_matches_collect(synthetic_database, synthetic_session):
+    db = synthetic_session
+    staff_ids = sorted(synthetic_database.staff_ids)[:3]
+
+    rows = _read_csv(
+        iter_csv_chunks(iter_export_rows(db, TARGET_MONTH, staff_ids, layout="daily"))
+    )
+
+    assert rows[0][:2] == ["社員ID", "日付"]
+    for staff_id in staff_ids:
+        expected = collect_attendance_data(staff_id, "2025-12-01", "2025-12-31", db)
+        days = [row for row in rows[1:] if row[0] == str(staff_id)]
+        assert len(days) == sum(isinstance(key, int) for key in expected)
+
+
+def test_xlsx_export_round_trip(synthetic_database, synthetic_session):
+    openpyxl = pytest.importorskip("openpyxl")
+    db = synthetic_session
+    staff_ids = sorted(synthetic_database.staff_ids)[:2]
+
+    content = b"".join(
+        iter_xlsx_chunks(iter_export_rows(db, TARGET_MONTH, staff_ids), chunk_bytes=1024)
+    )
+
+    sheet = openpyxl.load_workbook(io.BytesIO(content), read_only=True)["勤怠"]
+    values = list(sheet.values)
+    assert list(values[0]) == LEGACY_COLUMNS
+    assert [row[0] for row in values[1:]] == staff_ids
+
+
+def test_export_skips_staff_without_attendance(synthetic_database, synthetic_session):
+    db = synthetic_session
+    missing = max(synthetic_database.staff_ids) + 1000
+    staff_ids = [sorted(synthetic_database.staff_ids)[0], missing]
+
+    rows = list(iter_export_rows(db, TARGET_MONTH, staff_ids))
+
+    assert [row[0] for row in rows[1:]] == staff_ids[:1]
+    assert has_staff_attendance(db, staff_ids[0], "2025-12-01", "2025-12-31")
+    assert not has_staff_attendance(db, missing, "2025-12-01", "2025-12-31")
+
+
+def test_export_without_attendance_is_not_found(monkeypatch):
+    import app.server.endpoint as endpoint
+
+    monkeypatch.setattr(endpoint, "is_valid_uuid", lambda uuid: True)
+    monkeypatch.setattr(endpoint, "_staff_has_attendance", lambda *args: False)
+
+    response = asyncio.run(
+        endpoint.export_attendance(
+            uuid="test",
+            target_month=TARGET_MONTH,
+            staff_id=1,
+            team_code=None,
+            layout="legacy",
+            file_format="csv",
+        )
+    )
+
+    assert response.status_code == 404
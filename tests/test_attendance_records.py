@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from app.logics.anomaly_rules import filter_flagged_days
+from app.logics.attendance_day_collect import collect_staff_month
+from app.logics.attendance_records import DayRecord, MonthHeader, StaffMonth
+from app.logics.time_format import parse_hours
+from app.server.mcp_tools_call import diet_collect_attendance_data
+
+TARGET_MONTH = "2025-12"
+
+
+@pytest.fixture(scope="module")
+def staff_months(synthetic_database, synthetic_session):
+    return [
+        collect_staff_month(staff_id, "2025-12-01", "2025-12-31", synthetic_session)
+        for staff_id in synthetic_database.staff_ids
+    ]
+
+
+def test_records_have_no_instance_dict():
+    header = MonthHeader(1, "8H常勤", 8.0, 8.0)
+    assert not hasattr(header, "__dict__")
+    day = DayRecord.from_dict(1, {"出勤": "08:30"})
+    assert not hasattr(day, "__dict__")
+
+
+def test_dict_view_round_trips(staff_months):
+    for staff_month in staff_months:
+        data = staff_month.to_dict()
+
+        assert list(data)[:4] == ["社員ID", "勤務形態", "契約労働時間", "契約有休時間"]
+        assert StaffMonth.from_dict(data).to_dict() == data
+
+
+def test_short_view_matches_legacy_dict_path(staff_months):
+    for staff_month in staff_months:
+        from_records = diet_collect_attendance_data(staff_month)[0].text
+        from_dict = diet_collect_attendance_data(staff_month.to_dict())[0].text
+
+        assert from_records == from_dict
+        header, *days = json.loads(from_records)
+        assert header["sid"] == staff_month.header.staff_id
+        assert [day["d"] for day in days] == list(staff_month.days)
+
+
+def test_filter_flagged_days_keeps_the_same_days(staff_months):
+    for staff_month in staff_months:
+        staff_id = staff_month.header.staff_id
+        filtered = filter_flagged_days(staff_month, staff_id, TARGET_MONTH)
+        expected = filter_flagged_days(staff_month.to_dict(), staff_id, TARGET_MONTH)
+
+        assert filtered.to_dict() == expected
+        assert all(record.anomaly for record in filtered.days.values())
+    # 元のレコードは変更しない
+    assert any(not record.anomaly for month in staff_months for record in month.days.values())
+
+
+def test_schema_view(staff_months):
+    staff_month = staff_months[0]
+
+    rows = staff_month.to_schema()
+
+    assert len(rows) == len(staff_month.days)
+    first = rows[0]
+    record = next(iter(staff_month.days.values()))
+    assert first.work_day == record.work_date.isoformat()
+    assert first.work_day.startswith(TARGET_MONTH)
+    assert first.staff_id == staff_month.header.staff_id
+    assert first.actual_work_time == record.actual_work_time
+    assert first.real_time == parse_hours(record.real_time)
+    assert isinstance(first.normal_rest_time, float)
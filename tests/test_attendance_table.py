@@ -0,0 +1,116 @@
+import asyncio
+import re
+from pathlib import Path
+
+import pytest
+from jinja2 import Environment, FileSystemLoader
+
+from app.logics.logic_util import convert_to_dataframe
+from app.server.attendance_table import (
+    TABLE_TEMPLATE,
+    attendance_fragments,
+    cached_attendance_table,
+    render_attendance_table,
+)
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "app" / "templates"
+
+
+def _sample_data():
+    return {
+        "社員ID": 3,
+        "勤務形態": "7H常勤",
+        1: {"日付": 1, "オンコール": None, "出勤": "08:36", "備考": "<遅刻>"},
+        2: {"日付": 2, "オンコール": "1", "出勤": "00:00", "備考": ""},
+        # 列が欠けた日（DataFrame では NaN になる）
+        3: {"日付": 3, "出勤": "09:00"},
+    }
+
+
+def _cells(html, tag):
+    return [cell.strip() for cell in re.findall(rf"<{tag}>(.*?)</{tag}>", html, re.S)]
+
+
+@pytest.fixture
+def template():
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=True)
+    return env.get_template(TABLE_TEMPLATE)
+
+
+@pytest.fixture(autouse=True)
+def clear_fragments():
+    attendance_fragments.clear()
+    yield
+    attendance_fragments.clear()
+
+
+def test_fragment_contains_header_and_table(template):
+    data = _sample_data()
+    expected = convert_to_dataframe(_sample_data()).to_html(index=False)
+
+    _, fragment = render_attendance_table(template, 3, "2025-12", data)
+
+    assert _cells(fragment, "th") == _cells(expected, "th")
+    assert _cells(fragment, "td") == _cells(expected, "td")
+    assert "&lt;遅刻&gt;" in fragment
+    assert "<div>社員ID: 3</div>" in fragment
+    # 元のデータは変更しない
+    assert data == _sample_data()
+
+
+def test_fragment_is_cached_per_data_fingerprint(template):
+    key, fragment = render_attendance_table(template, 3, "2025-12", _sample_data())
+
+    assert render_attendance_table(template, 3, "2025-12", _sample_data())[1] is fragment
+    assert cached_attendance_table(3, "2025-12", False, key.fingerprint) is fragment
+    assert cached_attendance_table(3, "2025-12", True, key.fingerprint) is None
+
+    changed = _sample_data()
+    changed[1]["出勤"] = "08:37"
+    changed_key, changed_fragment = render_attendance_table(
+        template, 3, "2025-12", changed
+    )
+    assert changed_key.fingerprint != key.fingerprint
+    assert "08:37" in changed_fragment
+
+
+def test_table_collect_uses_a_session_per_call(monkeypatch):
+    import app.server.endpoint as endpoint
+    from app.database.database_base import session as shared_session
+
+    sessions = []
+
+    def fake_collect(staff_id, from_day, to_day, db_session):
+        sessions.append(db_session)
+        return _sample_data()
+
+    monkeypatch.setattr(endpoint, "collect_attendance_data", fake_collect)
+
+    endpoint._collect_in_session(3, "2025-12-01", "2025-12-31")
+    endpoint._collect_in_session(3, "2025-12-01", "2025-12-31")
+
+    # スレッドプールから呼ばれるため、モジュール共通の session を使わない
+    assert shared_session not in sessions
+    assert sessions[0] is not sessions[1]
+
+
+def test_table_pages_require_a_valid_uuid(monkeypatch):
+    import app.server.endpoint as endpoint
+
+    def fail_collect(*args, **kwargs):
+        raise AssertionError("UUIDなしで集計した")
+
+    monkeypatch.setattr(endpoint, "is_valid_uuid", lambda uuid: False)
+    monkeypatch.setattr(endpoint, "collect_attendance_data", fail_collect)
+
+    for page in (endpoint.render_user_attendance, endpoint.chat_with_ai):
+        response = asyncio.run(
+            page(
+                request=None,
+                uuid="unknown",
+                staff_id=3,
+                target_month="2025-12",
+                fingerprint="not-cached",
+            )
+        )
+        assert response == {"error": "無効なUUIDです"}
@@ -0,0 +1,118 @@
+import random
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+import app.logics.attendance_day_collect as attendance_day_collect
+from app.caluculation.calc_backends import (
+    DayInput,
+    FastCalcBackend,
+    ReferenceCalcBackend,
+    create_calc_backend,
+)
+from app.models.models import Attendance
+from tools.synthetic_data import NOTIFICATION_PAIRS, make_day_times
+
+REFERENCE = ReferenceCalcBackend()
+FAST = FastCalcBackend()
+# 常勤と、時短・パートの契約時間
+CONTRACT_HOURS = ((8.0, 8.0), (7.5, 7.5), (6.0, 8.0), (4.5, 4.0), (7.8, 6))
+
+
+def _outcome(backend, day):
+    try:
+        return backend.calculate(day)
+    except Exception as error:  # 例外になる入力は、両方が同じ例外になることを確認する
+        return type(error)
+
+
+def _assert_same(days):
+    for day in days:
+        assert _outcome(FAST, day) == _outcome(REFERENCE, day), day
+
+
+def test_backends_agree_on_synthetic_attendance(synthetic_database):
+    with synthetic_database.Session() as db:
+        attendances = db.scalars(select(Attendance)).all()
+    days = [
+        DayInput(
+            contract_work_time=work,
+            contract_holiday_time=holiday,
+            start_time=attendance.STARTTIME,
+            end_time=attendance.ENDTIME,
+            notifications=(attendance.NOTIFICATION, attendance.NOTIFICATION2),
+            overtime_check=attendance.OVERTIME,
+            holiday_work=attendance.HOLIDAY,
+        )
+        for attendance in attendances
+        for work, holiday in CONTRACT_HOURS
+    ]
+
+    assert len(days) > 1000
+    _assert_same(days)
+
+
+def test_backends_agree_on_every_notification_pair():
+    rng = random.Random(3)
+    days = []
+    for notifications in NOTIFICATION_PAIRS:
+        for overtime in ("0", "1"):
+            for work, holiday in CONTRACT_HOURS:
+                for _ in range(3):
+                    start_time, end_time = make_day_times(rng, notifications, overtime)
+                    days.append(
+                        DayInput(work, holiday, start_time, end_time, notifications, overtime)
+                    )
+    _assert_same(days)
+
+
+@pytest.mark.parametrize(
+    "start_time, end_time",
+    [
+        ("07:15", "16:00"),  # 8時前の出勤は8時から
+        ("00:00", "00:00"),
+        ("12:40", "13:00"),
+        ("13:00", "17:30"),
+        ("12:30", "18:00"),
+        ("9:5", "17:30"),  # strptime が受け付ける1桁の表記
+        ("08:30", "9:00"),  # 文字列どうしの比較で "9:00" > "13:00"
+        ("23:40", "23:50"),  # 切り上げで24時になる（例外）
+        ("8:30", "25:00"),
+    ],
+)
+def test_backends_agree_on_edge_times(start_time, end_time):
+    days = [
+        DayInput(8.0, 7.5, start_time, end_time, notifications, overtime)
+        for notifications in (("", ""), ("4", ""), ("", "6"), ("10", "13"), ("16", "9"))
+        for overtime in ("0", "1")
+    ]
+    _assert_same(days)
+
+
+def test_collect_output_is_identical(synthetic_database, monkeypatch):
+    def collect_all(backend):
+        monkeypatch.setattr(attendance_day_collect, "get_calc_backend", lambda: backend)
+        with synthetic_database.Session() as db:
+            return [
+                attendance_day_collect.collect_attendance_data(
+                    staff_id=staff_id,
+                    from_day=date(2025, 12, 1),
+                    to_day=date(2026, 1, 31),
+                    db_session=db,
+                )
+                for staff_id in synthetic_database.staff_ids
+            ]
+
+    assert collect_all(FAST) == collect_all(REFERENCE)
+
+
+def test_unsupported_overtime_check_is_rejected():
+    with pytest.raises(ValueError):
+        DayInput(8.0, 8.0, "08:30", "17:30", ("", ""), None)
+
+
+def test_unknown_backend_is_rejected():
+    assert create_calc_backend("fast").name == "fast"
+    with pytest.raises(ValueError):
+        create_calc_backend("numba")
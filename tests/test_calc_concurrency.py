@@ -0,0 +1,117 @@
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.caluculation.calc_backends import DayInput, create_calc_backend
+from app.caluculation.calc_work_classes_4_mcp import (
+    OUTPUT_REST_TIME_CACHE_SIZE,
+    CalcTimeFactory,
+    output_rest_time,
+)
+from app.logics.attendance_day_collect import collect_staff_month
+from tools.synthetic_data import NOTIFICATION_PAIRS, make_day_times
+
+THREADS = 8
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    # スレッドの切り替えを増やし、共有状態があれば壊れるようにする
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _days(seed):
+    rng = random.Random(seed)
+    days = []
+    for index, notifications in enumerate(NOTIFICATION_PAIRS):
+        overtime = "1" if index % 3 == 0 else "0"
+        start_time, end_time = make_day_times(rng, notifications, overtime)
+        contract = (8.0, 8.0) if seed % 2 else (6.0, 7.5)
+        days.append(DayInput(*contract, start_time, end_time, notifications, overtime))
+    return days
+
+
+def _calculate_with_factory(factory, staff_id, day):
+    calc = factory.get_instance(staff_id)
+    calc.set_data(
+        contract_work_time=day.contract_work_time,
+        contract_holiday_time=day.contract_holiday_time,
+        start_time=day.start_time,
+        end_time=day.end_time,
+        notifications=day.notifications,
+        overtime_check=day.overtime_check,
+        holiday_work=day.holiday_work,
+    )
+    return (
+        calc.calc_normal_rest(calc.calc_base_work_time()),
+        calc.get_actual_work_time(),
+        calc.get_real_time(),
+        calc.get_over_time(),
+    )
+
+
+def _run_in_threads(task, seeds):
+    barrier = threading.Barrier(len(seeds))
+
+    def run(seed):
+        barrier.wait()
+        return task(seed)
+
+    with ThreadPoolExecutor(max_workers=len(seeds)) as executor:
+        return list(executor.map(run, seeds))
+
+
+def test_shared_factory_serves_threads_for_the_same_staff(frequent_thread_switches):
+    factory = CalcTimeFactory()
+    seeds = list(range(THREADS))
+
+    def task(seed):
+        # 全スレッドが同じ社員IDで、別々の日を計算する
+        return [_calculate_with_factory(factory, 1, day) for day in _days(seed)]
+
+    expected = [task(seed) for seed in seeds]
+    assert _run_in_threads(task, seeds) == expected
+    assert factory.get_instance(1) is not factory.get_instance(1)
+
+
+@pytest.mark.parametrize("kind", ["reference", "fast"])
+def test_shared_backend_is_reentrant(kind, frequent_thread_switches):
+    backend = create_calc_backend(kind)
+    seeds = list(range(THREADS))
+
+    def task(seed):
+        return [backend.calculate(day) for day in _days(seed)]
+
+    expected = [task(seed) for seed in seeds]
+    assert _run_in_threads(task, seeds) == expected
+
+
+def test_concurrent_collect_for_the_same_staff(synthetic_database):
+    staff_id = synthetic_database.staff_ids[0]
+
+    def task(_):
+        # MCPツールと同じく、呼び出しごとにセッションを作る
+        with synthetic_database.Session() as db:
+            return collect_staff_month(staff_id, "2025-12-01", "2025-12-31", db).to_dict()
+
+    expected = task(None)
+    results = _run_in_threads(task, list(range(THREADS)))
+
+    assert all(result == expected for result in results)
+
+
+def test_output_rest_time_cache_is_bounded_and_read_only():
+    assert output_rest_time.cache_info().maxsize == OUTPUT_REST_TIME_CACHE_SIZE
+
+    result = output_rest_time("10", "14")
+
+    assert result == {"Off": 1, "Through": 2}
+    with pytest.raises(TypeError):
+        result["Off"] = 0
+    assert output_rest_time("10", "14")["Off"] == 1
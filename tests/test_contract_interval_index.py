@@ -0,0 +1,113 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.database.contract_interval_index import ContractIntervalIndex
+from app.logics.attendance_day_collect import collect_attendance_data
+from app.models.models import StaffHolidayContract, StaffJobContract
+
+
+def _contract(staff_id, start_day, end_day, **values):
+    return SimpleNamespace(
+        STAFFID=staff_id, START_DAY=start_day, END_DAY=end_day, **values
+    )
+
+
+def test_lookup_boundaries():
+    index = ContractIntervalIndex(
+        [
+            _contract(1, date(2025, 1, 1), date(2025, 12, 14), CONTRACT_CODE=1),
+            _contract(1, date(2025, 12, 15), date(9999, 12, 31), CONTRACT_CODE=2),
+            _contract(2, date(2025, 1, 1), None, CONTRACT_CODE=1),
+        ],
+        [],
+        {1: 8.0, 2: None},
+    )
+
+    assert index.job_contract(1, date(2024, 12, 31)) is None
+    assert index.job_contract(1, date(2025, 12, 14)).CONTRACT_CODE == 1
+    assert index.job_contract(1, date(2025, 12, 15)).CONTRACT_CODE == 2
+    # END_DAY が NULL の契約は、DBの範囲結合と同じく一致しない
+    assert index.job_contract(2, date(2025, 6, 1)) is None
+    assert index.job_contract(3, date(2025, 6, 1)) is None
+    assert index.holiday_contract(1, date(2025, 6, 1)) is None
+
+
+def test_lookup_nested_contracts():
+    # 期間の定めのない契約 A の中に、短期の契約 B・C がある
+    index = ContractIntervalIndex(
+        [
+            _contract(1, date(2020, 1, 1), date(9999, 12, 31), CONTRACT_CODE=1),
+            _contract(1, date(2025, 6, 1), date(2025, 6, 30), CONTRACT_CODE=2),
+            _contract(1, date(2025, 6, 10), date(2025, 6, 15), CONTRACT_CODE=3),
+            _contract(1, date(2025, 8, 1), None, CONTRACT_CODE=4),
+        ],
+        [],
+        {},
+    )
+
+    codes = {
+        day: index.job_contract(1, day).CONTRACT_CODE
+        for day in (
+            date(2025, 5, 31),
+            date(2025, 6, 1),
+            date(2025, 6, 12),
+            date(2025, 6, 20),
+            date(2025, 7, 1),
+            date(2025, 8, 2),
+        )
+    }
+    # その日を含む契約のうち、開始日が最も新しい契約
+    assert list(codes.values()) == [1, 2, 3, 2, 1, 1]
+
+
+def _add_nested_contracts(db, summary):
+    """月の途中の数日だけ、既存の契約の中に同じ内容の短期契約を重ねる（3人に1人）"""
+    start, end = date(2025, 12, 5), date(2025, 12, 10)
+    for model, values in (
+        (StaffJobContract, ("JOBTYPE_CODE", "CONTRACT_CODE", "PART_WORKTIME")),
+        (StaffHolidayContract, ("HOLIDAY_TIME",)),
+    ):
+        for staff_id in summary.staff_ids[::3]:
+            outer = (
+                db.query(model)
+                .filter(
+                    model.STAFFID == staff_id,
+                    model.START_DAY < start,
+                    model.END_DAY > end,
+                )
+                .first()
+            )
+            if outer is not None:
+                db.add(
+                    model(
+                        STAFFID=staff_id,
+                        START_DAY=start,
+                        END_DAY=end,
+                        **{name: getattr(outer, name) for name in values},
+                    )
+                )
+
+
+@pytest.mark.parametrize(
+    "synthetic_prepare", [_add_nested_contracts], ids=["nested"], indirect=True
+)
+def test_collect_matches_range_join(synthetic_database, synthetic_session):
+    db = synthetic_session
+    from_day, to_day = "2025-12-01", "2025-12-31"
+    contract_index = ContractIntervalIndex.load(
+        db, date(2025, 12, 1), date(2025, 12, 31)
+    )
+
+    nested = db.query(StaffJobContract).filter(
+        StaffJobContract.START_DAY == date(2025, 12, 5)
+    )
+    assert nested.count() > 0
+
+    for staff_id in synthetic_database.staff_ids:
+        expected = collect_attendance_data(staff_id, from_day, to_day, db)
+        actual = collect_attendance_data(
+            staff_id, from_day, to_day, db, contract_index=contract_index
+        )
+        assert actual == expected
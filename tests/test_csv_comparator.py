@@ -1,9 +1,14 @@
+import io
 import pytest
 import json
 from pathlib import Path
 
 # テスト対象の関数をインポート
-from app.logics.csv_comparator import compare_csv_files, REQUIRED_COLUMNS
+from app.logics.csv_comparator import (
+    compare_csv_files,
+    CsvTooLargeError,
+    REQUIRED_COLUMNS,
+)
 
 # --- テストデータ ---
 # ヘッダー
@@ -92,6 +97,71 @@ def test_compare_with_no_differences(tmp_path: Path):
     assert result == {}
 
 
+def test_compare_file_objects_without_copy():
+    """アップロードと同じく、ファイルオブジェクト（バイト列）をそのまま比較できることをテストする"""
+    # 比較しない列（備考）は読み込まない
+    header = HEADER + ",備考"
+    old = io.BytesIO("\n".join([header, "001,160.0,160.0,0,0,10.5,0,a"]).encode())
+    new = io.BytesIO("\n".join([header, "001,160.0,160.0,0,0,12.0,0,b"]).encode())
+
+    result = json.loads(compare_csv_files(old, new))
+
+    assert result == {"001": [{"時間外": {"旧": "10.5", "新": "12.0"}}]}
+
+
+def test_compare_text_buffer_and_path(tmp_path: Path):
+    """パスとテキストのバッファを混ぜて比較できることをテストする"""
+    data = "\n".join([HEADER, "001,160.0,160.0,0,0,10.5,0"])
+    old_file = tmp_path / "old.csv"
+    old_file.write_text(data, encoding="utf-8")
+
+    assert json.loads(compare_csv_files(old_file, io.StringIO(data))) == {}
+
+
+def test_compare_across_chunks(monkeypatch):
+    """新ファイルをチャンクごとに照合しても、チャンクの境界をまたいで社員IDで対応付けることをテストする"""
+    monkeypatch.setattr("app.logics.csv_comparator.CSV_CHUNK_ROWS", 2)
+    rows = [f"{staff_id:03d},160.0,160.0,0,0,10.5,0" for staff_id in range(7)]
+    # 新ファイルは並び順が違い、2人分だけ値が変わっている
+    changed = {"001": "12.0", "005": "9.0"}
+    new_rows = [
+        row.replace(",10.5,", f",{changed[row[:3]]},") if row[:3] in changed else row
+        for row in reversed(rows)
+    ]
+    old = io.StringIO("\n".join([HEADER, *rows]))
+    new = io.StringIO("\n".join([HEADER, *new_rows, "010,160.0,160.0,0,0,10.5,0"]))
+
+    result = json.loads(compare_csv_files(old, new))
+
+    assert result.pop("010")[0] == {"実働時間計": {"旧": None, "新": "160.0"}}
+    assert result == {
+        "005": [{"時間外": {"旧": "10.5", "新": "9.0"}}],
+        "001": [{"時間外": {"旧": "10.5", "新": "12.0"}}],
+    }
+
+
+def test_size_limit(tmp_path: Path):
+    """上限を超えるCSVは、バイナリ・テキストのファイルオブジェクトでもパスでも CsvTooLargeError になることをテストする"""
+    rows = [f"{staff_id:03d},160.0,160.0,0,0,10.5,0" for staff_id in range(50)]
+    data = "\n".join([HEADER, *rows]).encode("utf-8")
+    csv_file = tmp_path / "new.csv"
+    csv_file.write_bytes(data)
+
+    with pytest.raises(CsvTooLargeError):
+        compare_csv_files(io.BytesIO(data), io.BytesIO(data), max_bytes=len(data) - 1)
+    with pytest.raises(CsvTooLargeError):
+        compare_csv_files(str(csv_file), str(csv_file), max_bytes=len(data) - 1)
+    text = data.decode("utf-8")
+    with pytest.raises(CsvTooLargeError):
+        compare_csv_files(io.StringIO(text), io.StringIO(text), max_bytes=len(data) - 1)
+    assert json.loads(
+        compare_csv_files(io.StringIO(text), io.StringIO(text), max_bytes=len(data))
+    ) == {}
+    assert json.loads(
+        compare_csv_files(io.BytesIO(data), io.BytesIO(data), max_bytes=len(data))
+    ) == {}
+
+
 def test_file_not_found_error():
     """存在しないファイルを指定した場合にFileNotFoundErrorが発生することをテストする"""
     with pytest.raises(FileNotFoundError):
@@ -0,0 +1,29 @@
+from app.logics.day_table import MISSING, build_day_table, to_csv, to_html
+from app.logics.logic_util import convert_to_dataframe
+
+
+def _sample_data():
+    return {
+        "社員ID": 3,
+        "勤務形態": "7H常勤",
+        1: {"日付": 1, "オンコール": None, "出勤": "08:36", "備考": "<遅刻>&"},
+        2: {"日付": 2, "オンコール": "1", "出勤": "00:00", "備考": ""},
+        # 列が欠けた日（DataFrame では NaN になる）
+        3: {"日付": 3, "出勤": "09:00", "異常": "WT_SHORT"},
+    }
+
+
+def test_build_day_table_keeps_column_order():
+    table = build_day_table(_sample_data())
+
+    assert table.header == [("社員ID", 3), ("勤務形態", "7H常勤")]
+    assert table.columns == ["日付", "オンコール", "出勤", "備考", "異常"]
+    assert table.rows[2] == [3, MISSING, "09:00", MISSING, "WT_SHORT"]
+
+
+def test_output_matches_pandas():
+    table = build_day_table(_sample_data())
+    df = convert_to_dataframe(_sample_data())
+
+    assert to_html(table) == df.to_html(classes="table table-striped", index=False)
+    assert to_csv(table) == df.to_csv(index=False)
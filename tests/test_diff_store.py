@@ -0,0 +1,157 @@
+import json
+
+import pytest
+
+from app.logics.csv_comparator import REQUIRED_COLUMNS, CsvDifference
+from app.server import diff_store as diff_store_module
+from app.server.diff_store import DiffStore
+
+
+def _differences(employee_count, columns=("実働時間計", "時間外")):
+    for employee in range(employee_count):
+        for column in columns:
+            yield CsvDifference(f"{employee:03d}", column, "1.0", "2.0")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DiffStore(str(tmp_path / "diff.db"))
+    yield store
+    store.close()
+
+
+def test_save_and_query_pages(store):
+    diff_id = store.save(_differences(120), "old.csv", "new.csv")
+
+    run = store.run(diff_id)
+    assert (run.old_name, run.new_name) == ("old.csv", "new.csv")
+    assert (run.employee_count, run.difference_count) == (120, 240)
+    assert run.columns == ["実働時間計", "時間外"]
+
+    total, first = store.query(diff_id, limit=100)
+    _, second = store.query(diff_id, offset=100, limit=100)
+    assert total == 240
+    assert first[0] == CsvDifference("000", "実働時間計", "1.0", "2.0")
+    assert second[0] == CsvDifference("050", "実働時間計", "1.0", "2.0")
+
+    assert store.query(diff_id, employee_id="007") == (
+        2,
+        [
+            CsvDifference("007", "実働時間計", "1.0", "2.0"),
+            CsvDifference("007", "時間外", "1.0", "2.0"),
+        ],
+    )
+    total, rows = store.query(diff_id, column="時間外", offset=118)
+    assert total == 120
+    assert [row.employee_id for row in rows] == ["118", "119"]
+    assert list(store.iter_all(diff_id, batch_size=7)) == list(_differences(120))
+
+
+def test_concurrent_results_do_not_mix(store):
+    first = store.save(_differences(2))
+    second = store.save(_differences(3, columns=("時間休計",)))
+
+    assert first != second
+    assert store.query(first)[0] == 4
+    assert store.query(second, column="時間外")[0] == 0
+    assert store.run("missing") is None
+
+
+def test_failed_save_leaves_nothing(store):
+    def broken():
+        yield from _differences(1)
+        raise ValueError("CSVを読み込めませんでした")
+
+    with pytest.raises(ValueError):
+        store.save(broken())
+
+    assert store._conn.execute("SELECT COUNT(*) FROM diff_run").fetchone() == (0,)
+    assert store._conn.execute("SELECT COUNT(*) FROM diff_row").fetchone() == (0,)
+
+
+def test_old_results_are_removed(store, monkeypatch):
+    old = store.save(_differences(1))
+    monkeypatch.setattr(diff_store_module, "DIFF_RETENTION_DAYS", 0)
+
+    store.save(_differences(1))
+
+    assert store.run(old) is None
+    assert store._conn.execute("SELECT COUNT(*) FROM diff_row").fetchone() == (2,)
+
+
+def test_upload_to_paged_api(store, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.server.endpoint as endpoint
+
+    monkeypatch.setattr(endpoint, "is_valid_uuid", lambda uuid: True)
+    monkeypatch.setattr(endpoint, "get_diff_store", lambda: store)
+    header = ",".join(REQUIRED_COLUMNS)
+    old = "\n".join([header, "001,160.0,160.0,0,0,10.5,0", "002,150.0,150.0,1,0,5.0,8.0"])
+    new = "\n".join([header, "001,160.0,160.0,0,0,12.0,0", "002,150.0,150.0,1,0,5.0,8.0"])
+    client = TestClient(endpoint.app)
+
+    response = client.post(
+        "/output-csv-compare",
+        data={"uuid": "u"},
+        files={"old_csv": ("old.csv", old), "new_csv": ("new.csv", new)},
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    diff_id = response.headers["location"].split("diff_id=")[1]
+
+    page = client.get(f"/csv-diff/{diff_id}/rows", params={"uuid": "u"}).json()
+    assert page == {
+        "total": 1,
+        "offset": 0,
+        "limit": 100,
+        "items": [{"employee_id": "001", "column": "時間外", "old": "10.5", "new": "12.0"}],
+    }
+    download = client.get(f"/csv-diff/{diff_id}/download", params={"uuid": "u"})
+    assert json.loads(download.text) == {"001": [{"時間外": {"旧": "10.5", "新": "12.0"}}]}
+    page = client.get("/csv-diff/missing/rows", params={"uuid": "u"})
+    assert page.status_code == 404
+    assert "diff-more" in client.get(f"/csv-diff?uuid=u&diff_id={diff_id}").text
+
+
+def test_download_groups_non_adjacent_employees(store):
+    differences = [
+        CsvDifference("002", "時間外", "1.0", "2.0"),
+        CsvDifference("001", "時間外", "1.0", "2.0"),
+        CsvDifference("002", "実働時間計", "8.0", "9.0"),
+    ]
+    diff_id = store.save(differences)
+
+    assert list(store.iter_all(diff_id, batch_size=1)) == [
+        differences[1],
+        differences[0],
+        differences[2],
+    ]
+
+
+def test_blank_employee_id_is_saved(store, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.server.endpoint as endpoint
+
+    monkeypatch.setattr(endpoint, "is_valid_uuid", lambda uuid: True)
+    monkeypatch.setattr(endpoint, "get_diff_store", lambda: store)
+    header = ",".join(REQUIRED_COLUMNS)
+    old = "\n".join([header, "001,160.0,160.0,0,0,10.5,0"])
+    new = "\n".join([header, "001,160.0,160.0,0,0,12.0,0", ",8.0,8.0,0,0,0,0"])
+    client = TestClient(endpoint.app)
+
+    response = client.post(
+        "/output-csv-compare",
+        data={"uuid": "u"},
+        files={"old_csv": ("old.csv", old), "new_csv": ("new.csv", new)},
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    diff_id = response.headers["location"].split("diff_id=")[1]
+
+    assert store.run(diff_id).employee_count == 2
+    download = client.get(f"/csv-diff/{diff_id}/download", params={"uuid": "u"})
+    result = json.loads(download.text)
+    assert list(result) == ["", "001"]
+    assert result["001"] == [{"時間外": {"旧": "10.5", "新": "12.0"}}]
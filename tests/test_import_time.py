@@ -0,0 +1,39 @@
+from tools.import_time import (
+    DEFERRED_MODULES,
+    measure_once,
+    parse_importtime,
+    summarize_runs,
+)
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     json.decoder
+import time:       200 |        300 |   json
+import time:        50 |        350 | app.sample
+"""
+
+
+def test_parse_importtime():
+    records = parse_importtime(SAMPLE)
+
+    assert [(r.module, r.cumulative_us, r.depth) for r in records] == [
+        ("json.decoder", 100, 2),
+        ("json", 300, 1),
+        ("app.sample", 350, 0),
+    ]
+
+
+def test_summarize_runs_reports_median_and_top_modules():
+    runs = [parse_importtime(SAMPLE), parse_importtime(SAMPLE)]
+
+    summary = summarize_runs("app.sample", runs, top=5)
+
+    assert summary["median_ms"] == 0.35
+    assert summary["top_modules"] == [("json", 0.3)]
+    assert summary["deferred_imported"] == []
+
+
+def test_endpoint_import_defers_heavy_modules():
+    imported = {record.module for record in measure_once("app.server.endpoint")}
+
+    assert imported.isdisjoint(DEFERRED_MODULES)
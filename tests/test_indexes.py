@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from app.database.database_base import Base
+from app.database.indexes import (
+    composite_indexes,
+    drop_redundant_indexes,
+    ensure_composite_indexes,
+    explain_attendance_queries,
+    find_redundant_indexes,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indexes.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _index_names(engine, table_name):
+    return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+
+def test_ensure_composite_indexes_adds_missing(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_attendance_staff_workday")
+
+    assert ensure_composite_indexes(engine) == ["ix_attendance_staff_workday"]
+    assert ensure_composite_indexes(engine) == []
+    assert "ix_attendance_staff_workday" in _index_names(engine, "M_ATTENDANCE")
+
+
+def test_explain_uses_composite_index(engine):
+    plans = explain_attendance_queries(engine, 1, date(2025, 12, 1), date(2025, 12, 31))
+
+    plan = "\n".join(plans["get_perfect_contract_attendance"])
+    assert "ix_attendance_staff_workday" in plan
+    # 契約の範囲結合は主キー (STAFFID, START_DAY) で引く
+    assert "sqlite_autoindex_D_JOB_HISTORY_1 (STAFFID=? AND START_DAY<?)" in plan
+    assert plans["get_distinct_user_query"]
+
+
+def test_drop_redundant_keeps_foreign_key_and_composite_indexes(engine):
+    reported = {redundant.name for redundant in find_redundant_indexes(engine)}
+    assert "ix_M_ATTENDANCE_REMARK" in reported
+    assert "ix_D_JOB_HISTORY_CONTRACT_CODE" not in reported
+
+    dropped = drop_redundant_indexes(engine)
+
+    assert set(dropped) == reported
+    assert find_redundant_indexes(engine) == []
+    job_indexes = _index_names(engine, "D_JOB_HISTORY")
+    assert "ix_D_JOB_HISTORY_CONTRACT_CODE" in job_indexes
+    for index in composite_indexes():
+        assert index.name in _index_names(engine, index.table.name)
+    # モデルのメタデータに同名のインデックスを追加しない（後の create_all が失敗する）
+    for table in Base.metadata.tables.values():
+        names = [index.name for index in table.indexes]
+        assert len(names) == len(set(names))
+
+
+def test_obsolete_range_indexes_are_dropped(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            'CREATE INDEX ix_job_history_staff_range ON "D_JOB_HISTORY" '
+            '("STAFFID", "START_DAY", "END_DAY")'
+        )
+
+    reported = {redundant.name for redundant in find_redundant_indexes(engine)}
+    assert "ix_job_history_staff_range" in reported
+
+    drop_redundant_indexes(engine)
+
+    assert "ix_job_history_staff_range" not in _index_names(engine, "D_JOB_HISTORY")
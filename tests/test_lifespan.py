@@ -0,0 +1,61 @@
+import asyncio
+
+import anyio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database.reference_cache import reference_cache
+from app.server import lifespan
+from app.server.sse_sessions import SseSessionTracker
+
+
+def test_drain_waits_for_in_flight_calls_then_closes_sessions():
+    tracker = SseSessionTracker()
+    events = []
+
+    async def sse_session():
+        async with tracker.session():
+            await anyio.sleep_forever()
+        events.append("session closed")
+
+    async def tool_call():
+        with tracker.in_flight():
+            await anyio.sleep(0.2)
+            events.append("call finished")
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(sse_session)
+            tg.start_soon(tool_call)
+            await anyio.sleep(0.05)
+            assert tracker.active_sessions == 1
+            closed = await tracker.drain(timeout=5)
+            assert closed == 1
+
+    asyncio.run(main())
+
+    assert events == ["call finished", "session closed"]
+    assert tracker.draining
+
+
+@pytest.fixture
+def lifespan_database(synthetic_database, monkeypatch):
+    monkeypatch.setattr(lifespan, "engine", synthetic_database.engine)
+    monkeypatch.setattr(lifespan, "Session", synthetic_database.Session)
+    yield synthetic_database
+    reference_cache.clear()
+
+
+def test_lifespan_warms_up_and_shuts_down(lifespan_database, monkeypatch):
+    closed = []
+    monkeypatch.setattr(lifespan, "_shutdown_callbacks", [lambda: closed.append(1)])
+    app = FastAPI(lifespan=lifespan.app_lifespan)
+
+    with TestClient(app):
+        assert reference_cache.loaded
+        assert reference_cache.notification_name("3") == "年休（全日）"
+        assert reference_cache.contract_name(2) == "パート"
+
+    assert closed == [1]
+    assert lifespan.workers._tasks == []
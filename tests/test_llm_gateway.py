@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+
+from app.server.llm_gateway import (
+    FakeLlmBackend,
+    LlmBusyError,
+    LlmGateway,
+    LlmResponseCache,
+    response_key,
+)
+
+
+def _collect(gateway, prompt, payload=""):
+    async def main():
+        return [text async for text in gateway.stream(prompt, payload)]
+
+    return asyncio.run(main())
+
+
+def test_streams_chunks_and_caches_by_prompt_and_payload():
+    backend = FakeLlmBackend(reply=lambda contents: contents.upper(), chunk_size=4)
+    gateway = LlmGateway(backend, model="fake")
+
+    assert _collect(gateway, "abc", "payload") == ["ABC\n", "\nPAY", "LOAD"]
+    # 2回目はキャッシュから全文を1回で返し、モデルを呼ばない
+    assert _collect(gateway, "abc", "payload") == ["ABC\n\nPAYLOAD"]
+    assert backend.calls == ["abc\n\npayload"]
+
+    assert _collect(gateway, "abc", "other") == ["ABC\n", "\nOTH", "ER"]
+    assert len(backend.calls) == 2
+
+
+def test_response_key_separates_parts():
+    assert response_key("m", "ab", "c") != response_key("m", "a", "bc")
+
+
+def test_cache_expires_and_evicts():
+    cache = LlmResponseCache(max_entries=1, ttl=0)
+    cache.store("a", "text")
+    assert cache.get("a") is None
+
+    cache = LlmResponseCache(max_entries=1, ttl=60)
+    cache.store("a", "1")
+    cache.store("b", "2")
+    assert cache.get("a") is None
+    assert cache.get("b") == "2"
+
+
+def test_abandoned_stream_is_not_cached():
+    backend = FakeLlmBackend(reply="0123456789", chunk_size=2)
+    gateway = LlmGateway(backend, model="fake")
+
+    async def main():
+        stream = gateway.stream("q")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(main()) == "01"
+    assert _collect(gateway, "q") == ["01", "23", "45", "67", "89"]
+    assert len(backend.calls) == 2
+
+
+def test_concurrency_is_bounded_and_excess_is_queued_or_rejected():
+    backend = FakeLlmBackend(reply="abcdef", chunk_size=1, delay=0.01)
+    gateway = LlmGateway(backend, model="fake", max_concurrency=1, max_queue=1)
+    running = []
+
+    async def ask(prompt):
+        running.append(prompt)
+        return await gateway.generate(prompt)
+
+    async def main():
+        first = asyncio.create_task(ask("1"))
+        await asyncio.sleep(0.015)
+        second = asyncio.create_task(ask("2"))
+        await asyncio.sleep(0)
+        assert gateway.waiting == 1
+        with pytest.raises(LlmBusyError):
+            await gateway.generate("3")
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == ["abcdef", "abcdef"]
+    # 待たされた呼び出しは、前の呼び出しが終わってからモデルに送られる
+    assert backend.calls == ["1", "2"]
+
+
+def test_answer_is_streamed_over_sse(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.server.endpoint as endpoint
+
+    backend = FakeLlmBackend(reply="3日は\n届出漏れです", chunk_size=5)
+    monkeypatch.setattr(
+        endpoint, "get_llm_gateway", lambda: LlmGateway(backend, model="fake")
+    )
+    endpoint.get_state_backend().set(
+        "llm_request:test",
+        json.dumps({"user_input": "3日は？", "payload": "{}"}),
+        ttl=60,
+    )
+    client = TestClient(endpoint.app)
+
+    response = client.get("/analyze-attendance-stream/test")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0], [line[6:] for line in block.split("\n")[1:]])
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert events == [
+        ("event: token", ["3日は", "届"]),
+        ("event: token", ["出漏れです"]),
+        ("event: done", [""]),
+    ]
+    assert backend.calls == ["3日は？\n\n{}"]
+    # 同じ質問は一度しか受け付けない
+    assert client.get("/analyze-attendance-stream/test").status_code == 404
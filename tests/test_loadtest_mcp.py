@@ -0,0 +1,40 @@
+from app.metrics import MetricsRegistry, Counter
+from tools.loadtest_mcp import Schedule, parse_metrics, parse_staff_ids, percentile
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0, 1.0, 2.0], 100) == 3.0
+    assert percentile([], 95) == 0.0
+
+
+def test_parse_metrics_reads_registry_output():
+    registry = MetricsRegistry()
+    counter = registry.register(
+        Counter("test_total", "Test.", labelnames=("cache",))
+    )
+    counter.inc(2.0, "anomaly_index")
+
+    samples = parse_metrics(registry.render())
+
+    assert samples == {'test_total{cache="anomaly_index"}': 2.0}
+
+
+def test_parse_staff_ids():
+    assert parse_staff_ids("1-3, 7,10-11") == [1, 2, 3, 7, 10, 11]
+
+
+def test_schedule_spreads_calls_over_duration():
+    schedule = Schedule(rate=10.0, duration=2.0)
+    schedule.start = 100.0
+
+    times = []
+    while (scheduled := schedule.take()) is not None:
+        times.append(scheduled)
+
+    assert len(times) == 20
+    assert times[0] == 100.0
+    assert abs(times[-1] - 101.9) < 1e-9
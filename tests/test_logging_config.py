@@ -0,0 +1,23 @@
+import json
+import logging
+
+from app.logging_config import JsonFormatter, parse_module_levels
+
+
+def test_parse_module_levels():
+    assert parse_module_levels("app.caluculation=debug, app.server=WARNING,bad") == {
+        "app.caluculation": "DEBUG",
+        "app.server": "WARNING",
+    }
+    assert parse_module_levels("") == {}
+
+
+def test_json_formatter_uses_lazy_args():
+    record = logging.LogRecord(
+        "app.test", logging.INFO, __file__, 1, "Work Day: %s", ("2025-12-01",), None
+    )
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["logger"] == "app.test"
+    assert payload["level"] == "INFO"
+    assert payload["message"] == "Work Day: 2025-12-01"
@@ -0,0 +1,41 @@
+from app.metrics import Counter, Histogram, MetricsRegistry, STAGE_SECONDS, span
+
+
+def test_histogram_render_is_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.register(
+        Histogram("test_seconds", "Test.", labelnames=("stage",), buckets=(0.1, 1.0))
+    )
+    histogram.observe(0.05, "db")
+    histogram.observe(0.5, "db")
+    histogram.observe(5.0, "db")
+
+    text = registry.render()
+
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{stage="db",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="db",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{stage="db",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="db"} 3' in text
+
+
+def test_counter_labels():
+    counter = Counter("test_total", "Test.", labelnames=("cache",))
+    counter.inc(1.0, "anomaly_index")
+    counter.inc(2.0, "anomaly_index")
+
+    assert counter.value("anomaly_index") == 3.0
+    assert 'test_total{cache="anomaly_index"} 3.0' in counter.render()
+
+
+def test_span_as_decorator_and_context_manager():
+    @span("test_stage_decorated")
+    def work():
+        return "done"
+
+    assert work() == "done"
+    with span("test_stage_with"):
+        pass
+
+    assert STAGE_SECONDS.count("test_stage_decorated") == 1
+    assert STAGE_SECONDS.count("test_stage_with") == 1
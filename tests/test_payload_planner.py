@@ -0,0 +1,127 @@
+import json
+
+from app.logics.payload_planner import (
+    dump_payload,
+    estimate_tokens,
+    plan_payload,
+    plan_tool_result,
+    summarize_section,
+)
+
+
+def _day(day, anomaly="", **values):
+    record = {
+        "d": day,
+        "oc": "0",
+        "in": "08:30",
+        "out": "17:30",
+        "am": "",
+        "pm": "",
+        "oa": "0",
+        "nr": "1:00",
+        "tr": "0",
+        "wt": "8:00",
+        "rt": "08:00",
+        "ot": "00:00",
+        "rmk": "",
+        "an": anomaly,
+    }
+    record.update(values)
+    return record
+
+
+def _month(staff_id, anomalous_days=(3, 10)):
+    header = {"sid": staff_id, "typ": "8H常勤", "cw": 8.0, "ch": 8.0}
+    days = [
+        _day(day, "WT_SHORT" if day in anomalous_days else "") for day in range(1, 31)
+    ]
+    return [header, *days]
+
+
+def test_estimate_tokens_counts_japanese_per_character():
+    assert estimate_tokens("a" * 400) == 101
+    assert estimate_tokens("年休" * 50) == 101
+
+
+def test_small_payload_is_sent_as_is():
+    records = _month(1)
+    raw = dump_payload(records)
+
+    plan = plan_tool_result("2025-12", raw)
+
+    assert plan.mode == "full"
+    assert plan.text == raw
+    assert plan.describe() == ""
+
+
+def test_non_json_tool_result_is_passed_through():
+    plan = plan_tool_result("2025-12", "Error: no such staff", budget=1)
+
+    assert (plan.mode, plan.text) == ("full", "Error: no such staff")
+
+
+def test_summarize_section_totals():
+    records = [
+        {"sid": 1, "typ": "8H常勤", "cw": 8.0, "ch": 8.0},
+        _day(1, "WT_SHORT", wt="7:30", rt="07:30", ot="-00:30"),
+        _day(2, oa="1", ot="01:15", wt="9:15", rt="09:15", am="年休（半日）"),
+        _day(3, "TR,WT_SHORT", tr="2", wt="6:00", rt="06:00", pm="時間休（2時間）"),
+    ]
+
+    summary = summarize_section("2025-12", records)
+
+    assert summary["m"] == "2025-12"
+    assert summary["sid"] == 1
+    assert summary["totals"] == {
+        "days": 3,
+        "wt": 22.75,
+        "rt": 22.75,
+        "ot_plus": 1.25,
+        "ot_minus": -0.5,
+        "oa_days": 1,
+        "tr_days": 1,
+        "notifications": {"年休（半日）": 1, "時間休（2時間）": 1},
+        "an": {"WT_SHORT": 2, "TR": 1},
+    }
+    assert [day["d"] for day in summary["days"]] == [1, 3]
+
+
+def test_large_payload_is_summarized_with_anomalous_days():
+    sections = [("2025-12", _month(staff_id)) for staff_id in range(1, 11)]
+    full_tokens = estimate_tokens(
+        dump_payload([{"m": m, "data": r} for m, r in sections])
+    )
+
+    plan = plan_payload(sections, budget=full_tokens // 2)
+
+    assert plan.mode == "summary"
+    assert plan.estimated_tokens <= plan.budget
+    assert plan.omitted == {"normal_days": 280, "anomalous_days": 0}
+    summaries = json.loads(plan.text)
+    assert [summary["sid"] for summary in summaries] == list(range(1, 11))
+    assert all([day["d"] for day in s["days"]] == [3, 10] for s in summaries)
+    assert "280 日分" in plan.describe()
+
+
+def test_anomalous_days_are_trimmed_to_fit_budget():
+    sections = [
+        ("2025-11", _month(1, anomalous_days=range(1, 31))),
+        ("2025-12", _month(1, anomalous_days=(5,))),
+    ]
+    summary_only = [summarize_section(m, r) for m, r in sections]
+    for summary in summary_only:
+        summary["days"] = []
+    budget = estimate_tokens(dump_payload(summary_only)) + 400
+
+    plan = plan_payload(sections, budget=budget)
+
+    summaries = json.loads(plan.text)
+    assert plan.estimated_tokens <= budget
+    # 異常の多い月から、後ろの日付を省く
+    november, december = summaries
+    kept = [day["d"] for day in november["days"]]
+    assert kept == list(range(1, len(kept) + 1))
+    assert november["anomalous_days_omitted"] == 30 - len(kept)
+    assert [day["d"] for day in december["days"]] == [5]
+    assert plan.omitted["anomalous_days"] == 30 - len(kept)
+    assert "anomalous_days_omitted" in plan.describe()
@@ -0,0 +1,146 @@
+import asyncio
+import pstats
+import threading
+
+import pytest
+
+from app.server import profiling
+
+
+class FakeRequest:
+    def __init__(self, headers=None, query_params=None):
+        self.headers = headers or {}
+        self.query_params = query_params or {}
+
+
+def test_requested_profile_mode_requires_admin_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+
+    assert profiling.requested_profile_mode(FakeRequest()) is None
+    assert profiling.requested_profile_mode(FakeRequest({"x-profile": "cprofile"})) is None
+    assert (
+        profiling.requested_profile_mode(
+            FakeRequest({"x-profile": "cprofile", "x-profile-token": "wrong"})
+        )
+        is None
+    )
+    assert (
+        profiling.requested_profile_mode(
+            FakeRequest(query_params={"profile": "sample", "profile_token": "secret"})
+        )
+        == "sample"
+    )
+
+
+def test_profiled_is_noop_when_disabled(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "")
+
+    async def handler(request=None):
+        return "ok"
+
+    assert profiling.profiled("test")(handler) is handler
+
+
+def test_run_profiled_saves_and_limits_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "PROFILE_MAX_FILES", 2)
+
+    async def handler():
+        return await profiling.run_in_threadpool(sum, range(1000))
+
+    for mode in ("cprofile", "sample", "cprofile"):
+        result = asyncio.run(profiling.run_profiled("test", mode, handler))
+        assert result == sum(range(1000))
+
+    saved = profiling.list_profiles()
+    assert len(saved) == 2
+    pstats_files = [path for path in saved if path.suffix == ".pstats"]
+    assert pstats_files
+    pstats.Stats(str(pstats_files[0]))
+
+
+def _threaded_work():
+    return sum(range(1000))
+
+
+def _loop_work():
+    return sum(range(1000))
+
+
+def test_cprofile_measures_only_threadpool_work(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    async def handler():
+        # イベントループ側の処理（他のリクエストのコルーチンと区別できない）は計測しない
+        _loop_work()
+        return await profiling.run_in_threadpool(_threaded_work)
+
+    asyncio.run(profiling.run_profiled("test", "cprofile", handler))
+
+    (path,) = profiling.list_profiles()
+    names = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert "_threaded_work" in names
+    assert "_loop_work" not in names
+
+
+def test_sampler_is_restricted_to_request_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "SAMPLE_INTERVAL", 0.001)
+    stop = threading.Event()
+
+    def other_request():
+        while not stop.is_set():
+            _loop_work()
+
+    def threaded_work():
+        stop.wait(0.05)
+
+    other = threading.Thread(target=other_request, name="other-request")
+    other.start()
+
+    async def handler():
+        return await profiling.run_in_threadpool(threaded_work)
+
+    try:
+        asyncio.run(profiling.run_profiled("test", "sample", handler))
+    finally:
+        stop.set()
+        other.join()
+
+    (path,) = profiling.list_profiles()
+    stacks = path.read_text(encoding="utf-8")
+    assert "threaded_work" in stacks
+    assert "other-request" not in stacks
+
+
+def test_concurrent_profile_is_rejected(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    request = FakeRequest({"x-profile": "cprofile", "x-profile-token": "secret"})
+
+    async def main():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_handler(request=None):
+            started.set()
+            await release.wait()
+            return "slow"
+
+        async def handler(request=None):
+            return "ok"
+
+        first = asyncio.create_task(profiling.profiled("slow")(slow_handler)(request=request))
+        await started.wait()
+        with pytest.raises(profiling.ProfileBusyError):
+            await profiling.run_profiled("test", "sample", handler)
+        response = await profiling.profiled("test")(handler)(request=request)
+        release.set()
+        return await first, response
+
+    first, response = asyncio.run(main())
+
+    assert first == "slow"
+    assert response.status_code == 409
+    # 計測が終われば次の計測を受け付ける
+    assert asyncio.run(profiling.run_profiled("test", "cprofile", lambda: asyncio.sleep(0))) is None
@@ -0,0 +1,175 @@
+import asyncio
+import sqlite3
+import time
+
+import anyio
+import pytest
+from mcp.server.sse import SseServerTransport
+
+from app.server.session_routing import McpSessionRouter
+from app.server.state_backend import MemoryStateBackend, SqliteStateBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryStateBackend()
+    else:
+        backend = SqliteStateBackend(str(tmp_path / "state.db"))
+    yield backend
+    backend.close()
+
+
+def test_values_expire_after_ttl(backend):
+    backend.set("uuid:a", "user-a", ttl=0.05)
+    backend.set("uuid:b", "user-b")
+
+    assert backend.get("uuid:a") == "user-a"
+    time.sleep(0.1)
+    assert backend.get("uuid:a") is None
+    assert backend.get("uuid:b") == "user-b"
+
+    backend.delete("uuid:b")
+    assert backend.get("uuid:b") is None
+
+
+def test_queue_pops_in_order_once(backend):
+    backend.push("inbox", "1")
+    backend.push("inbox", "2")
+    backend.push("other", "x")
+
+    assert backend.pop_all("inbox") == ["1", "2"]
+    assert backend.pop_all("inbox") == []
+    assert backend.pop_all("other") == ["x"]
+
+
+def test_sqlite_state_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = SqliteStateBackend(path)
+    worker_b = SqliteStateBackend(path)
+
+    worker_a.set("uuid:a", "user-a", ttl=60)
+    worker_b.push("inbox", "message")
+
+    assert worker_b.get("uuid:a") == "user-a"
+    assert worker_a.pop_all("inbox") == ["message"]
+    worker_a.close()
+    worker_b.close()
+
+
+def test_sqlite_empty_pop_does_not_wait_for_the_write_lock(tmp_path):
+    path = str(tmp_path / "state.db")
+    backend = SqliteStateBackend(path)
+    backend.push("inbox", "message")
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        assert backend.pop_all("idle") == []
+        # 空のキューの確認は、ほかの接続の書き込みトランザクションを待たない
+        assert time.perf_counter() - started < 1.0
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert backend.pop_all("inbox") == ["message"]
+    backend.close()
+
+
+def test_sqlite_sweeps_expired_keys_on_write(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.server.state_backend.STATE_SQLITE_SWEEP_SECONDS", 0.0)
+    path = str(tmp_path / "state.db")
+    backend = SqliteStateBackend(path)
+    for index in range(5):
+        backend.set(f"uuid:{index}", "user", ttl=0.01)
+    backend.set("token", "kept")
+    time.sleep(0.05)
+
+    backend.set("uuid:new", "user", ttl=60)
+
+    with sqlite3.connect(path) as conn:
+        keys = {key for (key,) in conn.execute("SELECT key FROM kv")}
+    assert keys == {"token", "uuid:new"}
+    backend.close()
+
+
+def test_message_is_relayed_to_the_worker_owning_the_session(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.server.session_routing.RELAY_POLL_SECONDS", 0.01)
+    monkeypatch.setattr("app.server.session_routing.RELAY_MAX_POLL_SECONDS", 0.05)
+    path = str(tmp_path / "state.db")
+    backend_a = SqliteStateBackend(path)
+    backend_b = SqliteStateBackend(path)
+    transport_a = SseServerTransport("/messages")
+    transport_b = SseServerTransport("/messages")
+    router_a = McpSessionRouter(transport_a, lambda: backend_a)
+    router_b = McpSessionRouter(transport_b, lambda: backend_b)
+    router_b.worker_id = "worker-b"
+
+    sse_scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/sse",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+    }
+    sse_body = []
+    disconnected = anyio.Event()
+
+    async def sse_receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def sse_send(message):
+        if message["type"] == "http.response.body":
+            sse_body.append(message.get("body", b""))
+
+    async def post_to_b(session_id):
+        body = b'{"jsonrpc": "2.0", "method": "notifications/initialized"}'
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/messages",
+            "root_path": "",
+            "query_string": f"session_id={session_id}".encode(),
+            "headers": [(b"content-type", b"application/json")],
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {"type": "http.disconnect"}
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await router_b.handle_post(scope, receive, send)
+        return statuses[0]
+
+    async def main():
+        async with router_a.track(sse_send) as send:
+            async with transport_a.connect_sse(sse_scope, sse_receive, send) as (
+                read_stream,
+                _,
+            ):
+                with anyio.fail_after(5):
+                    while not router_a._local:
+                        await anyio.sleep(0.01)
+                    session_id = next(iter(router_a._local))
+                    assert backend_b.get(f"mcp_session:{session_id}") == router_a.worker_id
+
+                    assert await post_to_b(session_id) == 202
+                    relayed = await read_stream.receive()
+                assert relayed.message.root.method == "notifications/initialized"
+                disconnected.set()
+        assert backend_b.get(f"mcp_session:{session_id}") is None
+
+    asyncio.run(main())
+    assert b"event: endpoint" in b"".join(sse_body)
+    backend_a.close()
+    backend_b.close()
@@ -0,0 +1,53 @@
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.server.mcp_tools_call import mcp_server
+from app.server.sse_sessions import sse_sessions
+from app.server.streamable_http import StreamableHttpEndpoint
+
+HEADERS = {
+    "accept": "application/json, text/event-stream",
+    "content-type": "application/json",
+}
+
+
+def _make_app(endpoint):
+    @asynccontextmanager
+    async def lifespan(app):
+        # app_lifespan と同じく、前回の終了時のドレイン状態を戻す
+        sse_sessions.reset()
+        async with endpoint.run():
+            yield
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_route("/mcp", endpoint)
+    return app
+
+
+def test_stateless_requests_need_no_session():
+    endpoint = StreamableHttpEndpoint(mcp_server, json_response=True)
+
+    with TestClient(_make_app(endpoint)) as client:
+        for request_id in (1, 2):
+            response = client.post(
+                "/mcp",
+                headers=HEADERS,
+                json={"jsonrpc": "2.0", "id": request_id, "method": "tools/list"},
+            )
+            assert response.status_code == 200
+            assert "mcp-session-id" not in response.headers
+            tools = response.json()["result"]["tools"]
+            assert [tool["name"] for tool in tools] == ["get_specific_attendance"]
+
+
+def test_rejects_requests_outside_lifespan():
+    endpoint = StreamableHttpEndpoint(mcp_server)
+    app = FastAPI()
+    app.add_route("/mcp", endpoint)
+
+    response = TestClient(app).post("/mcp", headers=HEADERS, json={})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
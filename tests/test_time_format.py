@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from app.logics.time_format import format_rt, format_work_time, parse_hours
+
+
+def test_format_work_time():
+    assert format_work_time(timedelta(hours=7)) == "7:00"
+    assert format_work_time(timedelta(minutes=45)) == "0:45"
+    assert format_work_time(timedelta(hours=10, minutes=5)) == "10:05"
+    assert format_work_time(timedelta(hours=25)) == "25:00"
+    assert format_work_time(timedelta(0)) == "0.0"
+    assert format_work_time(timedelta(hours=-1)) == "0.0"
+
+
+def test_format_rt_negative():
+    assert format_rt(-11880) == "-03:18"
+    # 1時間未満の負の値でも符号を残す
+    assert format_rt(-1800) == "-00:30"
+    assert format_rt(-100 * 3600) == "-100:00"
+    assert format_rt(30 * 3600) == "30:00"
+
+
+def test_parse_hours_round_trip():
+    for minutes in (0, 45, 450, 1505):
+        assert parse_hours(format_work_time(timedelta(minutes=minutes))) == minutes / 60
+        assert parse_hours(format_rt(-minutes * 60)) == -minutes / 60
+    assert parse_hours("") == 0.0
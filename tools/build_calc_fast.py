@@ -0,0 +1,62 @@
+"""
+app/caluculation/calc_fast.py を mypyc でコンパイルし、拡張モジュールを同じディレクトリに置きます。
+拡張モジュールがあると import 時に .py より優先されます（CALC_BACKEND=fast で使用）。
+削除すれば純粋な Python 版に戻ります（--clean）。
+
+mypy（mypyc を含む）と C コンパイラが必要です。ビルド結果は Python のバージョンごとに別ファイルです。
+
+使い方:
+    pip install mypy
+    python -m tools.build_calc_fast
+    python -m tools.build_calc_fast --clean
+"""
+
+import argparse
+import importlib.machinery
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+SOURCE = Path(__file__).resolve().parent.parent / "app" / "caluculation" / "calc_fast.py"
+
+
+def built_extensions() -> List[Path]:
+    return [
+        SOURCE.with_name(SOURCE.stem + suffix)
+        for suffix in importlib.machinery.EXTENSION_SUFFIXES
+        if SOURCE.with_name(SOURCE.stem + suffix).exists()
+    ]
+
+
+def build() -> Path:
+    # パッケージの外でモジュール単体としてコンパイルする（ビルド用のファイルをリポジトリに残さない）
+    with tempfile.TemporaryDirectory() as work_dir:
+        shutil.copy(SOURCE, work_dir)
+        subprocess.run(
+            [sys.executable, "-m", "mypyc", SOURCE.name], cwd=work_dir, check=True
+        )
+        suffix = importlib.machinery.EXTENSION_SUFFIXES[0]
+        target = SOURCE.with_name(SOURCE.stem + suffix)
+        shutil.copy(Path(work_dir) / target.name, target)
+    return target
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clean", action="store_true", help="ビルド済みの拡張モジュールを削除する")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        for path in built_extensions():
+            path.unlink()
+            print(f"removed {path}")
+        return 0
+    print(f"built {build()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+起動時間（import 時間）のベンチマーク。
+
+`python -X importtime -c "import <module>"` を別プロセスで複数回実行し、
+対象モジュールの累積 import 時間の中央値と、重いモジュールの上位を出力します。
+起動時に読み込まれてはいけない重いモジュール（pandas、google.genai など）が
+読み込まれた場合はエラー終了するので、CIでの回帰チェックにも使えます。
+
+使い方:
+    python -m tools.import_time
+    python -m tools.import_time --module app.server.endpoint --runs 5 --top 15
+    python -m tools.import_time --max-ms 1500
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_MODULE = "app.server.endpoint"
+# 最初のリクエストまで遅延させているモジュール
+# （mcp.client.* は mcp パッケージ自体が読み込むため、対象外）
+DEFERRED_MODULES = (
+    "pandas",
+    "google.genai",
+    "jinja2",
+)
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+@dataclass(frozen=True)
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    records = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        records.append(
+            ImportRecord(
+                module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2
+            )
+        )
+    return records
+
+
+def measure_once(module: str, python: str = sys.executable) -> List[ImportRecord]:
+    env = dict(os.environ)
+    # 計測のためだけに外部APIへ接続しないよう、ダミーのキーを渡す
+    env.setdefault("GEMINI_API_KEY", "import-time-benchmark")
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def summarize_runs(
+    module: str, runs: Sequence[List[ImportRecord]], top: int
+) -> Dict[str, object]:
+    totals = []
+    heaviest: Dict[str, List[int]] = {}
+    imported = set()
+    for records in runs:
+        for record in records:
+            imported.add(record.module)
+            if record.module == module:
+                totals.append(record.cumulative_us)
+            if record.depth == 1:
+                heaviest.setdefault(record.module, []).append(record.cumulative_us)
+    top_modules = sorted(
+        ((name, statistics.median(values)) for name, values in heaviest.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return {
+        "module": module,
+        "median_ms": statistics.median(totals) / 1000 if totals else 0.0,
+        "runs_ms": [total / 1000 for total in totals],
+        "top_modules": [(name, value / 1000) for name, value in top_modules],
+        "deferred_imported": sorted(
+            name for name in DEFERRED_MODULES if name in imported
+        ),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="python -X importtime による起動時間の計測")
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="直下の重いモジュールの表示数")
+    parser.add_argument(
+        "--max-ms", type=float, default=None, help="中央値がこれを超えたら失敗"
+    )
+    args = parser.parse_args(argv)
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    summary = summarize_runs(args.module, runs, args.top)
+
+    print(f"import {summary['module']}: median {summary['median_ms']:.1f} ms")
+    print("  runs: " + ", ".join(f"{value:.1f}" for value in summary["runs_ms"]))
+    for name, value in summary["top_modules"]:
+        print(f"  {value:9.1f} ms  {name}")
+
+    status = 0
+    if summary["deferred_imported"]:
+        print(
+            "遅延させるべきモジュールが起動時に読み込まれています: "
+            f"{summary['deferred_imported']}"
+        )
+        status = 1
+    if args.max_ms is not None and summary["median_ms"] > args.max_ms:
+        print(
+            "起動時間が上限を超えています: "
+            f"{summary['median_ms']:.1f} ms > {args.max_ms} ms"
+        )
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
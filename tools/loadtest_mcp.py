@@ -0,0 +1,339 @@
+"""
+MCP（/sse + /messages、または /mcp の Streamable HTTP）の負荷試験ツール。
+
+N本のセッションを同時に張り、全体で目標レート（呼び出し/秒）になるように
+get_specific_attendance を呼び出します。結果として、レイテンシのパーセンタイル、
+エラー件数、サーバー側の /metrics から取得したリソース使用量を出力します。
+
+レイテンシは「予定時刻から応答まで」で測ります（サーバーが詰まって送信が遅れた分も含む）。
+
+使い方（事前に合成DBでサーバーを起動しておく）:
+    python -m tools.synthetic_data --database-url sqlite:///load.db --staff 1000
+    DATABASE_URL=sqlite:///load.db uvicorn app.server.endpoint:app --port 8001
+    python -m tools.loadtest_mcp --url http://127.0.0.1:8001 \\
+        --sessions 50 --rate 100 --duration 60 --staff-ids 1-1000 --month 2025-12
+    # Streamable HTTP（stateless）で同じ条件を比べる
+    python -m tools.loadtest_mcp --transport streamable-http ...
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamable_http_client
+
+logger = logging.getLogger(__name__)
+
+TOOL_NAME = "get_specific_attendance"
+PERCENTILES = (50, 90, 95, 99)
+METRIC_LINE = re.compile(r"^([a-zA-Z_:][\w:]*)(\{[^}]*\})?\s+(\S+)$")
+TRANSPORTS = ("sse", "streamable-http")
+
+
+@dataclass
+class LoadTestConfig:
+    url: str = "http://127.0.0.1:8001"
+    sessions: int = 10
+    rate: float = 20.0  # 全セッション合計の呼び出し/秒
+    duration: float = 30.0  # 秒
+    staff_ids: Sequence[int] = field(default_factory=lambda: list(range(1, 101)))
+    month: str = "2025-12"
+    only_flagged: bool = False
+    timeout: float = 30.0
+    seed: int = 0
+    transport: str = "sse"
+
+
+@dataclass
+class LoadTestResult:
+    latencies: List[float] = field(default_factory=list)  # 秒
+    errors: Counter = field(default_factory=Counter)
+    sessions_opened: int = 0
+    elapsed: float = 0.0
+    metrics_before: Dict[str, float] = field(default_factory=dict)
+    metrics_after: Dict[str, float] = field(default_factory=dict)
+    peak_rss_bytes: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """最近傍順位法によるパーセンタイル（values が空なら 0.0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(-(-pct * len(ordered) // 100)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Prometheus テキスト形式を {"名前{ラベル}": 値} にする（コメント行は無視）"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = METRIC_LINE.match(line.strip())
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        try:
+            samples[name + (labels or "")] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def parse_staff_ids(spec: str) -> List[int]:
+    """'1-100,205,300-310' → [1, ..., 100, 205, 300, ..., 310]"""
+    staff_ids: List[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            staff_ids.extend(range(int(first), int(last) + 1))
+        else:
+            staff_ids.append(int(part))
+    return staff_ids
+
+
+async def scrape_metrics(client: httpx.AsyncClient, url: str) -> Dict[str, float]:
+    try:
+        response = await client.get(f"{url}/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning("Failed to scrape /metrics: %s", e)
+        return {}
+    return parse_metrics(response.text)
+
+
+class Schedule:
+    """全セッションで共有する送信予定時刻（開ループ。応答を待たずに予定を進める）"""
+
+    def __init__(self, rate: float, duration: float):
+        self.interval = 1.0 / rate
+        self.total = int(rate * duration)
+        self.start = 0.0
+        self._next = 0
+
+    def take(self) -> Optional[float]:
+        if self._next >= self.total:
+            return None
+        scheduled = self.start + self._next * self.interval
+        self._next += 1
+        return scheduled
+
+
+@asynccontextmanager
+async def _open_streams(config: LoadTestConfig):
+    if config.transport == "streamable-http":
+        async with httpx.AsyncClient(timeout=config.timeout) as http_client:
+            async with streamable_http_client(
+                f"{config.url}/mcp", http_client=http_client
+            ) as (read_stream, write_stream, _):
+                yield read_stream, write_stream
+    else:
+        async with sse_client(f"{config.url}/sse", timeout=config.timeout) as streams:
+            yield streams
+
+
+async def _run_session(
+    config: LoadTestConfig,
+    schedule: Schedule,
+    ready: asyncio.Event,
+    settled: asyncio.Queue,
+    result: LoadTestResult,
+    rng: random.Random,
+) -> None:
+    initialized = False
+    try:
+        async with _open_streams(config) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                initialized = True
+                result.sessions_opened += 1
+                settled.put_nowait(True)
+                await ready.wait()
+                while (scheduled := schedule.take()) is not None:
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    await _call_once(config, session, scheduled, result, rng)
+    except Exception as e:
+        result.errors[f"session:{type(e).__name__}"] += 1
+        logger.warning("Session failed: %r", e)
+        if not initialized:
+            settled.put_nowait(False)
+
+
+async def _call_once(
+    config: LoadTestConfig,
+    session: ClientSession,
+    scheduled: float,
+    result: LoadTestResult,
+    rng: random.Random,
+) -> None:
+    arguments = {
+        "staff_id": rng.choice(config.staff_ids),
+        "target_month": config.month,
+    }
+    if config.only_flagged:
+        arguments["only_flagged"] = True
+    try:
+        response = await asyncio.wait_for(
+            session.call_tool(TOOL_NAME, arguments=arguments), config.timeout
+        )
+    except asyncio.TimeoutError:
+        result.errors["timeout"] += 1
+        return
+    except Exception as e:
+        result.errors[type(e).__name__] += 1
+        return
+    if response.isError:
+        result.errors["tool_error"] += 1
+        return
+    result.latencies.append(time.perf_counter() - scheduled)
+
+
+async def _watch_rss(
+    client: httpx.AsyncClient, url: str, result: LoadTestResult, stop: asyncio.Event
+) -> None:
+    """試験中に1秒ごとに /metrics を見て、ワーカーの最大RSSを記録する"""
+    key = 'attendance_process{resource="resident_memory_bytes"}'
+    while not stop.is_set():
+        samples = await scrape_metrics(client, url)
+        result.peak_rss_bytes = max(result.peak_rss_bytes, samples.get(key, 0.0))
+        try:
+            await asyncio.wait_for(stop.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load_test(config: LoadTestConfig) -> LoadTestResult:
+    result = LoadTestResult()
+    schedule = Schedule(config.rate, config.duration)
+    rng = random.Random(config.seed)
+    ready = asyncio.Event()
+    settled: asyncio.Queue = asyncio.Queue()
+    stop_watch = asyncio.Event()
+
+    async with httpx.AsyncClient(timeout=config.timeout) as client:
+        result.metrics_before = await scrape_metrics(client, config.url)
+        sessions = [
+            asyncio.create_task(
+                _run_session(config, schedule, ready, settled, result, rng)
+            )
+            for _ in range(config.sessions)
+        ]
+        # 全セッションの初期化（または失敗）を待ってから計測を始める
+        for _ in range(config.sessions):
+            await settled.get()
+        logger.info("%d/%d sessions opened", result.sessions_opened, config.sessions)
+
+        watcher = asyncio.create_task(
+            _watch_rss(client, config.url, result, stop_watch)
+        )
+        started = time.perf_counter()
+        schedule.start = started
+        ready.set()
+        await asyncio.gather(*sessions)
+        result.elapsed = time.perf_counter() - started
+        stop_watch.set()
+        await watcher
+        result.metrics_after = await scrape_metrics(client, config.url)
+    return result
+
+
+def _metric_delta(result: LoadTestResult, key: str) -> Optional[float]:
+    if key not in result.metrics_after:
+        return None
+    return result.metrics_after[key] - result.metrics_before.get(key, 0.0)
+
+
+def summarize(config: LoadTestConfig, result: LoadTestResult) -> Dict[str, object]:
+    succeeded = len(result.latencies)
+    summary: Dict[str, object] = {
+        "transport": config.transport,
+        "sessions": config.sessions,
+        "sessions_opened": result.sessions_opened,
+        "target_rate": config.rate,
+        "duration_seconds": round(result.elapsed, 3),
+        "requests": result.requests,
+        "succeeded": succeeded,
+        "errors": dict(result.errors),
+        "throughput_per_second": round(succeeded / result.elapsed, 2)
+        if result.elapsed
+        else 0.0,
+        "latency_ms": {
+            f"p{pct}": round(percentile(result.latencies, pct) * 1000, 2)
+            for pct in PERCENTILES
+        },
+    }
+    summary["latency_ms"]["max"] = round(max(result.latencies, default=0.0) * 1000, 2)
+
+    cpu = _metric_delta(result, 'attendance_process{resource="cpu_seconds"}')
+    rows = _metric_delta(result, "attendance_rows_processed_total")
+    server: Dict[str, object] = {}
+    if cpu is not None and result.elapsed:
+        server["cpu_seconds"] = round(cpu, 3)
+        server["cpu_utilization"] = round(cpu / result.elapsed, 3)
+    if result.peak_rss_bytes:
+        server["peak_rss_mb"] = round(result.peak_rss_bytes / 1024 / 1024, 1)
+    if rows is not None:
+        server["rows_processed"] = rows
+    for key, value in result.metrics_after.items():
+        if key.startswith("attendance_db_pool_connections"):
+            server[key] = value
+    summary["server"] = server
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP エンドポイントの負荷試験")
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="sse")
+    parser.add_argument("--sessions", type=int, default=10, help="同時セッション数")
+    parser.add_argument("--rate", type=float, default=20.0, help="合計の呼び出し/秒")
+    parser.add_argument("--duration", type=float, default=30.0, help="秒")
+    parser.add_argument("--staff-ids", default="1-100", help="例: 1-100,205")
+    parser.add_argument("--month", default="2025-12", help="対象月 (YYYY-MM)")
+    parser.add_argument("--only-flagged", action="store_true")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # 1リクエストごとのログで結果が埋もれないようにする
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    config = LoadTestConfig(
+        url=args.url.rstrip("/"),
+        sessions=args.sessions,
+        rate=args.rate,
+        duration=args.duration,
+        staff_ids=parse_staff_ids(args.staff_ids),
+        month=args.month,
+        only_flagged=args.only_flagged,
+        timeout=args.timeout,
+        seed=args.seed,
+        transport=args.transport,
+    )
+    result = asyncio.run(run_load_test(config))
+    print(json.dumps(summarize(config, result), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
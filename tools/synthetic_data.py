@@ -0,0 +1,566 @@
+"""
+ベンチマーク・負荷試験用の合成勤怠データ生成。
+
+本番DBを使わずに、collect_attendance_data が読むテーブル
+（M_CONTRACT, M_NOTIFICATION, M_STAFFINFO, M_LOGGININFO,
+D_JOB_HISTORY, D_HOLIDAY_HISTORY, M_ATTENDANCE）を埋めます。
+
+- 届出は実データに近い分布（大半は届出なし、年休・半休・時間休・出張・欠勤が一定割合）で割り当てます。
+  combination_ratio の割合の日には (午前, 午後) の全組み合わせを順番に割り当てるので、
+  スタッフ月数が十分あれば、すべての組み合わせを網羅します。
+- パート（CONTRACT_CODE 2、休暇契約あり）、看護師（JOBTYPE_CODE 1、オンコール・休日出勤あり）、
+  月途中の契約変更を含みます。
+- 勤怠行はチャンク単位で生成・一括挿入するので、数百万行でもメモリを消費しません。
+- 照合機能（compare_csv_files）用に、同じデータから新旧の集計CSVを出力できます。
+
+使い方:
+    engine = create_engine("sqlite:///bench.db")
+    summary = generate(engine, SyntheticConfig(staff_count=100, months=1))
+
+    # 約500万行（20,000人 × 12ヶ月）
+    python -m tools.synthetic_data --database-url sqlite:///load.db \\
+        --staff 20000 --months 12 --start-month 2025-01 --csv-dir output_csv
+"""
+
+import argparse
+import csv
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+
+from app.database.database_base import Base
+from app.models.models import (
+    Attendance,
+    CollateralTemplate,
+    Contract,
+    Notification,
+    StaffHolidayContract,
+    StaffJobContract,
+    StaffLogin,
+    User,
+)
+
+logger = logging.getLogger(__name__)
+
+# 計算ロジック（CalcTimeClass）が参照する届出コード
+NOTIFICATION_NAMES: Dict[str, str] = {
+    "1": "遅刻",
+    "2": "早退",
+    "3": "年休（全日）",
+    "4": "年休（半日）",
+    "5": "出張（全日）",
+    "6": "出張（半日）",
+    "7": "リフレッシュ休暇",
+    "8": "欠勤",
+    "9": "慶弔",
+    "10": "時間休（1時間）",
+    "11": "時間休（2時間）",
+    "12": "時間休（3時間）",
+    "13": "中抜け（1時間）",
+    "14": "中抜け（2時間）",
+    "15": "中抜け（3時間）",
+    "16": "生理休暇",
+    "17": "特別休暇",
+    "18": "介護休暇",
+    "19": "育児休暇",
+    "20": "産前産後休暇",
+}
+NOTIFICATION_CODES: List[str] = [""] + list(NOTIFICATION_NAMES.keys())
+NOTIFICATION_PAIRS: List[Tuple[str, str]] = list(
+    itertools.product(NOTIFICATION_CODES, repeat=2)
+)
+
+# 通常の日に割り当てる (午前, 午後) と重み（合計100）
+REALISTIC_NOTIFICATIONS: List[Tuple[Tuple[str, str], float]] = [
+    (("", ""), 82.0),
+    (("3", "3"), 4.0),  # 年休（全日）
+    (("4", ""), 1.5),  # 年休（半日）午前
+    (("", "4"), 1.5),  # 年休（半日）午後
+    (("10", ""), 1.0),  # 時間休
+    (("", "11"), 1.0),
+    (("12", ""), 0.5),
+    (("13", ""), 0.5),  # 中抜け
+    (("", "14"), 0.5),
+    (("15", ""), 0.3),
+    (("5", "5"), 1.5),  # 出張（全日）
+    (("6", ""), 0.8),  # 出張（半日）
+    (("", "6"), 0.7),
+    (("1", ""), 1.0),  # 遅刻
+    (("", "2"), 1.0),  # 早退
+    (("9", ""), 0.3),  # 慶弔
+    (("16", ""), 0.3),  # 生理休暇
+    (("8", "8"), 0.4),  # 欠勤
+    (("17", "17"), 0.2),
+    (("18", "18"), 0.1),
+    (("19", "19"), 0.1),
+    (("20", "20"), 0.1),
+]
+
+# (CONTRACT_CODE, NAME, SHORTNAME, WORKTIME)
+CONTRACTS = [
+    (1, "8H常勤", "常勤", 8.0),
+    (2, "パート", "パート", None),
+    (3, "7H常勤", "7H", 7.0),
+]
+PART_TIMER_CONTRACT = 2
+NURSE_JOBTYPE = 1
+JOBTYPES = (1, 2, 3)
+
+FULL_DAY_CODES = {"3", "5", "7", "8", "17", "18", "19", "20"}
+HALF_DAY_CODES = {"4", "6", "9", "16"}
+TIME_OFF_HOURS = {"10": 1, "11": 2, "12": 3, "13": 1, "14": 2, "15": 3}
+OPEN_END_DAY = date(9999, 12, 31)
+
+INSERT_CHUNK = 10_000
+
+# 新旧の集計CSV（compare_csv_files の REQUIRED_COLUMNS と同じ並び + 勤務形態）
+LEGACY_CSV_COLUMNS = [
+    "社員ID",
+    "勤務形態",
+    "実働時間計",
+    "リアル実働時間",
+    "年休（全日）",
+    "年休（半日）",
+    "時間外",
+    "時間休計",
+]
+# 回数・時間数の列は整数で出力する（時間の列は小数1桁）
+LEGACY_CSV_COUNT_COLUMNS = ("年休（全日）", "年休（半日）", "時間休計")
+
+
+@dataclass
+class SyntheticConfig:
+    staff_count: int = 10
+    months: int = 1
+    start_month: str = "2025-12"
+    # 届出の全組み合わせを割り当てる日の割合（残りは REALISTIC_NOTIFICATIONS の分布）
+    combination_ratio: float = 0.05
+    part_timer_ratio: float = 0.3
+    nurse_ratio: float = 0.25
+    overtime_ratio: float = 0.2
+    # 期間中に契約変更（月途中）があるスタッフの割合
+    contract_change_ratio: float = 0.05
+    # 新CSVで値を変える社員の割合（照合ベンチマーク用）
+    csv_diff_ratio: float = 0.05
+    seed: int = 0
+    first_staff_id: int = 1
+
+
+@dataclass
+class StaffProfile:
+    staff_id: int
+    jobtype: int
+    # (開始日, 終了日, CONTRACT_CODE, PART_WORKTIME, HOLIDAY_TIME)
+    contracts: List[Tuple[date, date, int, Optional[float], Optional[int]]] = field(
+        default_factory=list
+    )
+
+    @property
+    def is_nurse(self) -> bool:
+        return self.jobtype == NURSE_JOBTYPE
+
+    def contract_on(self, day: date) -> Tuple[date, date, int, Optional[float], Optional[int]]:
+        for contract in self.contracts:
+            if contract[0] <= day <= contract[1]:
+                return contract
+        return self.contracts[-1]
+
+
+@dataclass
+class SyntheticSummary:
+    staff_ids: List[int]
+    months: List[str]
+    attendance_rows: int
+    elapsed_seconds: float = 0.0
+
+
+def month_range(start_month: str, months: int) -> List[str]:
+    year, month = map(int, start_month.split("-"))
+    result = []
+    for _ in range(months):
+        result.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return result
+
+
+def _month_days(target_month: str) -> Iterator[date]:
+    year, month = map(int, target_month.split("-"))
+    day = date(year, month, 1)
+    while day.month == month:
+        yield day
+        day += timedelta(days=1)
+
+
+def _hm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _minutes(hm: str) -> int:
+    hour, minute = hm.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def make_day_times(
+    rng: random.Random, notifications: Tuple[str, str], overtime: str
+) -> Tuple[str, str]:
+    """届出に見合った出勤・退勤時刻を作る（分単位の揺らぎあり）"""
+    am, pm = notifications
+    if am in FULL_DAY_CODES or pm in FULL_DAY_CODES:
+        return "00:00", "00:00"
+    start = rng.randint(8 * 60 + 20, 9 * 60)
+    end = rng.randint(17 * 60, 17 * 60 + 40)
+    if am in HALF_DAY_CODES:
+        start = rng.randint(12 * 60 + 40, 13 * 60 + 10)
+    if pm in HALF_DAY_CODES:
+        end = rng.randint(12 * 60, 12 * 60 + 30)
+    if am == "1":
+        start += rng.randint(10, 90)
+    if pm == "2":
+        end -= rng.randint(10, 90)
+    # 時間休は出退勤に反映済みのケースと、未反映のケースが混在する
+    if am in TIME_OFF_HOURS and rng.random() < 0.5:
+        start += TIME_OFF_HOURS[am] * 60
+    if pm in TIME_OFF_HOURS and rng.random() < 0.5:
+        end -= TIME_OFF_HOURS[pm] * 60
+    if overtime == "1":
+        end += rng.randint(15, 180)
+    end = max(end, start)
+    return _hm(start), _hm(end)
+
+
+def reference_rows() -> Dict[str, List[dict]]:
+    return {
+        "contracts": [
+            {"CONTRACT_CODE": c, "NAME": n, "SHORTNAME": s, "WORKTIME": w}
+            for c, n, s, w in CONTRACTS
+        ],
+        "notifications": [
+            {"CODE": int(code), "NAME": name} for code, name in NOTIFICATION_NAMES.items()
+        ],
+        "templates": [
+            {"JOBTYPE_CODE": j, "CONTRACT_CODE": c, "TEMPLATE_NO": 1}
+            for j in JOBTYPES
+            for c, *_ in CONTRACTS
+        ],
+    }
+
+
+def _random_contract(
+    rng: random.Random, part_timer: bool
+) -> Tuple[int, Optional[float], Optional[int]]:
+    if part_timer:
+        hours = rng.choice((4.0, 5.0, 6.0))
+        return PART_TIMER_CONTRACT, hours, int(hours)
+    return rng.choice((1, 3)), None, None
+
+
+def make_staff_profiles(
+    rng: random.Random, config: SyntheticConfig, period_start: date, period_end: date
+) -> List[StaffProfile]:
+    profiles = []
+    for staff_id in range(
+        config.first_staff_id, config.first_staff_id + config.staff_count
+    ):
+        nurse = rng.random() < config.nurse_ratio
+        profile = StaffProfile(
+            staff_id=staff_id,
+            jobtype=NURSE_JOBTYPE if nurse else rng.choice(JOBTYPES[1:]),
+        )
+        first_start = period_start - timedelta(days=rng.randint(30, 3650))
+        contract = _random_contract(rng, rng.random() < config.part_timer_ratio)
+        if rng.random() < config.contract_change_ratio:
+            # 月途中の契約変更（常勤⇔パート、または契約時間の変更）
+            span_days = (period_end - period_start).days
+            change_day = period_start + timedelta(days=rng.randint(1, max(span_days, 1)))
+            next_contract = _random_contract(rng, contract[0] != PART_TIMER_CONTRACT)
+            profile.contracts.append(
+                (first_start, change_day - timedelta(days=1), *contract)
+            )
+            profile.contracts.append((change_day, OPEN_END_DAY, *next_contract))
+        else:
+            profile.contracts.append((first_start, OPEN_END_DAY, *contract))
+        profiles.append(profile)
+    return profiles
+
+
+def staff_rows(profiles: List[StaffProfile]) -> Dict[str, List[dict]]:
+    users, logins, jobs, holidays = [], [], [], []
+    for profile in profiles:
+        latest_contract_code = profile.contracts[-1][2]
+        users.append(
+            {
+                "STAFFID": profile.staff_id,
+                "CONTRACT_CODE": latest_contract_code,
+                "JOBTYPE_CODE": profile.jobtype,
+                "TEAM_CODE": profile.staff_id % 5 + 1,
+                "LNAME": f"テスト{profile.staff_id}",
+                "DISPLAY": True,
+            }
+        )
+        logins.append(
+            {"STAFFID": profile.staff_id, "PASSWORD_HASH": None, "ADMIN": False}
+        )
+        for start_day, end_day, contract_code, part_worktime, holiday_time in (
+            profile.contracts
+        ):
+            jobs.append(
+                {
+                    "STAFFID": profile.staff_id,
+                    "JOBTYPE_CODE": profile.jobtype,
+                    "CONTRACT_CODE": contract_code,
+                    "PART_WORKTIME": part_worktime,
+                    "START_DAY": start_day,
+                    "END_DAY": end_day,
+                }
+            )
+            if holiday_time is not None:
+                holidays.append(
+                    {
+                        "STAFFID": profile.staff_id,
+                        "HOLIDAY_TIME": holiday_time,
+                        "START_DAY": start_day,
+                        "END_DAY": end_day,
+                    }
+                )
+    return {"users": users, "logins": logins, "jobs": jobs, "holidays": holidays}
+
+
+def iter_attendance_rows(
+    rng: random.Random, config: SyntheticConfig, profiles: List[StaffProfile]
+) -> Iterator[dict]:
+    """勤怠行を1行ずつ生成する（全件をメモリに載せない）"""
+    months = month_range(config.start_month, config.months)
+    realistic_pairs = [pair for pair, _ in REALISTIC_NOTIFICATIONS]
+    realistic_weights = list(itertools.accumulate(w for _, w in REALISTIC_NOTIFICATIONS))
+    pair_cursor = 0
+
+    for profile in profiles:
+        for target_month in months:
+            for work_day in _month_days(target_month):
+                weekend = work_day.weekday() >= 5
+                holiday_flag = "0"
+                if weekend:
+                    # 看護師のみ、土日出勤がある
+                    if not (profile.is_nurse and rng.random() < 0.15):
+                        continue
+                    holiday_flag = "1"
+
+                if rng.random() < config.combination_ratio:
+                    notifications = NOTIFICATION_PAIRS[
+                        pair_cursor % len(NOTIFICATION_PAIRS)
+                    ]
+                    pair_cursor += 1
+                else:
+                    notifications = rng.choices(
+                        realistic_pairs, cum_weights=realistic_weights
+                    )[0]
+                overtime = "1" if rng.random() < config.overtime_ratio else "0"
+                start_time, end_time = make_day_times(rng, notifications, overtime)
+
+                oncall = "0"
+                if profile.is_nurse and rng.random() < 0.1:
+                    oncall = "1"
+                    if notifications == ("", "") and rng.random() < 0.3:
+                        # オンコール明けで、出勤が 00:00 のケース
+                        start_time = "00:00"
+
+                remark = ""
+                if notifications[0] in TIME_OFF_HOURS or notifications[1] in TIME_OFF_HOURS:
+                    remark = "時間休" if rng.random() < 0.7 else ""
+
+                yield {
+                    "STAFFID": profile.staff_id,
+                    "WORKDAY": work_day,
+                    "HOLIDAY": holiday_flag,
+                    "STARTTIME": start_time,
+                    "ENDTIME": end_time,
+                    "MILEAGE": None,
+                    "ONCALL": oncall,
+                    "ONCALL_COUNT": None,
+                    "ENGEL_COUNT": None,
+                    "NOTIFICATION": notifications[0],
+                    "NOTIFICATION2": notifications[1],
+                    "OVERTIME": overtime,
+                    "ALCOHOL": None,
+                    "REMARK": remark,
+                }
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert_chunks(conn, table, rows) -> int:
+    inserted = 0
+    for chunk in _chunks(iter(rows), INSERT_CHUNK):
+        conn.execute(insert(table), chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+def generate(
+    engine: Engine, config: SyntheticConfig, csv_dir: Optional[Path] = None
+) -> SyntheticSummary:
+    """テーブルを作成し、設定どおりの合成データを一括挿入する"""
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(config.seed)
+    months = month_range(config.start_month, config.months)
+    period_start = date.fromisoformat(f"{months[0]}-01")
+    period_end = list(_month_days(months[-1]))[-1]
+
+    profiles = make_staff_profiles(rng, config, period_start, period_end)
+    reference = reference_rows()
+    staff = staff_rows(profiles)
+    aggregator = LegacyCsvAggregator(profiles) if csv_dir is not None else None
+
+    attendance_rows = iter_attendance_rows(rng, config, profiles)
+    if aggregator is not None:
+        attendance_rows = aggregator.observe(attendance_rows)
+
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            # 一括投入する接続だけ、同期書き込みを止めて高速化する
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.commit()
+        with conn.begin():
+            _insert_chunks(conn, Contract.__table__, reference["contracts"])
+            _insert_chunks(conn, Notification.__table__, reference["notifications"])
+            _insert_chunks(conn, CollateralTemplate.__table__, reference["templates"])
+            _insert_chunks(conn, User.__table__, staff["users"])
+            _insert_chunks(conn, StaffLogin.__table__, staff["logins"])
+            _insert_chunks(conn, StaffJobContract.__table__, staff["jobs"])
+            _insert_chunks(conn, StaffHolidayContract.__table__, staff["holidays"])
+            attendance_count = _insert_chunks(
+                conn, Attendance.__table__, attendance_rows
+            )
+
+    if aggregator is not None:
+        aggregator.write_csv_pair(
+            csv_dir, seed=config.seed, diff_ratio=config.csv_diff_ratio
+        )
+
+    return SyntheticSummary(
+        staff_ids=[profile.staff_id for profile in profiles],
+        months=months,
+        attendance_rows=attendance_count,
+        elapsed_seconds=time.perf_counter() - started,
+    )
+
+
+class LegacyCsvAggregator:
+    """
+    生成した勤怠行から、社員ごとの集計（旧システムの集計CSV形式）を作る。
+    値は計算ロジックの厳密な再現ではなく、照合処理のベンチマーク用の近似値です。
+    """
+
+    def __init__(self, profiles: List[StaffProfile]):
+        self.profiles = {profile.staff_id: profile for profile in profiles}
+        self.totals: Dict[int, Dict[str, float]] = {}
+
+    def observe(self, rows: Iterator[dict]) -> Iterator[dict]:
+        for row in rows:
+            self._add(row)
+            yield row
+
+    def _add(self, row: dict) -> None:
+        totals = self.totals.setdefault(
+            row["STAFFID"], {column: 0.0 for column in LEGACY_CSV_COLUMNS[2:]}
+        )
+        notifications = (row["NOTIFICATION"], row["NOTIFICATION2"])
+        work_hours = max(_minutes(row["ENDTIME"]) - _minutes(row["STARTTIME"]), 0) / 60
+        if work_hours >= 6:
+            work_hours -= 1
+        time_off = sum(TIME_OFF_HOURS.get(code, 0) for code in notifications)
+        totals["実働時間計"] += work_hours
+        totals["リアル実働時間"] += max(work_hours - time_off, 0)
+        totals["年休（全日）"] += 1 if notifications == ("3", "3") else 0
+        totals["年休（半日）"] += notifications.count("4")
+        totals["時間外"] += max(work_hours - 8, 0) if row["OVERTIME"] == "1" else 0
+        totals["時間休計"] += time_off
+
+    def rows(self) -> Iterator[List[str]]:
+        for staff_id, totals in sorted(self.totals.items()):
+            contract_code = self.profiles[staff_id].contracts[-1][2]
+            work_type = "パート" if contract_code == PART_TIMER_CONTRACT else "常勤"
+            yield [str(staff_id), work_type] + [
+                str(int(value)) if column in LEGACY_CSV_COUNT_COLUMNS else f"{value:.1f}"
+                for column, value in totals.items()
+            ]
+
+    def write_csv_pair(
+        self, csv_dir: Path, seed: int = 0, diff_ratio: float = 0.05
+    ) -> Tuple[Path, Path]:
+        """旧（old.csv）と、diff_ratio の割合で値を変えた新（new.csv）を出力する"""
+        rng = random.Random(seed)
+        csv_dir.mkdir(parents=True, exist_ok=True)
+        old_path, new_path = csv_dir / "old.csv", csv_dir / "new.csv"
+        with old_path.open("w", encoding="utf-8", newline="") as old_file, new_path.open(
+            "w", encoding="utf-8", newline=""
+        ) as new_file:
+            old_writer, new_writer = csv.writer(old_file), csv.writer(new_file)
+            old_writer.writerow(LEGACY_CSV_COLUMNS)
+            new_writer.writerow(LEGACY_CSV_COLUMNS)
+            for row in self.rows():
+                old_writer.writerow(row)
+                if rng.random() < diff_ratio:
+                    row = row.copy()
+                    column = rng.randrange(2, len(row))
+                    if LEGACY_CSV_COLUMNS[column] in LEGACY_CSV_COUNT_COLUMNS:
+                        row[column] = str(int(row[column]) + 1)
+                    else:
+                        row[column] = f"{float(row[column]) + rng.choice((-1, 1)) * 0.5:.1f}"
+                new_writer.writerow(row)
+        return old_path, new_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成勤怠データをDBに生成します。")
+    parser.add_argument("--database-url", default="sqlite:///synthetic.db")
+    parser.add_argument("--staff", type=int, default=100, help="スタッフ数")
+    parser.add_argument("--months", type=int, default=1, help="月数")
+    parser.add_argument("--start-month", default="2025-12", help="開始月 (YYYY-MM)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--combination-ratio", type=float, default=0.05)
+    parser.add_argument(
+        "--csv-dir", type=Path, default=None, help="新旧の集計CSVの出力先"
+    )
+    parser.add_argument("--csv-diff-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(args.database_url)
+    summary = generate(
+        engine,
+        SyntheticConfig(
+            staff_count=args.staff,
+            months=args.months,
+            start_month=args.start_month,
+            seed=args.seed,
+            combination_ratio=args.combination_ratio,
+            csv_diff_ratio=args.csv_diff_ratio,
+        ),
+        csv_dir=args.csv_dir,
+    )
+    logger.info(
+        "Generated %d attendance rows for %d staff in %.1fs",
+        summary.attendance_rows,
+        len(summary.staff_ids),
+        summary.elapsed_seconds,
+    )
+
+
+if __name__ == "__main__":
+    main()